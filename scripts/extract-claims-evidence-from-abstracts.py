@@ -3,8 +3,11 @@
 Extract discourse nodes and relations from papers CSV using Claude API.
 Works with Title and Abstract columns only.
 
-Usage: python3 extract-claims-evidence-from-abstracts.py <csv_path> <focal_question> <node_type1> [<node_type2> ...]
+Usage: python3 extract-claims-evidence-from-abstracts.py <csv_path> <focal_question> <node_type1> [<node_type2> ...] [--refresh]
 Example: python3 extract-claims-evidence-from-abstracts.py papers.csv "My question" Evidence Claim Question
+
+Claude responses are cached in .cache/llm_responses, so re-running only sends
+prompts that changed. Pass --refresh to ignore cached responses.
 """
 
 import os
@@ -12,10 +15,14 @@ import sys
 import pandas as pd
 import re
 from pathlib import Path
-from anthropic import Anthropic
 import json
 from dotenv import load_dotenv
 
+from zotero_verification.config import EXTRACTION_MODEL
+from zotero_verification.llm_gateway import LLMGateway
+from zotero_verification.response_cache import ResponseCache
+from zotero_verification.usage_ledger import UsageLedger, usage_labels
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -112,7 +119,7 @@ def generate_question_abbreviation(question, max_keywords=5):
     return '-'.join(keywords)
 
 
-def extract_nodes_from_paper(client, paper_data, research_question, config):
+def extract_nodes_from_paper(gateway, response_cache, paper_data, research_question, config):
     """
     Use Claude API to extract discourse nodes from a single paper.
     Returns a dict mapping node types to lists of extracted nodes.
@@ -209,22 +216,17 @@ IMPORTANT:
 """
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
+        extracted_nodes = gateway.create_json(
+            cache=response_cache,
+            json_container='{',
+            model=EXTRACTION_MODEL,
             max_tokens=4000,
             messages=[{
                 "role": "user",
                 "content": prompt
             }]
         )
-
-        # Parse the response
-        response_text = response.content[0].text
-
-        # Try to extract JSON from the response
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            extracted_nodes = json.loads(json_match.group(0))
+        if extracted_nodes is not None:
             return extracted_nodes
         else:
             print(f"Warning: Could not parse JSON from response for {title}")
@@ -235,7 +237,7 @@ IMPORTANT:
         return {}
 
 
-def identify_relations_between_nodes(client, extracted_nodes, config):
+def identify_relations_between_nodes(gateway, response_cache, extracted_nodes, config):
     """
     Use Claude API to identify relationships between extracted nodes.
     Returns a list of relations with source, target, and relation type.
@@ -317,21 +319,16 @@ Return as a JSON array:
 """
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
+        relations = gateway.create_json(
+            cache=response_cache,
+            model=EXTRACTION_MODEL,
             max_tokens=4000,
             messages=[{
                 "role": "user",
                 "content": prompt
             }]
         )
-
-        response_text = response.content[0].text
-
-        # Extract JSON array
-        json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if json_match:
-            relations = json.loads(json_match.group(0))
+        if relations is not None:
             # Validate and enrich relations
             valid_relations = []
             for rel in relations:
@@ -412,7 +409,7 @@ def generate_paper_markdown(paper_data, extracted_nodes, relations, filename, ev
     return filepath
 
 
-def synthesize_across_papers(client, all_paper_data, research_question, config):
+def synthesize_across_papers(gateway, response_cache, all_paper_data, research_question, config):
     """
     Use Claude API to synthesize higher-level nodes across all papers.
     Returns dict with 'patterns' and 'claims' keys.
@@ -463,19 +460,17 @@ def synthesize_across_papers(client, all_paper_data, research_question, config):
         """
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
+        patterns = gateway.create_json(
+            cache=response_cache,
+            model=EXTRACTION_MODEL,
             max_tokens=8000,
             messages=[{
                 "role": "user",
                 "content": patterns_prompt
             }]
         )
-
-        response_text = response.content[0].text
-        json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if json_match:
-            result['patterns'] = json.loads(json_match.group(0))
+        if patterns is not None:
+            result['patterns'] = patterns
             print(f"  Identified {len(result['patterns'])} patterns")
         else:
             print("  Warning: Could not parse patterns from response")
@@ -517,19 +512,17 @@ def synthesize_across_papers(client, all_paper_data, research_question, config):
         """
 
         try:
-            response = client.messages.create(
-                model="claude-sonnet-4-20250514",
+            claims = gateway.create_json(
+                cache=response_cache,
+                model=EXTRACTION_MODEL,
                 max_tokens=8000,
                 messages=[{
                     "role": "user",
                     "content": claims_prompt
                 }]
             )
-
-            response_text = response.content[0].text
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                result['claims'] = json.loads(json_match.group(0))
+            if claims is not None:
+                result['claims'] = claims
                 print(f"  Synthesized {len(result['claims'])} claims")
             else:
                 print("  Warning: Could not parse claims from response")
@@ -615,14 +608,17 @@ def generate_synthesis_markdown(synthesis_data, research_question, claims_dir, c
 def main():
     """Main extraction workflow."""
 
-    if len(sys.argv) < 4:
-        print("Usage: python3 extract-claims-evidence-from-abstracts.py <csv_path> <focal_question> <node_type1> [<node_type2> ...]")
+    refresh = '--refresh' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--refresh']
+
+    if len(args) < 3:
+        print("Usage: python3 extract-claims-evidence-from-abstracts.py <csv_path> <focal_question> <node_type1> [<node_type2> ...] [--refresh]")
         print("Example: python3 extract-claims-evidence-from-abstracts.py papers.csv \"My question\" Evidence Claim Question")
         sys.exit(1)
 
-    csv_path = sys.argv[1]
-    research_question = sys.argv[2]
-    requested_node_types = sys.argv[3:]  # All remaining args are node type names
+    csv_path = args[0]
+    research_question = args[1]
+    requested_node_types = args[2:]  # All remaining args are node type names
 
     print("Starting discourse node extraction...")
     print(f"Research Question: {research_question}")
@@ -633,13 +629,15 @@ def main():
     config = build_config_from_node_types(schema, requested_node_types)
     print(f"Extracting {len(config['nodeTypes'])} node types with {len(config['discourseRelations'])} possible discourse relations\n")
 
-    # Initialize Anthropic client
+    # Initialize the gateway that sends every Claude request
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if not api_key:
         print("Error: ANTHROPIC_API_KEY environment variable not set")
         sys.exit(1)
 
-    client = Anthropic(api_key=api_key)
+    gateway = LLMGateway(api_key)
+    ledger = UsageLedger()
+    response_cache = ResponseCache(refresh=refresh, ledger=ledger)
 
     # Create directories if they don't exist
     evidence_dir = "evidence"
@@ -674,8 +672,14 @@ def main():
         title = row.get('Title', row.get('title', 'Unknown'))
         print(f"\n[{idx + 1}/{len(df)}] Processing: {title[:60]}...")
 
+        # Generate filename
+        authors = row.get('Authors', row.get('authors', ''))
+        year = row.get('Year', row.get('year', 'unknown'))
+        filename = sanitize_author_year(authors, year)
+
         # Extract nodes
-        extracted_nodes = extract_nodes_from_paper(client, row, research_question, config)
+        with usage_labels(stage='extract_nodes', citekey=filename):
+            extracted_nodes = extract_nodes_from_paper(gateway, response_cache, row, research_question, config)
 
         if not extracted_nodes:
             print(f"  No nodes extracted, skipping...")
@@ -688,14 +692,10 @@ def main():
 
         # Identify relations between nodes
         print(f"  Identifying relations...")
-        relations = identify_relations_between_nodes(client, extracted_nodes, config)
+        with usage_labels(stage='identify_relations', citekey=filename):
+            relations = identify_relations_between_nodes(gateway, response_cache, extracted_nodes, config)
         print(f"  Identified {len(relations)} relations")
 
-        # Generate filename
-        authors = row.get('Authors', row.get('authors', ''))
-        year = row.get('Year', row.get('year', 'unknown'))
-        filename = sanitize_author_year(authors, year)
-
         # Generate paper markdown
         generate_paper_markdown(row, extracted_nodes, relations, filename, evidence_dir, config)
 
@@ -711,7 +711,8 @@ def main():
         print("Synthesizing across all papers...")
         print("="*60 + "\n")
 
-        synthesis_data = synthesize_across_papers(client, all_paper_data, research_question, config)
+        with usage_labels(stage='synthesize'):
+            synthesis_data = synthesize_across_papers(gateway, response_cache, all_paper_data, research_question, config)
 
         # Generate synthesis markdown
         synthesis_filename = generate_synthesis_markdown(synthesis_data, research_question, claims_dir, config)
@@ -723,6 +724,13 @@ def main():
     print(f"  - Paper files: {evidence_dir}/ ({len(all_paper_data)} files)")
     if synthesis_filename:
         print(f"  - Synthesis file: {claims_dir}/{synthesis_filename}")
+    print(f"  - API calls: {response_cache.misses} ({response_cache.hits} served from cache)")
+    rate_limiter = gateway.rate_limiter
+    if rate_limiter and rate_limiter.stats['delayed']:
+        print(f"  - Waited {rate_limiter.stats['wait_seconds']:.1f}s for the shared rate limit "
+              f"({rate_limiter.stats['delayed']} calls)")
+    print()
+    ledger.print_summary()
 
 
 if __name__ == "__main__":
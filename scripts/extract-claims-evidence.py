@@ -8,6 +8,9 @@ This script:
 3. Generates individual paper markdown files (prefixed with @)
 4. Synthesizes claims across all papers
 5. Links claims to supporting evidence
+
+Claude responses are cached in .cache/llm_responses, so re-running only sends
+prompts that changed. Pass --refresh to ignore cached responses.
 """
 
 import os
@@ -15,10 +18,13 @@ import sys
 import pandas as pd
 import re
 from pathlib import Path
-from anthropic import Anthropic
-import json
 from dotenv import load_dotenv
 
+from zotero_verification.config import EXTRACTION_MODEL
+from zotero_verification.llm_gateway import LLMGateway
+from zotero_verification.response_cache import ResponseCache
+from zotero_verification.usage_ledger import UsageLedger, usage_labels
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -78,7 +84,7 @@ def sanitize_author_year(authors, year):
     return f"@{last_name}-{year}"
 
 
-def extract_evidence_from_paper(client, paper_data):
+def extract_evidence_from_paper(gateway, response_cache, paper_data):
     """
     Use Claude API to extract evidence items from a single paper.
     Returns a list of evidence items with What/How/Who notes.
@@ -128,23 +134,16 @@ at entailment tasks. Include specific metrics, comparisons, and statistical evid
 """
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
+        evidence_items = gateway.create_json(
+            cache=response_cache,
+            model=EXTRACTION_MODEL,
             max_tokens=4000,
             messages=[{
                 "role": "user",
                 "content": prompt
             }]
         )
-
-        # Parse the response
-        response_text = response.content[0].text
-
-        # Try to extract JSON from the response
-        # Look for JSON array in the response
-        json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if json_match:
-            evidence_items = json.loads(json_match.group(0))
+        if evidence_items is not None:
             return evidence_items
         else:
             print(f"Warning: Could not parse JSON from response for {paper_data['Title']}")
@@ -187,7 +186,7 @@ def generate_paper_markdown(paper_data, evidence_items, filename):
     return filepath
 
 
-def synthesize_claims(client, all_evidence_data):
+def synthesize_claims(gateway, response_cache, all_evidence_data):
     """
     Use Claude API to synthesize claims across all evidence.
     Returns a list of claims with links to supporting evidence.
@@ -232,21 +231,16 @@ Each claim should be supported by at least one evidence item.
 """
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
+        claims = gateway.create_json(
+            cache=response_cache,
+            model=EXTRACTION_MODEL,
             max_tokens=8000,
             messages=[{
                 "role": "user",
                 "content": prompt
             }]
         )
-
-        response_text = response.content[0].text
-
-        # Extract JSON
-        json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if json_match:
-            claims = json.loads(json_match.group(0))
+        if claims is not None:
             return claims
         else:
             print("Warning: Could not parse claims JSON from response")
@@ -295,13 +289,15 @@ def main():
     print("Starting claims and evidence extraction...")
     print(f"Research Question: {RESEARCH_QUESTION}\n")
 
-    # Initialize Anthropic client
+    # Initialize the gateway that sends every Claude request
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if not api_key:
         print("Error: ANTHROPIC_API_KEY environment variable not set")
         sys.exit(1)
 
-    client = Anthropic(api_key=api_key)
+    gateway = LLMGateway(api_key)
+    ledger = UsageLedger()
+    response_cache = ResponseCache(refresh='--refresh' in sys.argv, ledger=ledger)
 
     # Load CSV
     print(f"Loading CSV from {CSV_PATH}...")
@@ -314,8 +310,12 @@ def main():
     for idx, row in df.iterrows():
         print(f"\n[{idx + 1}/{len(df)}] Processing: {row['Title'][:60]}...")
 
+        # Generate filename
+        filename = sanitize_author_year(row['Authors'], row['Year'])
+
         # Extract evidence
-        evidence_items = extract_evidence_from_paper(client, row)
+        with usage_labels(stage='extract_evidence', citekey=filename):
+            evidence_items = extract_evidence_from_paper(gateway, response_cache, row)
 
         if not evidence_items:
             print(f"  No evidence extracted, skipping...")
@@ -323,9 +323,6 @@ def main():
 
         print(f"  Extracted {len(evidence_items)} evidence items")
 
-        # Generate filename
-        filename = sanitize_author_year(row['Authors'], row['Year'])
-
         # Generate paper markdown
         generate_paper_markdown(row, evidence_items, filename)
 
@@ -339,7 +336,8 @@ def main():
     print("Synthesizing claims across all evidence...")
     print("="*60 + "\n")
 
-    claims = synthesize_claims(client, all_evidence_data)
+    with usage_labels(stage='synthesize_claims'):
+        claims = synthesize_claims(gateway, response_cache, all_evidence_data)
     print(f"Synthesized {len(claims)} candidate claims")
 
     # Generate claims markdown
@@ -351,6 +349,13 @@ def main():
     print(f"\nOutput:")
     print(f"  - Evidence files: {EVIDENCE_DIR}/ ({len(all_evidence_data)} files)")
     print(f"  - Claims file: {CLAIMS_DIR}/central-claims.md ({len(claims)} claims)")
+    print(f"  - API calls: {response_cache.misses} ({response_cache.hits} served from cache)")
+    rate_limiter = gateway.rate_limiter
+    if rate_limiter and rate_limiter.stats['delayed']:
+        print(f"  - Waited {rate_limiter.stats['wait_seconds']:.1f}s for the shared rate limit "
+              f"({rate_limiter.stats['delayed']} calls)")
+    print()
+    ledger.print_summary()
 
 
 if __name__ == "__main__":
@@ -9,6 +9,7 @@ Usage:
 """
 
 import argparse
+import asyncio
 import sys
 from pathlib import Path
 from datetime import datetime
@@ -18,13 +19,27 @@ from zotero_verification.config import (
     EVIDENCE_DIR,
     ATTACHMENTS_DIR,
     ZOTERO_DB_PATH,
-    DEFAULT_TOP_K
+    DEFAULT_TOP_K,
+    MAX_CONCURRENT_REQUESTS,
+    HEDGE_PERCENTILE,
+    HEDGE_BUDGET_RATIO,
+    SPEND_CAP_USD,
+    WHOLE_PAPER_MAX_TOKENS,
+    LEGACY_BATCH_SIZE
 )
 from zotero_verification.zotero_db import ZoteroDatabase
 from zotero_verification.pdf_extractor import PDFExtractor, TextChunk, Figure
 from zotero_verification.semantic_search import SemanticSearch
+from zotero_verification.scoring_backends import BACKENDS, ClaudeBackend, CascadeBackend, FallbackBackend
+from zotero_verification.lexical_index import BM25Index
+from zotero_verification.page_digests import PageDigest, build_page_digests
+from zotero_verification.whole_paper import paper_tokens
 from zotero_verification.markdown_updater import MarkdownUpdater, VerificationSnippets
 from zotero_verification.cache_manager import CacheManager
+from zotero_verification.usage_ledger import UsageLedger, usage_labels
+from zotero_verification.chunk_compression import ChunkCompressor
+from zotero_verification.circuit_breaker import CircuitBreaker
+from zotero_verification.rate_limiter import default_rate_limiter
 
 
 def main():
@@ -48,6 +63,9 @@ Examples:
 
   # Configuration options
   python scripts/verify_with_zotero.py @yue-2024 --top-k 10 --dry-run
+
+  # Offline run with the local lexical scorer (no API calls)
+  python scripts/verify_with_zotero.py @yue-2024 --backend lexical --dry-run
         """
     )
 
@@ -82,6 +100,94 @@ Examples:
         default=DEFAULT_TOP_K,
         help=f'Number of text snippets to extract per node (default: {DEFAULT_TOP_K})'
     )
+    parser.add_argument(
+        '--backend',
+        choices=sorted(BACKENDS),
+        default=ClaudeBackend.name,
+        help=f'Chunk scorer: Claude, a small-model-first Claude cascade, local lexical '
+             f'overlap, or deterministic fake (default: {ClaudeBackend.name})'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=MAX_CONCURRENT_REQUESTS,
+        help=f'Starting limit on in-flight scoring requests; it adapts to rate limits '
+             f'unless --fixed-concurrency is given (default: {MAX_CONCURRENT_REQUESTS})'
+    )
+    parser.add_argument(
+        '--fixed-concurrency',
+        action='store_true',
+        help='Keep the --concurrency limit fixed instead of adapting it to rate-limit responses'
+    )
+    parser.add_argument(
+        '--mode',
+        choices=['auto', 'whole', 'chunked'],
+        default='auto',
+        help=f'whole: send each paper once with all its nodes and align the returned quotes to '
+             f'chunks; chunked: score chunk batches per node; auto: whole for papers up to '
+             f'{WHOLE_PAPER_MAX_TOKENS} estimated tokens with the claude backend, chunked '
+             f'otherwise or when a chunked-mode option is given (default: auto)'
+    )
+    parser.add_argument(
+        '--matrix',
+        action='store_true',
+        help='Score several nodes against each chunk batch in one request (chunked mode only)'
+    )
+    parser.add_argument(
+        '--hierarchical',
+        action='store_true',
+        help='On long papers, score page digests first and only score chunks on the top pages '
+             '(chunked mode only; ignored with --matrix)'
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Score with IDs and scores only; fetch reasoning just for the final top-k '
+             '(chunked mode only)'
+    )
+    parser.add_argument(
+        '--compress',
+        action='store_true',
+        help='Trim chunks to the sentences overlapping each node before scoring '
+             '(chunked mode only; chunk blocks are then no longer shared cached prefixes)'
+    )
+    parser.add_argument(
+        '--hedge',
+        action='store_true',
+        help=f'Send a backup for scoring requests slower than the recent p{HEDGE_PERCENTILE * 100:.0f} '
+             f'latency and keep the first reply (at most {HEDGE_BUDGET_RATIO * 100:.0f}%% extra requests)'
+    )
+    parser.add_argument(
+        '--spend-cap',
+        type=float,
+        default=SPEND_CAP_USD,
+        metavar='USD',
+        help='Stop sending scoring requests once the estimated spend of this run reaches USD '
+             'and rank the remaining nodes locally (default: VERIFY_SPEND_CAP_USD or no cap)'
+    )
+    parser.add_argument(
+        '--no-prompt-cache',
+        action='store_true',
+        help='Disable prompt-prefix caching of chunk batches'
+    )
+    parser.add_argument(
+        '--no-share-batches',
+        action='store_true',
+        help="Batch only each node's candidate chunks instead of the paper's shared chunk batches "
+             '(chunked mode only; skips non-candidate chunks, but nodes no longer share cached '
+             'prefixes)'
+    )
+    parser.add_argument(
+        '--no-early-stop',
+        action='store_true',
+        help='Score every candidate batch even after the top-k is settled (chunked mode only)'
+    )
+    parser.add_argument(
+        '--verbatim-shortcut',
+        action='store_true',
+        help='Skip LLM scoring for nodes whose text appears almost verbatim in a chunk '
+             '(chunked mode only)'
+    )
     parser.add_argument(
         '--no-cache',
         action='store_true',
@@ -100,14 +206,82 @@ Examples:
 
     args = parser.parse_args()
 
+    # Options that only change chunked search; any of them selects it in auto mode
+    chunked_options = [
+        option for option, enabled in (
+            ('--matrix', args.matrix),
+            ('--hierarchical', args.hierarchical),
+            ('--compact', args.compact),
+            ('--compress', args.compress),
+            ('--no-share-batches', args.no_share_batches),
+            ('--no-early-stop', args.no_early_stop),
+            ('--verbatim-shortcut', args.verbatim_shortcut),
+            # The cascade's cheap first pass only scores chunk batches
+            ('--backend cascade', args.backend == CascadeBackend.name)
+        )
+        if enabled
+    ]
+    if args.mode == 'whole' and chunked_options:
+        parser.error(f"--mode whole cannot be combined with chunked-mode options: "
+                     f"{', '.join(chunked_options)}")
+
     # Initialize components
     print("Initializing verification system...")
     zotero_db = ZoteroDatabase(args.zotero_db)
     pdf_extractor = PDFExtractor()
-    semantic_search = SemanticSearch()
+    ledger = UsageLedger()
+    compressor = ChunkCompressor() if args.compress else None
+    breaker = None
+    if args.backend in (ClaudeBackend.name, CascadeBackend.name):
+        # Rank locally instead of hanging on retries during API incidents
+        breaker = CircuitBreaker(spend_cap=args.spend_cap, ledger=ledger)
+    if args.backend == ClaudeBackend.name:
+        backend = ClaudeBackend(
+            use_prompt_cache=not args.no_prompt_cache,
+            ledger=ledger,
+            compressor=compressor,
+            compact=args.compact,
+            hedge=args.hedge,
+            breaker=breaker
+        )
+    elif args.backend == CascadeBackend.name:
+        backend = CascadeBackend(
+            use_prompt_cache=not args.no_prompt_cache,
+            ledger=ledger,
+            top_k=args.top_k,
+            compressor=compressor,
+            compact=args.compact,
+            hedge=args.hedge,
+            breaker=breaker
+        )
+    else:
+        backend = BACKENDS[args.backend]()
+    semantic_search = SemanticSearch(
+        backend=FallbackBackend(backend, breaker) if breaker else backend,
+        max_concurrency=args.concurrency,
+        adaptive_concurrency=not args.fixed_concurrency,
+        use_prompt_cache=not args.no_prompt_cache,
+        share_batches=not args.no_share_batches,
+        early_stop=not args.no_early_stop,
+        skip_llm_on_verbatim=args.verbatim_shortcut
+    )
     markdown_updater = MarkdownUpdater(EVIDENCE_DIR, ATTACHMENTS_DIR)
     cache_manager = CacheManager()
 
+    # Resolve every citekey up front: one index load and parallel file checks.
+    # If the lookup itself fails, each citekey reports the error below.
+    try:
+        pdf_attachments = zotero_db.find_pdfs_by_citekeys(args.citekeys)
+    except Exception as e:
+        pdf_attachments = {citekey: e for citekey in args.citekeys}
+    found = sum(not isinstance(result, Exception) for result in pdf_attachments.values())
+    print(f"Found PDFs for {found} of {len(pdf_attachments)} citekeys in Zotero")
+
+    # One event loop for the whole run: the async client's pooled
+    # connections belong to the loop that opened them, so they stay
+    # usable from one paper to the next
+    loop = asyncio.new_event_loop()
+
     # Process each citekey
     total_verified = 0
     total_failed = 0
@@ -120,7 +294,9 @@ Examples:
         try:
             # Step 1: Locate PDF in Zotero
             print(f"  [1/4] Locating PDF in Zotero...", end=' ')
-            pdf_attachment = zotero_db.find_pdf_by_citekey(citekey)
+            pdf_attachment = pdf_attachments[citekey]
+            if isinstance(pdf_attachment, Exception):
+                raise pdf_attachment
             print(f"✓")
             if args.verbose:
                 print(f"        PDF: {pdf_attachment.path}")
@@ -148,12 +324,27 @@ Examples:
                     Figure(**fig_data)
                     for fig_data in cached_extraction['figures']
                 ]
+                if cached_extraction.get('bm25_index'):
+                    lexical_index = BM25Index.from_dict(cached_extraction['bm25_index'])
+                else:
+                    # Cache written before indexes were persisted
+                    lexical_index = BM25Index.build(text_chunks)
+                if cached_extraction.get('page_digests'):
+                    page_digests = [
+                        PageDigest.from_dict(digest_data)
+                        for digest_data in cached_extraction['page_digests']
+                    ]
+                else:
+                    # Cache written before digests were persisted
+                    page_digests = build_page_digests(text_chunks)
             else:
                 text_chunks = pdf_extractor.extract_text_chunks(pdf_attachment.path)
                 figures = pdf_extractor.extract_figures_and_tables(
                     pdf_attachment.path,
                     ATTACHMENTS_DIR / citekey
                 )
+                lexical_index = BM25Index.build(text_chunks)
+                page_digests = build_page_digests(text_chunks)
                 print(f"✓ ({len(text_chunks)} chunks, {len(figures)} figures/tables)")
 
                 # Save to cache
@@ -162,7 +353,9 @@ Examples:
                     pdf_attachment.path,
                     text_chunks,
                     figures,
-                    {'page_count': pdf_extractor.get_page_count(pdf_attachment.path)}
+                    {'page_count': pdf_extractor.get_page_count(pdf_attachment.path)},
+                    lexical_index=lexical_index,
+                    page_digests=page_digests
                 )
 
             # Step 3: Get nodes to verify
@@ -191,26 +384,56 @@ Examples:
             # Step 4: Verify each node
             print(f"  [4/4] Finding relevant snippets...")
 
-            verified_count = 0
+            # Get node content
+            nodes_to_verify = []
             for node_id in node_ids:
-                if args.verbose:
-                    print(f"\n    Processing {node_id}...")
-
-                # Get node content
                 node_data = markdown_updater.get_node_content(citekey, node_id)
                 if not node_data:
                     print(f"    Warning: Could not extract content for {node_id}")
                     continue
-
-                # Find relevant chunks
-                scored_chunks = semantic_search.find_relevant_chunks(
-                    node_data['content'],
-                    node_data['type'],
-                    text_chunks,
-                    top_k=args.top_k
+                nodes_to_verify.append((node_id, node_data))
+
+            # Find relevant chunks for all nodes concurrently
+            search_options = {}
+            estimated_tokens = paper_tokens(text_chunks)
+            whole_paper = args.mode == 'whole' or (
+                args.mode == 'auto'
+                and not chunked_options
+                and args.backend == ClaudeBackend.name
+                and estimated_tokens <= WHOLE_PAPER_MAX_TOKENS
+            )
+            if whole_paper:
+                search = semantic_search.find_relevant_chunks_whole_paper
+                mode = "Whole-paper"
+            elif args.matrix:
+                search = semantic_search.find_relevant_chunks_matrix
+                mode = "Chunked (matrix)"
+            else:
+                search = semantic_search.find_relevant_chunks_for_nodes
+                mode = "Chunked"
+                if args.hierarchical:
+                    search_options['page_digests'] = page_digests
+                    mode = "Chunked (hierarchical)"
+            reason = f"~{estimated_tokens} tokens"
+            if args.mode == 'auto' and chunked_options:
+                reason += f", {', '.join(chunked_options)}"
+            print(f"    {mode} mode ({reason})")
+
+            with usage_labels(stage='verify', citekey=citekey):
+                all_scored_chunks = loop.run_until_complete(
+                    search(
+                        [{**node_data, 'id': node_id} for node_id, node_data in nodes_to_verify],
+                        text_chunks,
+                        top_k=args.top_k,
+                        lexical_index=lexical_index,
+                        **search_options
+                    )
                 )
 
+            verified_count = 0
+            for (node_id, node_data), scored_chunks in zip(nodes_to_verify, all_scored_chunks):
                 if args.verbose:
+                    print(f"\n    Processing {node_id}...")
                     print(f"    Found {len(scored_chunks)} relevant snippets")
                     for i, scored in enumerate(scored_chunks[:3], 1):
                         print(f"      {i}. Page {scored.chunk.page_num} (score: {scored.relevance_score:.1f})")
@@ -223,7 +446,8 @@ Examples:
                     metadata={
                         'verified_date': datetime.now().strftime('%Y-%m-%d'),
                         'chunks_searched': len(text_chunks),
-                        'figures_available': len(figures)
+                        'figures_available': len(figures),
+                        'ranked_locally': sum(scored.ranked_locally for scored in scored_chunks)
                     }
                 )
 
@@ -256,6 +480,11 @@ Examples:
                 traceback.print_exc()
             total_failed += 1
 
+    # Close the async client on its own loop before the loop goes away
+    loop.run_until_complete(semantic_search.backend.aclose())
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.close()
+
     # Summary
     print(f"\n{'='*60}")
     print(f"Summary:")
@@ -265,6 +494,87 @@ Examples:
         print(f"  Failures: {total_failed}")
     print(f"{'='*60}\n")
 
+    # Show scoring work
+    stats = semantic_search.stats
+    print(f"Scoring ({args.backend} backend):")
+    print(f"  Batches scored: {stats['batches_scored']} "
+          f"({stats['batches_skipped']} skipped by early stop)")
+    print(f"  Token-budget batching vs fixed {LEGACY_BATCH_SIZE}-chunk batches: "
+          f"{stats['requests_saved']} requests saved, {stats['requests_added']} added")
+    if stats['chunks_outside_shortlist']:
+        print(f"  Non-candidate chunks scored in shared batches: {stats['chunks_outside_shortlist']}")
+    if stats['hierarchical_nodes']:
+        print(f"  Hierarchical: {stats['hierarchical_nodes']} nodes, "
+              f"{stats['digest_batches']} digest batches, "
+              f"{stats['pages_drilled'] / stats['hierarchical_nodes']:.1f} pages drilled per node")
+    if stats['whole_paper_nodes'] or stats['whole_paper_fallbacks']:
+        print(f"  Whole-paper: {stats['whole_paper_nodes']} nodes answered, "
+              f"{stats['whole_paper_fallbacks']} searched by chunks instead, "
+              f"{stats['unaligned_quotes']} quotes not found in the text")
+    if args.verbatim_shortcut:
+        print(f"  Nodes matched verbatim (no LLM): {stats['verbatim_matches']}")
+    if breaker and semantic_search.backend.stats['chunks_local']:
+        fallback_stats = semantic_search.backend.stats
+        print(f"  Ranked locally: {fallback_stats['chunks_local']} chunks in "
+              f"{fallback_stats['batches_local']} batches "
+              f"(circuit breaker tripped {fallback_stats['circuit_trips']} times)")
+    print()
+
+    # Show API usage
+    usage = semantic_search.usage
+    if usage.get('requests'):
+        backend_stats = semantic_search.backend.stats
+        print(f"API usage:")
+        print(f"  Scoring requests: {usage['requests']}")
+        print(f"  Input tokens: {usage['input_tokens']} uncached, "
+              f"{usage['cache_read_input_tokens']} cache reads, "
+              f"{usage['cache_creation_input_tokens']} cache writes")
+        total_input = (
+            usage['input_tokens'] + usage['cache_read_input_tokens']
+            + usage['cache_creation_input_tokens']
+        )
+        if total_input:
+            print(f"  Cache-read share of input: "
+                  f"{usage['cache_read_input_tokens'] / total_input * 100:.0f}%")
+        print(f"  Output tokens: {usage['output_tokens']}")
+        print(f"  Truncations avoided: {stats['truncations_avoided']} fixed batches would have "
+              f"overflowed max_tokens at the observed output per chunk, "
+              f"{backend_stats['truncations_split']} recovered by splitting")
+        print(f"  Retries: {backend_stats['retries']} "
+              f"({backend_stats['failed_requests']} requests failed)")
+        print(f"  Partial re-scores: {backend_stats['partial_rescores']} "
+              f"({backend_stats['chunks_rescored']} chunks, "
+              f"{backend_stats['invalid_scores']} invalid scores dropped)")
+        if args.hedge:
+            print(f"  Hedged requests: {backend_stats['hedged_requests']} "
+                  f"({backend_stats['hedge_wins']} won by the backup)")
+        if semantic_search.limiter:
+            limiter = semantic_search.limiter
+            print(f"  Concurrency limit: {limiter.current_limit} now "
+                  f"(started at {args.concurrency}, peak {limiter.stats['peak_limit']}, "
+                  f"{limiter.stats['decreases']} cuts on rate limits)")
+        rate_limiter = default_rate_limiter()
+        if rate_limiter and rate_limiter.stats['delayed']:
+            print(f"  Shared rate limit: {rate_limiter.stats['delayed']} of "
+                  f"{rate_limiter.stats['acquired']} requests waited "
+                  f"({rate_limiter.stats['wait_seconds']:.1f}s total)")
+        if backend_stats['coalesced_requests']:
+            print(f"  Identical in-flight requests shared: {backend_stats['coalesced_requests']}")
+        if compressor and compressor.stats['tokens_before']:
+            compression = compressor.stats
+            saved = compression['tokens_before'] - compression['tokens_after']
+            print(f"  Compression: {compression['chunks_compressed']} chunks, "
+                  f"{compression['tokens_before']} -> {compression['tokens_after']} est. tokens "
+                  f"({saved / compression['tokens_before']:.0%} saved, "
+                  f"{compression['cache_hits']} reused)")
+        if isinstance(backend, CascadeBackend):
+            for model, model_usage in backend.model_usage().items():
+                print(f"  {model}: {model_usage['requests']} requests, "
+                      f"{model_usage['chunks']} chunks")
+        print()
+
+    ledger.print_summary()
+
     # Show cache stats
     if args.verbose:
         stats = cache_manager.get_cache_stats()
@@ -0,0 +1,134 @@
+"""Adaptive (AIMD) concurrency limit for async API requests."""
+
+import time
+import asyncio
+from collections import deque
+
+from .config import (
+    ADAPTIVE_MAX_CONCURRENCY,
+    ADAPTIVE_DECREASE_FACTOR,
+    ADAPTIVE_DECREASE_INTERVAL,
+    ADAPTIVE_LATENCY_TOLERANCE
+)
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency cap that adapts to the API's responses.
+
+    Works as a drop-in for asyncio.Semaphore (async with limiter: ...).
+    Each healthy response while the cap is in use raises it by 1/limit, so
+    about one slot per round of requests (additive increase). A response is
+    healthy when its latency stays within ADAPTIVE_LATENCY_TOLERANCE times
+    the running average. A 429 or overload response multiplies the cap by
+    ADAPTIVE_DECREASE_FACTOR (multiplicative decrease), at most once per
+    ADAPTIVE_DECREASE_INTERVAL seconds so one burst of errors counts once.
+    The limit is kept across event loops, so it carries over between papers.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = ADAPTIVE_MAX_CONCURRENCY
+    ):
+        """
+        Initialize limiter.
+
+        Args:
+            initial: Starting limit
+            min_limit: Lowest limit a decrease can reach
+            max_limit: Highest limit an increase can reach
+        """
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, initial)
+        self.limit = float(max(min_limit, initial))
+        self.in_flight = 0
+
+        self._waiters: deque = deque()
+        self._average_latency = None
+        self._decreased_at = float('-inf')
+
+        self.stats = {
+            'increases': 0,
+            'decreases': 0,
+            'peak_limit': int(self.limit)
+        }
+
+    @property
+    def current_limit(self) -> int:
+        """Requests allowed in flight right now."""
+        return int(self.limit)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    async def acquire(self):
+        """Wait for a free slot under the current limit."""
+        while self.in_flight >= self.current_limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken but cancelled before taking the slot: pass it on
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self):
+        """Free a slot."""
+        self.in_flight -= 1
+        self._wake()
+
+    def on_success(self, latency: float):
+        """
+        Report a successful request.
+
+        Args:
+            latency: Round trip of the request in seconds
+        """
+        healthy = (
+            self._average_latency is None
+            or latency <= ADAPTIVE_LATENCY_TOLERANCE * self._average_latency
+        )
+        self._average_latency = (
+            latency if self._average_latency is None
+            else 0.9 * self._average_latency + 0.1 * latency
+        )
+
+        # Only grow a limit that is actually the bottleneck
+        saturated = self._waiters or self.in_flight >= self.current_limit
+        if healthy and saturated and self.limit < self.max_limit:
+            previous = self.current_limit
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if self.current_limit > previous:
+                self.stats['increases'] += 1
+                self.stats['peak_limit'] = max(self.stats['peak_limit'], self.current_limit)
+                self._wake()
+
+    def on_overload(self):
+        """Report a rate-limit (429) or overload (529) response."""
+        now = time.monotonic()
+        if now - self._decreased_at < ADAPTIVE_DECREASE_INTERVAL:
+            return
+        self._decreased_at = now
+        self.limit = max(float(self.min_limit), self.limit * ADAPTIVE_DECREASE_FACTOR)
+        self.stats['decreases'] += 1
+
+    def _wake(self):
+        """Wake as many waiters as there are free slots."""
+        free = self.current_limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 
 from .config import PDF_CACHE_DIR, LLM_CACHE_DIR, CACHE_EXPIRY_DAYS
 from .pdf_extractor import TextChunk, Figure
+from .lexical_index import BM25Index
+from .page_digests import PageDigest
 
 
 class CacheManager:
@@ -76,7 +78,9 @@ class CacheManager:
         pdf_path: Path,
         text_chunks: List[TextChunk],
         figures: List[Figure],
-        metadata: Dict[str, Any]
+        metadata: Dict[str, Any],
+        lexical_index: Optional[BM25Index] = None,
+        page_digests: Optional[List[PageDigest]] = None
     ):
         """
         Save PDF extraction to cache.
@@ -87,6 +91,8 @@ class CacheManager:
             text_chunks: Extracted text chunks
             figures: Extracted figures
             metadata: Additional metadata
+            lexical_index: BM25 index built over text_chunks
+            page_digests: Per-page digests built from text_chunks
         """
         cache_file = self.pdf_cache_dir / f"{citekey}.json"
 
@@ -104,7 +110,8 @@ class CacheManager:
                     'content': chunk.content,
                     'page_num': chunk.page_num,
                     'chunk_id': chunk.chunk_id,
-                    'bbox': chunk.bbox
+                    'bbox': chunk.bbox,
+                    'token_count': chunk.token_count
                 }
                 for chunk in text_chunks
             ],
@@ -118,6 +125,8 @@ class CacheManager:
                 }
                 for fig in figures
             ],
+            'bm25_index': lexical_index.to_dict() if lexical_index else None,
+            'page_digests': [digest.to_dict() for digest in page_digests] if page_digests else None,
             'metadata': metadata
         }
 
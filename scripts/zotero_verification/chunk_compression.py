@@ -0,0 +1,106 @@
+"""Query-focused compression of chunks before they are sent to the scorer."""
+
+import hashlib
+from typing import List, Dict, Tuple
+
+from .pdf_extractor import TextChunk, estimate_tokens
+from .lexical_index import tokenize, split_sentences
+from .config import (
+    COMPRESSION_KEEP_SENTENCES,
+    COMPRESSION_CONTEXT_SENTENCES,
+    COMPRESSION_MIN_WORDS
+)
+
+
+class ChunkCompressor:
+    """
+    Trim chunks to the sentences that overlap most with a node.
+
+    The best COMPRESSION_KEEP_SENTENCES sentences by node term overlap are
+    kept with COMPRESSION_CONTEXT_SENTENCES neighbors on each side; gaps are
+    marked with "...". Chunks without any overlap keep their opening
+    sentences so the scorer still sees what they are about. Results are
+    cached per (node, chunk), so retries and re-scores reuse them.
+    """
+
+    def __init__(
+        self,
+        keep_sentences: int = COMPRESSION_KEEP_SENTENCES,
+        context_sentences: int = COMPRESSION_CONTEXT_SENTENCES,
+        min_words: int = COMPRESSION_MIN_WORDS
+    ):
+        """
+        Initialize compressor.
+
+        Args:
+            keep_sentences: Best-overlapping sentences kept per chunk
+            context_sentences: Neighboring sentences kept around each one
+            min_words: Chunks shorter than this are sent unchanged
+        """
+        self.keep_sentences = keep_sentences
+        self.context_sentences = context_sentences
+        self.min_words = min_words
+
+        self._cache: Dict[Tuple[str, str], str] = {}
+        self.stats = {
+            'chunks_compressed': 0,
+            'cache_hits': 0,
+            'tokens_before': 0,
+            'tokens_after': 0
+        }
+
+    def compress(self, node_content: str, chunk: TextChunk) -> str:
+        """
+        Return the part of a chunk worth sending for a node.
+
+        Args:
+            node_content: Node text
+            chunk: Chunk to compress
+
+        Returns:
+            Compressed chunk text
+        """
+        key = (hashlib.md5(node_content.encode()).hexdigest(), chunk.chunk_id)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.stats['cache_hits'] += 1
+            return cached
+
+        text = self._compress(set(tokenize(node_content)), chunk.content)
+
+        self._cache[key] = text
+        self.stats['chunks_compressed'] += 1
+        self.stats['tokens_before'] += chunk.token_count or estimate_tokens(chunk.content)
+        self.stats['tokens_after'] += estimate_tokens(text)
+        return text
+
+    def _compress(self, node_terms: set, content: str) -> str:
+        """Keep the best-overlapping sentences and their context windows."""
+        if len(content.split()) < self.min_words:
+            return content
+
+        sentences = split_sentences(content)
+        overlaps = [len(node_terms & set(tokenize(sentence))) for sentence in sentences]
+
+        if max(overlaps, default=0) == 0:
+            anchors = list(range(min(self.keep_sentences, len(sentences))))
+        else:
+            ranked = sorted(range(len(sentences)), key=lambda i: (-overlaps[i], i))
+            anchors = [i for i in ranked[:self.keep_sentences] if overlaps[i] > 0]
+
+        kept = set()
+        for i in anchors:
+            start = max(0, i - self.context_sentences)
+            kept.update(range(start, min(len(sentences), i + self.context_sentences + 1)))
+
+        parts: List[str] = []
+        previous = -1
+        for i in sorted(kept):
+            if i != previous + 1:
+                parts.append("...")
+            parts.append(sentences[i])
+            previous = i
+        if previous != len(sentences) - 1:
+            parts.append("...")
+
+        return " ".join(parts)
@@ -0,0 +1,143 @@
+"""Circuit breaker that stops LLM scoring during API incidents or over budget."""
+
+import time
+from typing import Optional
+
+from anthropic import RateLimitError
+
+from .usage_ledger import UsageLedger
+from .config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Track API health and spend, and refuse requests when either is bad.
+
+    After CIRCUIT_FAILURE_THRESHOLD consecutive failed attempts the circuit
+    opens for CIRCUIT_COOLDOWN seconds; the next request after that is let
+    through as the only probe and closes it again on success. Other requests
+    are refused while the probe is out (a probe that never reports back is
+    replaced after another cooldown). Rate-limit responses do not count as
+    failures, since backing off is the right answer to them. Once the
+    ledger's spend reaches spend_cap, the circuit stays open for the rest of
+    the run.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        cooldown: float = CIRCUIT_COOLDOWN,
+        spend_cap: Optional[float] = None,
+        ledger: Optional[UsageLedger] = None
+    ):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failed attempts that open the circuit
+            cooldown: Seconds the circuit stays open before a probe request
+            spend_cap: USD after which no more requests are sent (needs ledger)
+            ledger: Usage ledger whose recorded cost counts against spend_cap
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.spend_cap = spend_cap
+        self.ledger = ledger
+
+        self.state = 'closed'  # 'closed', 'open' or 'half_open'
+        self.reason: Optional[str] = None
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_sent_at = 0.0
+
+        self.stats = {
+            'trips': 0,
+            # Requests refused while open
+            'rejected': 0
+        }
+
+    def allow(self) -> bool:
+        """Check whether a request may be sent now, taking the probe slot if it is free."""
+        if self.is_open():
+            return False
+
+        if self.state in ('open', 'half_open'):
+            self.state = 'half_open'
+            self.probe_sent_at = time.monotonic()
+
+        return True
+
+    def is_open(self) -> bool:
+        """
+        Check whether requests are refused now, without taking the probe slot.
+
+        Counts a rejection when they are.
+        """
+        if self._over_budget() and self.reason != 'spend cap':
+            self._open('spend cap')
+
+        now = time.monotonic()
+        refused = (
+            self.reason == 'spend cap'
+            or (self.state == 'open' and now - self.opened_at < self.cooldown)
+            or (self.state == 'half_open' and now - self.probe_sent_at < self.cooldown)
+        )
+        if refused:
+            self.stats['rejected'] += 1
+        return refused
+
+    def check(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        if not self.allow():
+            raise CircuitOpenError(f"Claude scoring paused ({self.reason})")
+
+    def record_success(self):
+        """Close the circuit after a successful request (unless the spend cap is reached)."""
+        self.consecutive_failures = 0
+        if self.reason == 'spend cap':
+            return
+        if self.state == 'half_open':
+            print("  Claude scoring recovered; resuming LLM ranking")
+        self.state = 'closed'
+        self.reason = None
+
+    def record_failure(self, error: Optional[Exception] = None):
+        """
+        Count a failed attempt, opening the circuit at the threshold.
+
+        Args:
+            error: The attempt's error. Rate limits and refusals by this
+                breaker are not counted.
+        """
+        if isinstance(error, (RateLimitError, CircuitOpenError)) or self.reason == 'spend cap':
+            return
+
+        self.consecutive_failures += 1
+        if self.state == 'half_open' or (
+            self.state == 'closed' and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._open(f"{self.consecutive_failures} consecutive failures")
+
+    def _over_budget(self) -> bool:
+        """Check the ledger's spend against the cap."""
+        return (
+            self.spend_cap is not None
+            and self.ledger is not None
+            and self.ledger.cost_usd >= self.spend_cap
+        )
+
+    def _open(self, reason: str):
+        """Open the circuit."""
+        self.state = 'open'
+        self.reason = reason
+        self.opened_at = time.monotonic()
+        self.stats['trips'] += 1
+        if reason == 'spend cap':
+            print(f"Warning: Spend cap of ${self.spend_cap:.2f} reached; ranking locally from now on")
+        else:
+            print(f"Warning: Claude scoring unavailable ({reason}); "
+                  f"ranking locally for {self.cooldown:.0f}s")
@@ -0,0 +1,235 @@
+"""Citekey index of a Zotero library, built in one pass and kept on disk."""
+
+import re
+import json
+import sqlite3
+from pathlib import Path
+from typing import Optional, Dict, List, Any, Tuple
+from dataclasses import dataclass, field, asdict
+
+from .config import CITEKEY_INDEX_PATH
+
+
+CITATION_KEY_PATTERN = re.compile(r'Citation Key:\s*(\S+)')
+
+
+@dataclass
+class CitekeyEntry:
+    """One Zotero item of the index, with its metadata and PDF attachments."""
+    item_id: int
+    title: Optional[str] = None
+    date: Optional[str] = None
+    authors: List[str] = field(default_factory=list)
+    # (attachment item key, itemAttachments.path) of each PDF attachment
+    attachments: List[Tuple[str, str]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize entry for the index file."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CitekeyEntry':
+        """Deserialize entry from the index file."""
+        data = dict(data)
+        data['attachments'] = [tuple(attachment) for attachment in data.get('attachments', [])]
+        return cls(**data)
+
+
+class CitekeyIndex:
+    """
+    Map every citekey in a Zotero library to its item, metadata and PDFs.
+
+    The index is built with three whole-library queries (item fields,
+    creators, PDF attachments) instead of a LIKE scan per citekey, and
+    saved as JSON. A saved index is reused while the database file keeps
+    its mtime and size. When those change (Zotero touches the file on
+    every start), the items table's row count and latest modification
+    time decide whether the library actually changed; if not, the saved
+    index is kept and only its file fingerprint is updated.
+    """
+
+    def __init__(self, entries: Dict[str, CitekeyEntry], fingerprint: Dict[str, Any]):
+        """
+        Initialize index.
+
+        Args:
+            entries: Citekey -> entry
+            fingerprint: State of the database the entries were read from
+        """
+        self.entries = entries
+        self.fingerprint = fingerprint
+        self._folded: Optional[Dict[str, str]] = None
+
+    def resolve(self, citekey: str) -> Optional[str]:
+        """
+        Return the library's spelling of a citekey, or None if it is not in the library.
+
+        Exact matches win; otherwise keys are compared case-insensitively.
+        """
+        if citekey in self.entries:
+            return citekey
+        if self._folded is None:
+            self._folded = {}
+            for key in sorted(self.entries):
+                self._folded.setdefault(key.lower(), key)
+        return self._folded.get(citekey.lower())
+
+    def get(self, citekey: str) -> Optional[CitekeyEntry]:
+        """Return the entry for a citekey (see resolve), or None."""
+        key = self.resolve(citekey)
+        return self.entries[key] if key is not None else None
+
+    def citekeys(self) -> List[str]:
+        """All citekeys, sorted."""
+        return sorted(self.entries)
+
+    @classmethod
+    def load_or_build(
+        cls,
+        conn: sqlite3.Connection,
+        db_path: Path,
+        index_path: Optional[Path] = None
+    ) -> 'CitekeyIndex':
+        """
+        Load the saved index for db_path, rebuilding it if the library changed.
+
+        Args:
+            conn: Open connection to the Zotero database
+            db_path: Path of the Zotero database
+            index_path: Index file. Defaults to CITEKEY_INDEX_PATH.
+
+        Returns:
+            Current index of the library
+        """
+        index_path = index_path or CITEKEY_INDEX_PATH
+        file_state = _file_state(db_path)
+        saved = cls.load(index_path)
+
+        if saved is not None and saved.fingerprint.get('db_path') == file_state['db_path']:
+            if all(saved.fingerprint.get(key) == value for key, value in file_state.items()):
+                return saved
+            library_state = _library_state(conn)
+            if all(saved.fingerprint.get(key) == value for key, value in library_state.items()):
+                saved.fingerprint.update(file_state)
+                saved.save(index_path)
+                return saved
+
+        index = cls.build(conn)
+        index.fingerprint = {**file_state, **_library_state(conn)}
+        index.save(index_path)
+        return index
+
+    @classmethod
+    def build(cls, conn: sqlite3.Connection) -> 'CitekeyIndex':
+        """
+        Read every citekey of the library with its metadata and PDF attachments.
+
+        BetterBibTeX keys in the Extra field take precedence over the
+        citationKey field; when two items share a key, the older item wins.
+        """
+        fields: Dict[int, Dict[str, str]] = {}
+        rows = conn.execute("""
+        SELECT itemData.itemID, fields.fieldName, itemDataValues.value
+        FROM itemData
+        JOIN itemDataValues ON itemData.valueID = itemDataValues.valueID
+        JOIN fields ON itemData.fieldID = fields.fieldID
+        WHERE fields.fieldName IN ('extra', 'citationKey', 'title', 'date')
+        ORDER BY itemData.itemID
+        """)
+        for item_id, field_name, value in rows:
+            fields.setdefault(item_id, {})[field_name] = value
+
+        entries: Dict[str, CitekeyEntry] = {}
+        by_item: Dict[int, CitekeyEntry] = {}
+        keyed = []
+        for item_id, item_fields in fields.items():
+            match = CITATION_KEY_PATTERN.search(item_fields.get('extra') or '')
+            if match:
+                keyed.append((0, item_id, match.group(1)))
+            if item_fields.get('citationKey'):
+                keyed.append((1, item_id, item_fields['citationKey']))
+
+        for _, item_id, citekey in sorted(keyed):
+            if citekey in entries:
+                continue
+            entry = by_item.get(item_id)
+            if entry is None:
+                entry = by_item[item_id] = CitekeyEntry(
+                    item_id=item_id,
+                    title=fields[item_id].get('title'),
+                    date=fields[item_id].get('date')
+                )
+            entries[citekey] = entry
+
+        rows = conn.execute("""
+        SELECT itemCreators.itemID, creators.firstName, creators.lastName
+        FROM creators
+        JOIN itemCreators ON creators.creatorID = itemCreators.creatorID
+        ORDER BY itemCreators.itemID, itemCreators.orderIndex
+        """)
+        for item_id, first, last in rows:
+            entry = by_item.get(item_id)
+            name = f"{first or ''} {last or ''}".strip()
+            if entry is not None and name:
+                entry.authors.append(name)
+
+        rows = conn.execute("""
+        SELECT itemAttachments.parentItemID, items.key, itemAttachments.path
+        FROM itemAttachments
+        JOIN items ON itemAttachments.itemID = items.itemID
+        WHERE itemAttachments.contentType = 'application/pdf'
+        AND itemAttachments.path IS NOT NULL
+        ORDER BY itemAttachments.itemID
+        """)
+        for parent_id, key, path in rows:
+            entry = by_item.get(parent_id)
+            if entry is not None:
+                entry.attachments.append((key, path))
+
+        return cls(entries, {})
+
+    @classmethod
+    def load(cls, index_path: Path) -> Optional['CitekeyIndex']:
+        """Read a saved index, or None if there is none or it is unreadable."""
+        if not index_path.exists():
+            return None
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entries = {
+                citekey: CitekeyEntry.from_dict(entry)
+                for citekey, entry in data['entries'].items()
+            }
+            return cls(entries, data['fingerprint'])
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"Warning: Corrupted citekey index, rebuilding: {e}")
+            return None
+
+    def save(self, index_path: Path):
+        """Write the index to disk."""
+        data = {
+            'fingerprint': self.fingerprint,
+            'entries': {citekey: entry.to_dict() for citekey, entry in self.entries.items()}
+        }
+        try:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(index_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        except Exception as e:
+            print(f"Warning: Failed to save citekey index: {e}")
+
+
+def _file_state(db_path: Path) -> Dict[str, Any]:
+    """Path, mtime and size of the database file."""
+    stat = db_path.stat()
+    return {
+        'db_path': str(db_path.resolve()),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size
+    }
+
+
+def _library_state(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Item count and latest modification, which change with any edit to the library."""
+    row = conn.execute("SELECT COUNT(*), MAX(clientDateModified) FROM items").fetchone()
+    return {'items': row[0], 'modified': row[1]}
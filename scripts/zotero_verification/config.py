@@ -14,10 +14,16 @@ ATTACHMENTS_DIR = PROJECT_ROOT / "attachments" / "verification"
 CACHE_DIR = PROJECT_ROOT / ".cache"
 PDF_CACHE_DIR = CACHE_DIR / "pdf_extractions"
 LLM_CACHE_DIR = CACHE_DIR / "llm_scores"
+RESPONSE_CACHE_DIR = CACHE_DIR / "llm_responses"
+USAGE_LEDGER_PATH = CACHE_DIR / "usage_ledger.jsonl"
+RATE_LIMIT_DB_PATH = CACHE_DIR / "rate_limit.sqlite"
+CITEKEY_INDEX_PATH = CACHE_DIR / "zotero_citekeys.json"
 
 # Zotero configuration
 ZOTERO_DB_PATH = Path(os.getenv("ZOTERO_DB_PATH", "~/.zotero/zotero.sqlite")).expanduser()
 ZOTERO_STORAGE_PATH = Path(os.getenv("ZOTERO_STORAGE_PATH", "~/Zotero/storage")).expanduser()
+PDF_CHECK_WORKERS = 16  # Threads checking attachment files for existence in batch lookups
+ZOTERO_SQL_BATCH_SIZE = 500  # Item IDs per IN (...) query in batch lookups (old SQLite allows 999 parameters)
 
 # PDF extraction settings
 MAX_CHUNK_WORDS = 500
@@ -27,12 +33,105 @@ IMAGE_DPI = 300
 # LLM settings
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 DEFAULT_MODEL = "claude-sonnet-4-20250514"
-MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
+EXTRACTION_MODEL = DEFAULT_MODEL  # Model of the claims/evidence extraction scripts
+MAX_RETRIES = 5  # Attempts per request for transient errors (429, 5xx, connection)
+RETRY_DELAY = 2  # seconds, base of exponential backoff
+RETRY_MAX_DELAY = 60  # seconds, cap on a single backoff or retry-after wait
+MAX_CONCURRENT_REQUESTS = 5  # In-flight scoring requests for async search
+
+# Machine-wide API rate limit shared by every pipeline process (0 disables)
+RATE_LIMIT_RPM = int(os.getenv("ANTHROPIC_RATE_LIMIT_RPM", "0"))  # Requests per minute
+RATE_LIMIT_TPM = int(os.getenv("ANTHROPIC_RATE_LIMIT_TPM", "0"))  # Uncached input + output tokens per minute
+
+# Hedged scoring requests (async path, opt-in)
+HEDGE_PERCENTILE = 0.95  # Send a backup once a request is slower than this share of recent ones
+HEDGE_MIN_SAMPLES = 20  # Latencies observed before hedging starts
+HEDGE_WINDOW = 200  # Recent latencies the percentile is taken over
+HEDGE_MIN_DELAY = 1.0  # seconds, never hedge earlier than this
+HEDGE_BUDGET_RATIO = 0.05  # Backups allowed per primary request
+
+# Adaptive (AIMD) concurrency; MAX_CONCURRENT_REQUESTS is the starting limit
+ADAPTIVE_MAX_CONCURRENCY = 32  # Upper bound the limit can grow to
+ADAPTIVE_DECREASE_FACTOR = 0.5  # Limit multiplier on a 429 or overload response
+ADAPTIVE_DECREASE_INTERVAL = 5.0  # seconds, errors within this window after a cut count once
+ADAPTIVE_LATENCY_TOLERANCE = 2.0  # Latency up to this multiple of the average counts as healthy
+
+# Circuit breaker around LLM scoring (falls back to local lexical ranking)
+CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failed attempts (rate limits excluded) that open it
+CIRCUIT_COOLDOWN = 60  # seconds before a probe request may close it again
+SPEND_CAP_USD = float(os.getenv("VERIFY_SPEND_CAP_USD", "0")) or None  # Per verify run; unset for no cap
+
+# Model cascade (cheap first pass, default model for uncertain chunks)
+CASCADE_MODEL = "claude-3-5-haiku-20241022"
+CASCADE_BAND_LOW = 3.0  # First-pass scores below this are final (irrelevant)
+CASCADE_BAND_HIGH = 7.0  # Scores up to this are uncertain; above only escalate in the top_k
+
+# USD per million tokens, by usage field, for the usage ledger's cost estimates
+MODEL_PRICING = {
+    "claude-sonnet-4-20250514": {
+        'input_tokens': 3.00,
+        'output_tokens': 15.00,
+        'cache_creation_input_tokens': 3.75,
+        'cache_read_input_tokens': 0.30
+    },
+    "claude-3-5-haiku-20241022": {
+        'input_tokens': 0.80,
+        'output_tokens': 4.00,
+        'cache_creation_input_tokens': 1.00,
+        'cache_read_input_tokens': 0.08
+    }
+}
 
 # Search settings
 DEFAULT_TOP_K = 5
-KEYWORD_PREFILTER_RATIO = 0.5  # Keep top 50% after keyword filter
+
+# BM25 keyword pre-filter
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_MAX_CANDIDATES = 20  # Chunks kept for LLM scoring per node
+BM25_MIN_SCORE_RATIO = 0.2  # Drop candidates scoring below 20% of the best match
+
+# Early termination of batch scoring
+EARLY_STOP_SCORE = 9.0  # Stop once top_k chunks score at least this
+EARLY_STOP_MIN_RELEVANCE = 6.0  # ...or once the top_k all score at least this
+EARLY_STOP_LEXICAL_RATIO = 0.3  # ...and remaining BM25 scores fall below 30% of the top_k's
+VERBATIM_MATCH_RATIO = 0.9  # Share of node word trigrams found in a chunk to skip the LLM
+VERBATIM_CHECK_LIMIT = 5  # Top lexical candidates checked for verbatim matches
+
+# Local lexical scoring backend
+LEXICAL_COVERAGE_WEIGHT = 0.6  # Weight of node term coverage vs. word trigram overlap
+
+# Query-focused chunk compression
+COMPRESSION_KEEP_SENTENCES = 3  # Sentences with the most node term overlap kept per chunk
+COMPRESSION_CONTEXT_SENTENCES = 1  # Neighbors kept on each side of a kept sentence
+COMPRESSION_MIN_WORDS = 80  # Shorter chunks are sent unchanged
+
+# Batch packing for chunk scoring
+BATCH_INPUT_TOKEN_BUDGET = 20000  # Estimated chunk tokens per scoring request
+BATCH_MAX_OUTPUT_TOKENS = 4000  # max_tokens of a scoring request
+OUTPUT_TOKENS_PER_CHUNK = 60  # Estimated output tokens per scored chunk
+OUTPUT_TOKEN_HEADROOM = 0.8  # Share of max_tokens a batch may be expected to use
+LEGACY_BATCH_SIZE = 25  # Fixed batch size that requests_saved is measured against
+MISSING_SCORE_RETRIES = 2  # Follow-up requests for chunks a response left unscored
+
+# Hierarchical (page digest first) search of long papers
+PAGE_DIGEST_MAX_WORDS = 120  # Words of extractive summary kept per page
+HIERARCHICAL_MIN_PAGES = 12  # Shorter papers are scored chunk by chunk
+HIERARCHICAL_PAGE_SCORE = 5.0  # Digest score for a page to be scored at chunk level
+HIERARCHICAL_MIN_TOP_PAGES = 2  # Pages always drilled into, even below the score
+HIERARCHICAL_MAX_PAGES = 6  # Cap on pages drilled into per node
+
+# Whole-paper verification (one request per paper instead of per-node batches)
+WHOLE_PAPER_MAX_TOKENS = 30000  # Papers up to this many estimated tokens are sent whole in auto mode
+WHOLE_PAPER_MAX_NODES = 12  # Nodes per whole-paper request (more share the paper as a cached prefix)
+WHOLE_PAPER_MAX_OUTPUT_TOKENS = 8000  # max_tokens of a whole-paper request
+WHOLE_PAPER_MIN_ALIGNMENT = 0.6  # Share of a quote's word trigrams a chunk must contain
+
+# Matrix scoring (several nodes against one chunk batch per request)
+MATRIX_MAX_NODES = 10  # Nodes packed into one request
+MATRIX_INPUT_TOKEN_BUDGET = 30000  # Estimated prompt tokens per request
+MATRIX_MAX_OUTPUT_TOKENS = 8000
+MATRIX_OUTPUT_TOKENS_PER_SCORE = 25  # Estimated output tokens per matrix cell (one tool entry)
 
 # Cache settings
 CACHE_EXPIRY_DAYS = 30
@@ -0,0 +1,126 @@
+"""Hedged requests: send a duplicate when a call runs slower than usual."""
+
+import time
+import asyncio
+from collections import deque
+from typing import Optional, Callable, Awaitable, TypeVar
+
+from .config import (
+    HEDGE_PERCENTILE,
+    HEDGE_BUDGET_RATIO,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_WINDOW,
+    HEDGE_MIN_DELAY
+)
+
+
+T = TypeVar('T')
+
+
+class RequestHedger:
+    """
+    Issue a backup request once the primary exceeds a latency percentile.
+
+    The delay is the HEDGE_PERCENTILE of the last HEDGE_WINDOW successful
+    latencies (at least HEDGE_MIN_DELAY seconds); no hedging happens before
+    HEDGE_MIN_SAMPLES latencies are known. Backups are capped at
+    HEDGE_BUDGET_RATIO of primary requests, so hedging adds at most that
+    share of extra calls.
+    """
+
+    def __init__(
+        self,
+        percentile: float = HEDGE_PERCENTILE,
+        budget_ratio: float = HEDGE_BUDGET_RATIO,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        window: int = HEDGE_WINDOW,
+        min_delay: float = HEDGE_MIN_DELAY
+    ):
+        """
+        Initialize hedger.
+
+        Args:
+            percentile: Latency percentile (0-1) after which to hedge
+            budget_ratio: Maximum backups per primary request
+            min_samples: Latencies needed before hedging starts
+            window: Number of recent latencies kept
+            min_delay: Lower bound on the hedging delay in seconds
+        """
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latencies = deque(maxlen=window)
+
+        self.stats = {
+            'requests': 0,
+            'hedged': 0,
+            # Backups that returned before their primary
+            'hedge_wins': 0
+        }
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while too few latencies are known."""
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def _may_hedge(self) -> bool:
+        """Check the hedging budget."""
+        return self.stats['hedged'] < self.budget_ratio * self.stats['requests']
+
+    async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run request(), hedging with a second call if it is slow.
+
+        The first successful response wins and the other call is cancelled.
+        If one call fails, the other is still awaited. Calls still running
+        when run() returns or is cancelled are cancelled and awaited.
+
+        Args:
+            request: Function starting the API call
+
+        Returns:
+            The winning response
+        """
+        self.stats['requests'] += 1
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(request())
+        tasks = [primary]
+        try:
+            delay = self.delay()
+            if delay is None:
+                return await self._timed(primary, started)
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._may_hedge():
+                return await self._timed(primary, started)
+
+            self.stats['hedged'] += 1
+            backup = asyncio.ensure_future(request())
+            tasks.append(backup)
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.stats['hedge_wins'] += 1
+                        return await self._timed(task, started)
+            # Both failed: re-raise the primary's error
+            return primary.result()
+        finally:
+            # Also reached when the caller is cancelled mid-wait
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def _timed(self, task: 'asyncio.Future[T]', started: float) -> T:
+        """Await a call and remember its latency if it succeeded."""
+        result = await task
+        self.latencies.append(time.perf_counter() - started)
+        return result
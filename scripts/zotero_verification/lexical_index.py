@@ -0,0 +1,248 @@
+"""BM25 inverted index over the text chunks of a PDF."""
+
+import math
+import re
+from typing import List, Dict, Optional, Tuple, Any
+
+from .pdf_extractor import TextChunk
+from .config import BM25_K1, BM25_B
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # Vectorized scoring is optional
+    np = None
+    sparse = None
+
+
+STOP_WORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'been',
+    'be', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+    'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these',
+    'those', 'we', 'they', 'our', 'their', 'not', 'its', 'than', 'also'
+}
+
+# Scores are rounded before ranking so that summation order (Python loop vs
+# sparse matrix multiply) cannot reorder ties
+SCORE_DECIMALS = 9
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase index terms, dropping stop words and short tokens."""
+    return [
+        word for word in re.findall(r'\b\w+\b', text.lower())
+        if len(word) > 2 and word not in STOP_WORDS
+    ]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences at ., ! or ? followed by whitespace."""
+    return [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+
+
+def word_shingles(text: str, size: int = 3) -> set:
+    """Set of word n-grams of a text, ignoring case and punctuation."""
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class BM25Index:
+    """Okapi BM25 index built once per PDF and persisted with its chunks."""
+
+    def __init__(
+        self,
+        chunk_ids: List[str],
+        doc_lengths: List[int],
+        postings: Dict[str, Dict[int, int]],
+        k1: float = BM25_K1,
+        b: float = BM25_B
+    ):
+        """
+        Initialize index from precomputed postings.
+
+        Args:
+            chunk_ids: Chunk IDs in document order
+            doc_lengths: Number of terms in each chunk
+            postings: Term -> {chunk position: term frequency}
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.chunk_ids = chunk_ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        self.k1 = k1
+        self.b = b
+
+        num_docs = len(chunk_ids)
+        self.avg_doc_length = (sum(doc_lengths) / num_docs) if num_docs else 0.0
+
+        # Precompute IDF per term so queries only do lookups
+        self.idf = {
+            term: math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+        # Sparse chunk x term weight matrix, built on first vectorized query
+        self._term_ids: Optional[Dict[str, int]] = None
+        self._weights = None
+
+    @classmethod
+    def build(cls, chunks: List[TextChunk]) -> 'BM25Index':
+        """
+        Build index from text chunks.
+
+        Args:
+            chunks: All text chunks of a PDF
+
+        Returns:
+            BM25Index over the chunks
+        """
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_lengths = []
+
+        for position, chunk in enumerate(chunks):
+            terms = tokenize(chunk.content)
+            doc_lengths.append(len(terms))
+            for term in terms:
+                docs = postings.setdefault(term, {})
+                docs[position] = docs.get(position, 0) + 1
+
+        return cls([chunk.chunk_id for chunk in chunks], doc_lengths, postings)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Rank chunks for a query.
+
+        Args:
+            query: Query text
+            limit: Maximum number of results
+
+        Returns:
+            (chunk_id, score) pairs for chunks sharing at least one term with
+            the query, highest score first (document order breaks ties)
+        """
+        scores: Dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+
+            for position, tf in docs.items():
+                scores[position] = scores.get(position, 0.0) + self._term_weight(term, position, tf)
+
+        ranked = sorted(
+            ((position, round(score, SCORE_DECIMALS)) for position, score in scores.items()),
+            key=lambda item: (-item[1], item[0])
+        )
+        if limit is not None:
+            ranked = ranked[:limit]
+
+        return [(self.chunk_ids[position], score) for position, score in ranked]
+
+    def search_many(
+        self,
+        queries: List[str],
+        limit: Optional[int] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Rank chunks for many queries at once.
+
+        With NumPy/SciPy installed, every query is scored by a single sparse
+        matrix multiply against the chunk x term weight matrix; otherwise each
+        query goes through search(). Rankings are the same either way.
+
+        Args:
+            queries: Query texts (e.g. one per node of a paper)
+            limit: Maximum number of results per query
+
+        Returns:
+            One ranked list of (chunk_id, score) pairs per query
+        """
+        if sparse is None or not queries or not self.chunk_ids:
+            return [self.search(query, limit) for query in queries]
+
+        term_ids, weights = self._weight_matrix()
+
+        # Binary query x term matrix (each query term counts once, as in search)
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            for term in set(tokenize(query)):
+                col = term_ids.get(term)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+
+        query_matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(queries), len(term_ids))
+        )
+        scores = np.round((query_matrix @ weights.T).toarray(), SCORE_DECIMALS)
+
+        results = []
+        for row_scores in scores:
+            positions = np.flatnonzero(row_scores > 0)
+            # Highest score first, document order breaks ties
+            order = positions[np.lexsort((positions, -row_scores[positions]))]
+            if limit is not None:
+                order = order[:limit]
+            results.append([(self.chunk_ids[p], float(row_scores[p])) for p in order])
+
+        return results
+
+    def _term_weight(self, term: str, position: int, tf: int) -> float:
+        """BM25 weight of a term in one chunk."""
+        length_norm = 1 - self.b + self.b * self.doc_lengths[position] / (self.avg_doc_length or 1)
+        return self.idf[term] * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+    def _weight_matrix(self):
+        """Build (once) the sparse chunk x term matrix of BM25 weights."""
+        if self._weights is None:
+            term_ids = {term: i for i, term in enumerate(sorted(self.postings))}
+            rows, cols, data = [], [], []
+            for term, docs in self.postings.items():
+                col = term_ids[term]
+                for position, tf in docs.items():
+                    rows.append(position)
+                    cols.append(col)
+                    data.append(self._term_weight(term, position, tf))
+
+            self._term_ids = term_ids
+            self._weights = sparse.csr_matrix(
+                (data, (rows, cols)),
+                shape=(len(self.chunk_ids), len(term_ids))
+            )
+
+        return self._term_ids, self._weights
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize index for the PDF extraction cache."""
+        return {
+            'chunk_ids': self.chunk_ids,
+            'doc_lengths': self.doc_lengths,
+            # JSON object keys must be strings
+            'postings': {
+                term: {str(position): tf for position, tf in docs.items()}
+                for term, docs in self.postings.items()
+            },
+            'k1': self.k1,
+            'b': self.b
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BM25Index':
+        """Deserialize index from the PDF extraction cache."""
+        postings = {
+            term: {int(position): tf for position, tf in docs.items()}
+            for term, docs in data['postings'].items()
+        }
+        return cls(
+            data['chunk_ids'],
+            data['doc_lengths'],
+            postings,
+            k1=data.get('k1', BM25_K1),
+            b=data.get('b', BM25_B)
+        )
@@ -0,0 +1,401 @@
+"""One gateway for every Claude request the pipeline sends.
+
+Scoring backends and the extraction scripts used to build their own clients
+and repeat the same steps around messages.create. LLMGateway does those
+steps once: pooled clients, retries, circuit breaker, shared rate limit,
+concurrency limits, hedging, usage metrics and the response cache.
+"""
+
+import re
+import json
+import time
+import asyncio
+from contextlib import nullcontext
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from anthropic import Anthropic, AsyncAnthropic
+
+from .retry import call_with_retries, call_with_retries_async, is_overload
+from .usage_ledger import UsageLedger, LedgerCall
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .hedging import RequestHedger
+from .adaptive_limiter import AdaptiveLimiter
+from .rate_limiter import default_rate_limiter, estimate_request_tokens
+from .response_cache import ResponseCache
+from .config import ANTHROPIC_API_KEY
+
+
+def extract_json(text: str, container: str = '['):
+    """
+    Parse the outermost JSON array (container='[') or object ('{') in a response.
+
+    Returns:
+        Parsed JSON, or None if the text contains no such container
+
+    Raises:
+        json.JSONDecodeError: If the matched text is not valid JSON
+    """
+    pattern = r'\[.*\]' if container == '[' else r'\{.*\}'
+    match = re.search(pattern, text, re.DOTALL)
+    if match is None:
+        return None
+    return json.loads(match.group(0))
+
+
+class LLMGateway:
+    """
+    Send Claude requests through one pair of pooled clients.
+
+    The sync and async clients are created once per process (see
+    default_gateway), so every request reuses the SDK's keep-alive
+    connection pool instead of opening connections per backend or script.
+    The async client is tied to the event loop it was opened on: it is
+    closed when that loop shuts down its async generators (asyncio.run does
+    this) or on aclose(), and a new one is opened for the next loop.
+
+    Each request goes through the same steps: circuit breaker check, the
+    machine-wide rate limit, the caller's concurrency limit, the call itself
+    (optionally hedged), and retries for transient errors (see retry.py).
+    Latency and retries are written to the caller's LedgerCall.
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Initialize gateway.
+
+        Args:
+            api_key: Anthropic API key. Defaults to config value.
+        """
+        self.api_key = api_key or ANTHROPIC_API_KEY
+        # Machine-wide rate limit shared with other processes, if configured
+        self.rate_limiter = default_rate_limiter()
+
+        self._client: Optional[Anthropic] = None
+        self._async_client: Optional[AsyncAnthropic] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_lifetime: Optional[AsyncGenerator] = None
+
+        self.stats = {
+            'requests': 0,
+            # Hedged backup requests (also counted in requests)
+            'backups': 0,
+            # Async clients opened (one per event loop)
+            'async_pools': 0
+        }
+
+    @property
+    def client(self) -> Anthropic:
+        """Shared sync client; retries are handled by the gateway."""
+        if self._client is None:
+            self._client = Anthropic(api_key=self.api_key, max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncAnthropic:
+        """Shared async client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            # Pooled connections belong to the loop that opened them
+            self._async_client = AsyncAnthropic(api_key=self.api_key, max_retries=0)
+            self._async_loop = loop
+            self._async_lifetime = self._close_with_loop(self._async_client)
+            self.stats['async_pools'] += 1
+        return self._async_client
+
+    @staticmethod
+    def _close_with_loop(client: AsyncAnthropic) -> AsyncGenerator:
+        """
+        Close client when the running loop shuts down its async generators.
+
+        The loop only keeps a weak reference to the returned generator, so
+        the caller must hold on to it.
+        """
+        async def lifetime():
+            try:
+                yield
+            finally:
+                await client.close()
+
+        generator = lifetime()
+        asyncio.ensure_future(generator.__anext__())
+        return generator
+
+    async def aclose(self):
+        """
+        Close the async client and its pooled connections.
+
+        Call on the event loop that used the client, before that loop
+        closes; the next async request opens a new client.
+        """
+        if self._async_client is not None:
+            client, lifetime = self._async_client, self._async_lifetime
+            self._async_client = None
+            self._async_loop = None
+            self._async_lifetime = None
+            await client.close()
+            await lifetime.aclose()
+
+    def create(
+        self,
+        call: Optional[LedgerCall] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        **request
+    ):
+        """
+        Send a messages request, retrying transient API errors.
+
+        Args:
+            call: Ledger entry that receives latency and retries
+            breaker: Circuit breaker checked before every attempt and told
+                about every retried failure
+            **request: Keyword arguments for messages.create
+
+        Returns:
+            API response
+
+        Raises:
+            The last error once retries are exhausted or the error is not
+            retryable, or CircuitOpenError while the breaker is open
+        """
+        call = call or LedgerCall()
+
+        def send():
+            if breaker is not None:
+                breaker.check()
+            estimated = estimate_request_tokens(**request)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(estimated)
+            self.stats['requests'] += 1
+            started = time.perf_counter()
+            try:
+                response = self.client.messages.create(**request)
+            except Exception:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.refund(estimated)
+                raise
+            call.latency = time.perf_counter() - started
+            if self.rate_limiter is not None:
+                self.rate_limiter.settle(estimated, response)
+            return response
+
+        return call_with_retries(send, on_retry=self._retry_hook(call, breaker))
+
+    async def create_async(
+        self,
+        call: Optional[LedgerCall] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        hedger: Optional[RequestHedger] = None,
+        **request
+    ):
+        """
+        Async version of create.
+
+        Args:
+            call: Ledger entry that receives latency and retries
+            breaker: Circuit breaker checked before every attempt
+            semaphore: Cap on in-flight requests. Backoff sleeps and
+                rate-limit waits happen outside it so other requests can
+                proceed. An AdaptiveLimiter is told about every response.
+            hedger: Sends a backup for attempts slower than usual; the
+                backup shares the attempt's semaphore slot but takes its own
+                share of the rate limit
+            **request: Keyword arguments for messages.create
+        """
+        call = call or LedgerCall()
+        return await call_with_retries_async(
+            lambda: self._attempt_async(call, breaker, semaphore, hedger, request),
+            on_retry=self._retry_hook(call, breaker)
+        )
+
+    async def _attempt_async(
+        self,
+        call: LedgerCall,
+        breaker: Optional[CircuitBreaker],
+        semaphore: Optional[asyncio.Semaphore],
+        hedger: Optional[RequestHedger],
+        request: Dict[str, Any]
+    ):
+        """Send one attempt of an async request."""
+        # Taken before the semaphore slot, so requests waiting for the shared
+        # rate limit do not hold slots that others could use
+        estimated = estimate_request_tokens(**request)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(estimated)
+
+        calls = 0
+
+        def send():
+            nonlocal calls
+            calls += 1
+            if calls > 1:
+                self.stats['backups'] += 1
+            # The primary call uses the rate limit taken above
+            return self._send_async(request, estimated, acquire=calls > 1)
+
+        async with semaphore if semaphore is not None else nullcontext():
+            # Checked after queueing, so waiting requests stop once the circuit opens
+            if breaker is not None:
+                try:
+                    breaker.check()
+                except CircuitOpenError:
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.refund_async(estimated, requests=1)
+                    raise
+
+            started = time.perf_counter()
+            try:
+                response = await (send() if hedger is None else hedger.run(send))
+            except Exception as e:
+                if isinstance(semaphore, AdaptiveLimiter) and is_overload(e):
+                    semaphore.on_overload()
+                raise
+            call.latency = time.perf_counter() - started
+
+            if isinstance(semaphore, AdaptiveLimiter):
+                semaphore.on_success(call.latency)
+
+        return response
+
+    async def _send_async(self, request: Dict[str, Any], estimated: int, acquire: bool):
+        """
+        Send one call of an attempt and settle its share of the rate limit.
+
+        Args:
+            request: Keyword arguments for messages.create
+            estimated: Estimated tokens of the call
+            acquire: Take the rate limit first (hedged backups); otherwise
+                the attempt already took it
+        """
+        if acquire and self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(estimated)
+        self.stats['requests'] += 1
+        try:
+            response = await self.async_client.messages.create(**request)
+        except BaseException:
+            # Failed or cancelled (e.g. the losing call of a hedge)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.refund_async(estimated)
+            raise
+        if self.rate_limiter is not None:
+            await self.rate_limiter.settle_async(estimated, response)
+        return response
+
+    def create_text(
+        self,
+        cache: Optional[ResponseCache] = None,
+        ledger: Optional[UsageLedger] = None,
+        **request
+    ) -> str:
+        """
+        Return the response text for a messages request, using the response cache.
+
+        Args:
+            cache: Response cache consulted before and filled after the call
+            ledger: Usage ledger that records every call, including cache
+                hits. Defaults to the cache's ledger.
+            **request: Keyword arguments for messages.create
+
+        Returns:
+            Text of the first content block of the response
+        """
+        if ledger is None and cache is not None:
+            ledger = cache.ledger
+
+        if cache is None:
+            return self._fetch_text(None, None, ledger, request)
+
+        cache_key = cache.make_key(**request)
+        if not cache.refresh:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                cache.hits += 1
+                if ledger is not None:
+                    ledger.record(request.get('model'), outcome='cached')
+                return cached['text']
+
+        return self._fetch_text(cache, cache_key, ledger, request)
+
+    def _fetch_text(
+        self,
+        cache: Optional[ResponseCache],
+        cache_key: Optional[str],
+        ledger: Optional[UsageLedger],
+        request: Dict[str, Any]
+    ) -> str:
+        """Call the API for a cache miss and save the response."""
+        if cache is not None:
+            cache.misses += 1
+        track = (
+            ledger.call(request.get('model'))
+            if ledger is not None else nullcontext(LedgerCall())
+        )
+        with track as call:
+            call.response = self.create(call=call, **request)
+            if getattr(call.response, 'stop_reason', None) == 'max_tokens':
+                call.outcome = 'truncated'
+        response_text = call.response.content[0].text
+
+        # A truncated response would be replayed on every later run
+        if cache is not None and call.outcome != 'truncated':
+            cache.save(cache_key, request, response_text)
+        return response_text
+
+    def create_json(
+        self,
+        json_container: str = '[',
+        cache: Optional[ResponseCache] = None,
+        ledger: Optional[UsageLedger] = None,
+        **request
+    ):
+        """
+        Return the JSON array or object of a response (see create_text and extract_json).
+
+        A response without parsable JSON is evicted from the cache, so the
+        next run asks again instead of replaying it.
+
+        Args:
+            json_container: '[' for an array, '{' for an object
+            cache: Response cache consulted before and filled after the call
+            ledger: Usage ledger that records every call
+            **request: Keyword arguments for messages.create
+
+        Returns:
+            Parsed JSON, or None if the response holds none
+        """
+        response_text = self.create_text(cache=cache, ledger=ledger, **request)
+        try:
+            parsed = extract_json(response_text, json_container)
+        except json.JSONDecodeError:
+            parsed = None
+
+        if parsed is None and cache is not None:
+            cache.invalidate(cache.make_key(**request))
+        return parsed
+
+    def _retry_hook(self, call: LedgerCall, breaker: Optional[CircuitBreaker]):
+        """
+        on_retry callback counting the failure on the breaker and the retry on call.
+
+        Raises CircuitOpenError instead of retrying once the breaker is open,
+        so requests that were already in flight stop without waiting out
+        their backoff.
+        """
+        def on_retry(error: Exception, delay: float):
+            if breaker is not None:
+                breaker.record_failure(error)
+                if breaker.is_open():
+                    raise CircuitOpenError(f"Claude scoring paused ({breaker.reason})") from error
+            call.count_retry(error, delay)
+        return on_retry
+
+
+_default_gateway: Optional[LLMGateway] = None
+
+
+def default_gateway() -> LLMGateway:
+    """The process-wide gateway, created on first use."""
+    global _default_gateway
+    if _default_gateway is None:
+        _default_gateway = LLMGateway()
+    return _default_gateway
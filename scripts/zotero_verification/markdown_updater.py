@@ -157,6 +157,9 @@ class MarkdownUpdater:
         sections.append("\n**Search Metadata:**")
         sections.append(f"- Verified: {snippets.metadata.get('verified_date', 'Unknown')}")
         sections.append(f"- Chunks searched: {snippets.metadata.get('chunks_searched', 0)}")
+        if snippets.metadata.get('ranked_locally'):
+            sections.append(f"- Ranking: local keyword match for {snippets.metadata['ranked_locally']} "
+                            f"of {len(snippets.text_quotes)} quotes (Claude unavailable or over budget)")
 
         snippets_found = []
         if snippets.text_quotes:
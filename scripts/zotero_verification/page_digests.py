@@ -0,0 +1,104 @@
+"""Compact extractive digests of PDF pages for coarse-to-fine retrieval."""
+
+import math
+from collections import Counter
+from typing import List, Dict, Any
+from dataclasses import dataclass, asdict
+
+from .pdf_extractor import TextChunk, estimate_tokens
+from .lexical_index import tokenize, split_sentences
+from .config import PAGE_DIGEST_MAX_WORDS
+
+
+@dataclass
+class PageDigest:
+    """The most informative sentences of one PDF page."""
+    page_num: int
+    content: str
+    token_count: int
+
+    def as_chunk(self) -> TextChunk:
+        """Present the digest as a chunk so scoring backends can rate it."""
+        return TextChunk(
+            content=self.content,
+            page_num=self.page_num,
+            chunk_id=f"page-{self.page_num}",
+            token_count=self.token_count
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize digest for the PDF extraction cache."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PageDigest':
+        """Deserialize digest from the PDF extraction cache."""
+        return cls(**data)
+
+
+def build_page_digests(chunks: List[TextChunk], max_words: int = PAGE_DIGEST_MAX_WORDS) -> List[PageDigest]:
+    """
+    Build one digest per page from its chunks, without any LLM calls.
+
+    Sentences are weighted by how characteristic their terms are of the page
+    (term frequency on the page times inverse page frequency across the
+    paper), and the best ones are kept in reading order up to max_words.
+
+    Args:
+        chunks: All text chunks of a PDF
+        max_words: Word budget per digest
+
+    Returns:
+        Digests in page order
+    """
+    page_sentences: Dict[int, List[str]] = {}
+    for chunk in chunks:
+        sentences = page_sentences.setdefault(chunk.page_num, [])
+        for sentence in split_sentences(chunk.content):
+            # Chunks overlap, so the same sentence can appear twice
+            if sentence not in sentences:
+                sentences.append(sentence)
+
+    page_terms = {
+        page: Counter(term for sentence in sentences for term in tokenize(sentence))
+        for page, sentences in page_sentences.items()
+    }
+    page_frequency = Counter(term for terms in page_terms.values() for term in terms)
+    num_pages = len(page_terms)
+
+    digests = []
+    for page, sentences in sorted(page_sentences.items()):
+        terms = page_terms[page]
+
+        def weight(sentence: str) -> float:
+            sentence_terms = set(tokenize(sentence))
+            if not sentence_terms:
+                return 0.0
+            total = sum(
+                terms[term] * math.log(1 + num_pages / page_frequency[term])
+                for term in sentence_terms
+            )
+            # Favor dense sentences over merely long ones
+            return total / math.sqrt(len(sentence.split()))
+
+        ranked = sorted(range(len(sentences)), key=lambda i: (-weight(sentences[i]), i))
+
+        kept = []
+        words = 0
+        for i in ranked:
+            length = len(sentences[i].split())
+            if kept and words + length > max_words:
+                continue
+            kept.append(i)
+            words += length
+            if words >= max_words:
+                break
+
+        content = " ".join(sentences[i] for i in sorted(kept))
+        if len(content.split()) > max_words:
+            # A single sentence longer than the budget
+            content = " ".join(content.split()[:max_words]) + " ..."
+
+        digests.append(PageDigest(page_num=page, content=content, token_count=estimate_tokens(content)))
+
+    return digests
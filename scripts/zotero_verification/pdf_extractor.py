@@ -10,6 +10,11 @@ import fitz  # PyMuPDF
 from .config import MAX_CHUNK_WORDS, CHUNK_OVERLAP_WORDS, IMAGE_DPI
 
 
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of LLM tokens in a text (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
 @dataclass
 class TextChunk:
     """A semantic chunk of text from a PDF."""
@@ -17,6 +22,7 @@ class TextChunk:
     page_num: int
     chunk_id: str
     bbox: Optional[Tuple[float, float, float, float]] = None  # (x0, y0, x1, y1)
+    token_count: Optional[int] = None  # Estimated LLM tokens in content
 
 
 @dataclass
@@ -148,7 +154,8 @@ class PDFExtractor:
                 chunks.append(TextChunk(
                     content=chunk_text,
                     page_num=page_num,
-                    chunk_id=chunk_id
+                    chunk_id=chunk_id,
+                    token_count=estimate_tokens(chunk_text)
                 ))
 
                 # Keep overlap words for context
@@ -166,7 +173,8 @@ class PDFExtractor:
             chunks.append(TextChunk(
                 content=chunk_text,
                 page_num=page_num,
-                chunk_id=chunk_id
+                chunk_id=chunk_id,
+                token_count=estimate_tokens(chunk_text)
             ))
 
         return chunks
@@ -0,0 +1,234 @@
+"""Machine-wide request and token rate limit shared by all pipeline processes."""
+
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from .config import RATE_LIMIT_DB_PATH, RATE_LIMIT_RPM, RATE_LIMIT_TPM
+
+
+def estimate_request_tokens(**request) -> int:
+    """Roughly estimate the input tokens of a messages request (about 4 characters per token)."""
+    prompt = {key: request.get(key) for key in ('system', 'messages', 'tools')}
+    return max(1, len(json.dumps(prompt, default=str)) // 4)
+
+
+def response_tokens(response) -> int:
+    """Tokens of a response that count against the rate limit (cache reads do not)."""
+    usage = getattr(response, 'usage', None)
+    return sum(
+        getattr(usage, field, 0) or 0
+        for field in ('input_tokens', 'cache_creation_input_tokens', 'output_tokens')
+    )
+
+
+class RateLimiter:
+    """
+    Token buckets for requests and tokens per minute, stored in SQLite.
+
+    Every process on the machine (verify, the extraction scripts, processes
+    spawned by the Obsidian plugin) takes from the same buckets before each
+    API call, so parallel jobs share the account's quota instead of all
+    hitting 429s at once. Buckets refill continuously at their per-minute
+    rate and hold at most one minute's worth. A call takes its estimated
+    input tokens up front; settle() corrects the bucket with the actual
+    usage once the response is in.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        requests_per_minute: int = RATE_LIMIT_RPM,
+        tokens_per_minute: int = RATE_LIMIT_TPM
+    ):
+        """
+        Initialize rate limiter.
+
+        Args:
+            path: SQLite file holding the buckets. Defaults to RATE_LIMIT_DB_PATH.
+            requests_per_minute: Request rate; 0 for no request limit
+            tokens_per_minute: Token rate; 0 for no token limit
+        """
+        self.path = path or RATE_LIMIT_DB_PATH
+        self.rates = {
+            name: float(rate)
+            for name, rate in (('requests', requests_per_minute), ('tokens', tokens_per_minute))
+            if rate > 0
+        }
+        self.stats = {
+            'acquired': 0,
+            # Calls that had to wait for the buckets, and total seconds waited
+            'delayed': 0,
+            'wait_seconds': 0.0
+        }
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Block until one request and tokens can be taken.
+
+        Args:
+            tokens: Estimated tokens of the call
+
+        Returns:
+            Seconds waited
+        """
+        waited = 0.0
+        while True:
+            wait = self._take(tokens)
+            if wait <= 0:
+                return self._count(waited)
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: int) -> float:
+        """
+        Async version of acquire.
+
+        The SQLite transaction runs in a worker thread, so a busy database
+        (up to the 30s lock timeout) does not block the event loop.
+        """
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(self._take, tokens)
+            if wait <= 0:
+                return self._count(waited)
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def settle(self, estimated: int, response):
+        """
+        Correct the token bucket once a call's actual usage is known.
+
+        Args:
+            estimated: Tokens taken by acquire
+            response: API response whose usage replaces the estimate
+        """
+        if 'tokens' not in self.rates or getattr(response, 'usage', None) is None:
+            return
+        self._update({'tokens': response_tokens(response) - estimated}, force=True)
+
+    async def settle_async(self, estimated: int, response):
+        """Async version of settle, run in a worker thread like acquire_async."""
+        await asyncio.to_thread(self.settle, estimated, response)
+
+    def refund(self, estimated: int, requests: int = 0):
+        """
+        Return what acquire took for a call that failed or was never sent.
+
+        Args:
+            estimated: Tokens taken by acquire
+            requests: Requests to return as well (1 if the call was not sent)
+        """
+        self._update({'tokens': -estimated, 'requests': -requests}, force=True)
+
+    async def refund_async(self, estimated: int, requests: int = 0):
+        """Async version of refund, run in a worker thread like acquire_async."""
+        await asyncio.to_thread(self.refund, estimated, requests)
+
+    def _count(self, waited: float) -> float:
+        """Record one acquired call."""
+        self.stats['acquired'] += 1
+        if waited:
+            self.stats['delayed'] += 1
+            self.stats['wait_seconds'] += waited
+        return waited
+
+    def _take(self, tokens: int) -> float:
+        """Take one request and tokens if available; otherwise return seconds to wait."""
+        return self._update({'requests': 1, 'tokens': tokens})
+
+    def _update(self, costs: Dict[str, float], force: bool = False) -> float:
+        """
+        Refill the buckets and take costs from them in one transaction.
+
+        Without force, nothing is taken unless every bucket can cover its
+        cost (capped at the bucket size, so oversized calls wait for a full
+        bucket instead of forever). With force, costs are applied as they
+        are and may leave a bucket negative or refund it.
+
+        Returns:
+            Seconds until the costs can be covered, or 0 if they were taken
+        """
+        costs = {name: cost for name, cost in costs.items() if name in self.rates and cost}
+        if not costs:
+            return 0.0
+
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = time.time()
+                    levels = {name: self._level(conn, name, now) for name in costs}
+
+                    wait = 0.0
+                    if not force:
+                        for name, cost in costs.items():
+                            rate = self.rates[name]
+                            shortfall = min(cost, rate) - levels[name]
+                            if shortfall > 0:
+                                wait = max(wait, shortfall * 60 / rate)
+
+                    if wait == 0.0:
+                        for name, cost in costs.items():
+                            levels[name] = min(self.rates[name], levels[name] - cost)
+
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO buckets (name, level, updated) VALUES (?, ?, ?)",
+                        [(name, level, now) for name, level in levels.items()]
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            return wait
+        except sqlite3.Error as e:
+            print(f"Warning: Rate limiter unavailable, calling without it: {e}")
+            self.rates = {}
+            return 0.0
+
+    def _level(self, conn: sqlite3.Connection, name: str, now: float) -> float:
+        """Current fill of a bucket, refilled for the time since its last update."""
+        rate = self.rates[name]
+        row = conn.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return rate
+        level, updated = row
+        return min(rate, level + max(0.0, now - updated) * rate / 60)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the shared database on first use."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit mode; transactions are opened explicitly
+            self._conn = sqlite3.connect(
+                str(self.path), timeout=30, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+            )
+        return self._conn
+
+
+_default_limiter: Optional[RateLimiter] = None
+
+
+def default_rate_limiter() -> Optional[RateLimiter]:
+    """
+    The process-wide limiter configured by ANTHROPIC_RATE_LIMIT_RPM and
+    ANTHROPIC_RATE_LIMIT_TPM, or None when neither is set.
+    """
+    global _default_limiter
+    if not (RATE_LIMIT_RPM > 0 or RATE_LIMIT_TPM > 0):
+        return None
+    if _default_limiter is None:
+        _default_limiter = RateLimiter()
+    return _default_limiter
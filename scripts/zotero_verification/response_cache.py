@@ -0,0 +1,144 @@
+"""Persistent cache for raw LLM responses used by the extraction scripts."""
+
+import json
+import hashlib
+from pathlib import Path
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+
+from .config import RESPONSE_CACHE_DIR, CACHE_EXPIRY_DAYS
+from .usage_ledger import UsageLedger
+
+
+class ResponseCache:
+    """
+    Cache Claude responses keyed by model, prompt hash and generation parameters.
+
+    Requests go through LLMGateway.create_text, which reads and fills the cache.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        refresh: bool = False,
+        ledger: Optional[UsageLedger] = None
+    ):
+        """
+        Initialize response cache.
+
+        Args:
+            cache_dir: Directory for cached responses
+            refresh: If True, ignore cached responses (fresh ones are still saved)
+            ledger: Usage ledger that records every call, including cache hits
+        """
+        self.cache_dir = cache_dir or RESPONSE_CACHE_DIR
+        self.refresh = refresh
+        self.ledger = ledger
+        self.hits = 0
+        self.misses = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def make_key(self, **request) -> str:
+        """
+        Generate cache key for a messages request.
+
+        The prompt (messages and system prompt) is hashed separately so the key
+        stays short; every other argument counts as a generation parameter.
+        """
+        prompt = {
+            'system': request.get('system'),
+            'messages': request.get('messages')
+        }
+        prompt_hash = hashlib.sha256(
+            json.dumps(prompt, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+        params = {
+            k: v for k, v in request.items()
+            if k not in ('model', 'system', 'messages')
+        }
+
+        key_str = json.dumps({
+            'model': request.get('model'),
+            'prompt_hash': prompt_hash,
+            'params': params
+        }, sort_keys=True)
+
+        return hashlib.sha256(key_str.encode('utf-8')).hexdigest()[:32]
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve cached response if present and not expired.
+
+        Args:
+            cache_key: Key from make_key
+
+        Returns:
+            Cached response data or None
+        """
+        cache_file = self.cache_dir / f"{cache_key}.json"
+
+        if not cache_file.exists():
+            return None
+
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cache_data = json.load(f)
+
+            # Check expiry
+            cached_date = datetime.fromisoformat(cache_data['cached_at'])
+            if datetime.now() > cached_date + timedelta(days=CACHE_EXPIRY_DAYS):
+                cache_file.unlink()
+                return None
+
+            return cache_data
+
+        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            print(f"Warning: Corrupted response cache file {cache_key}: {e}")
+            cache_file.unlink()
+            return None
+
+    def save(self, cache_key: str, request: Dict[str, Any], response_text: str):
+        """
+        Save response text to cache.
+
+        Args:
+            cache_key: Key from make_key
+            request: The request that produced the response
+            response_text: Response text to cache
+        """
+        cache_file = self.cache_dir / f"{cache_key}.json"
+
+        cache_data = {
+            'model': request.get('model'),
+            'params': {
+                k: v for k, v in request.items()
+                if k not in ('model', 'system', 'messages')
+            },
+            'text': response_text,
+            'cached_at': datetime.now().isoformat()
+        }
+
+        try:
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                json.dump(cache_data, f, indent=2)
+        except Exception as e:
+            print(f"Warning: Failed to save response cache for {cache_key}: {e}")
+
+    def invalidate(self, cache_key: str):
+        """
+        Remove one cached response, e.g. one the caller could not parse.
+
+        Args:
+            cache_key: Key from make_key
+        """
+        cache_file = self.cache_dir / f"{cache_key}.json"
+        if cache_file.exists():
+            cache_file.unlink()
+
+    def clear(self):
+        """Remove all cached responses."""
+        for cache_file in self.cache_dir.glob("*.json"):
+            cache_file.unlink()
+        print("Cleared all response cache")
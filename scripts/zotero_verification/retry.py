@@ -0,0 +1,138 @@
+"""Error-class-aware retries for Claude API requests."""
+
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional, Callable, Awaitable, TypeVar
+
+from anthropic import APIStatusError, APIConnectionError
+
+from .config import MAX_RETRIES, RETRY_DELAY, RETRY_MAX_DELAY
+
+
+T = TypeVar('T')
+
+# Status codes worth retrying: timeout, conflict, rate limit, server errors
+# (including 529 overloaded). Any other 4xx fails fast.
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+# Status codes that mean the client should slow down: rate limit,
+# unavailable, overloaded
+OVERLOAD_STATUS_CODES = {429, 503, 529}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether a request error may succeed if sent again."""
+    if isinstance(error, APIConnectionError):  # Includes timeouts
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def is_overload(error: Exception) -> bool:
+    """Check whether an error says we are sending too much (429, 503, 529)."""
+    return isinstance(error, APIStatusError) and error.status_code in OVERLOAD_STATUS_CODES
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Read the server-requested wait from a rate-limit or overload response.
+
+    Returns:
+        Seconds to wait, or None if the response carries no retry-after header
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get('retry-after')
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # HTTP date form
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(error: Exception, attempt: int) -> float:
+    """
+    Seconds to wait before retry number attempt + 1.
+
+    A retry-after header wins; otherwise the delay grows exponentially from
+    RETRY_DELAY with full jitter, so concurrent requests do not retry in step.
+    """
+    requested = retry_after(error)
+    if requested is not None:
+        return min(requested, RETRY_MAX_DELAY)
+
+    ceiling = min(RETRY_MAX_DELAY, RETRY_DELAY * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def call_with_retries(
+    request: Callable[[], T],
+    max_retries: int = MAX_RETRIES,
+    on_retry: Optional[Callable[[Exception, float], None]] = None
+) -> T:
+    """
+    Call request(), retrying transient API errors.
+
+    Args:
+        request: Function sending the API request
+        max_retries: Total attempts
+        on_retry: Called with the error and delay before each retry
+
+    Returns:
+        The result of request()
+
+    Raises:
+        The last error once attempts are exhausted, or immediately for
+        errors that cannot succeed on retry (e.g. 400 or 401)
+    """
+    for attempt in range(max_retries):
+        try:
+            return request()
+        except Exception as e:
+            if not is_retryable(e) or attempt == max_retries - 1:
+                raise
+            delay = backoff_delay(e, attempt)
+            if on_retry:
+                on_retry(e, delay)
+            time.sleep(delay)
+
+
+async def call_with_retries_async(
+    request: Callable[[], Awaitable[T]],
+    max_retries: int = MAX_RETRIES,
+    on_retry: Optional[Callable[[Exception, float], None]] = None
+) -> T:
+    """Async version of call_with_retries."""
+    for attempt in range(max_retries):
+        try:
+            return await request()
+        except Exception as e:
+            if not is_retryable(e) or attempt == max_retries - 1:
+                raise
+            delay = backoff_delay(e, attempt)
+            if on_retry:
+                on_retry(e, delay)
+            await asyncio.sleep(delay)
@@ -0,0 +1,1824 @@
+"""Scoring backends that rate PDF chunks for relevance to a node.
+
+SemanticSearch decides which chunks to score and in what batches; a backend
+turns one (node, chunk batch) pair into ScoredChunk objects. ClaudeBackend
+asks Claude, LexicalBackend scores locally by term overlap, and FakeBackend
+returns deterministic scores for tests and benchmarks. FallbackBackend wraps
+an LLM backend and ranks locally while a circuit breaker holds it off.
+"""
+
+import json
+import asyncio
+import hashlib
+from contextlib import nullcontext
+from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass, replace
+
+from .pdf_extractor import TextChunk, estimate_tokens
+from .lexical_index import tokenize, word_shingles
+from .usage_ledger import UsageLedger, LedgerCall, usage_labels
+from .chunk_compression import ChunkCompressor
+from .hedging import RequestHedger
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .single_flight import AsyncSingleFlight
+from .llm_gateway import LLMGateway, default_gateway
+from .config import (
+    DEFAULT_MODEL,
+    BATCH_MAX_OUTPUT_TOKENS,
+    MISSING_SCORE_RETRIES,
+    MATRIX_MAX_NODES,
+    MATRIX_INPUT_TOKEN_BUDGET,
+    MATRIX_MAX_OUTPUT_TOKENS,
+    MATRIX_OUTPUT_TOKENS_PER_SCORE,
+    LEXICAL_COVERAGE_WEIGHT,
+    DEFAULT_TOP_K,
+    CASCADE_MODEL,
+    CASCADE_BAND_LOW,
+    CASCADE_BAND_HIGH,
+    WHOLE_PAPER_MAX_NODES,
+    WHOLE_PAPER_MAX_OUTPUT_TOKENS
+)
+
+
+# Forced tool call for batch scoring; scores are addressed by chunk ID so
+# omitted or reordered entries cannot land on the wrong chunk
+SCORE_TOOL = {
+    "name": "record_scores",
+    "description": "Record a relevance score for each PDF passage.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "scores": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "chunk_id": {
+                            "type": "string",
+                            "description": "ID from the passage label, e.g. p3-chunk-2"
+                        },
+                        "score": {"type": "number", "minimum": 0, "maximum": 10},
+                        "reasoning": {"type": "string"}
+                    },
+                    "required": ["chunk_id", "score", "reasoning"]
+                }
+            }
+        },
+        "required": ["scores"]
+    }
+}
+
+# Compact protocol: scores only, reasoning fetched later for the final top_k
+COMPACT_SCORE_TOOL = {
+    "name": "record_scores",
+    "description": "Record a relevance score for each PDF passage.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "scores": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "chunk_id": {"type": "string"},
+                        "score": {"type": "number", "minimum": 0, "maximum": 10}
+                    },
+                    "required": ["chunk_id", "score"]
+                }
+            }
+        },
+        "required": ["scores"]
+    }
+}
+
+# Matrix scoring: one score per (node, chunk) pair, addressed by node number
+# and chunk ID; reasoning is fetched for the final top_k afterwards
+MATRIX_TOOL = {
+    "name": "record_matrix",
+    "description": "Record a relevance score for each pair of node and PDF passage.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "scores": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "node": {"type": "integer", "description": "Number from the node label"},
+                        "chunk_id": {"type": "string"},
+                        "score": {"type": "number", "minimum": 0, "maximum": 10}
+                    },
+                    "required": ["node", "chunk_id", "score"]
+                }
+            }
+        },
+        "required": ["scores"]
+    }
+}
+
+# Follow-up call explaining the relevance of the selected chunks
+REASON_TOOL = {
+    "name": "record_reasoning",
+    "description": "Record a brief explanation of each PDF passage's relevance.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "reasons": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "chunk_id": {"type": "string"},
+                        "reasoning": {"type": "string"}
+                    },
+                    "required": ["chunk_id", "reasoning"]
+                }
+            }
+        },
+        "required": ["reasons"]
+    }
+}
+
+# Whole-paper verification: verbatim quotes per node, aligned to chunks locally
+PASSAGES_TOOL = {
+    "name": "record_passages",
+    "description": "Record the passages of the paper most relevant to each node.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "nodes": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "node": {"type": "integer", "description": "Number from the node label"},
+                        "passages": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "quote": {
+                                        "type": "string",
+                                        "description": "Passage copied verbatim from the paper"
+                                    },
+                                    "page": {"type": "integer"},
+                                    "score": {"type": "number", "minimum": 0, "maximum": 10},
+                                    "reasoning": {"type": "string"}
+                                },
+                                "required": ["quote", "page", "score", "reasoning"]
+                            }
+                        }
+                    },
+                    "required": ["node", "passages"]
+                }
+            }
+        },
+        "required": ["nodes"]
+    }
+}
+
+
+
+@dataclass
+class ScoredChunk:
+    """A text chunk with relevance score and reasoning."""
+    chunk: TextChunk
+    relevance_score: float  # 0-10
+    reasoning: str
+    ranked_locally: bool = False  # Scored by the local fallback instead of the LLM
+    # 'scored', 'not_scored' (the response left the chunk out) or 'failed'
+    # (its request failed); the last two carry a placeholder score of 0.0
+    status: str = 'scored'
+
+    @property
+    def rank(self) -> Tuple[bool, float]:
+        """Sort key: every LLM score ranks above every locally ranked one."""
+        return (not self.ranked_locally, self.relevance_score)
+
+
+@dataclass
+class Passage:
+    """A verbatim quote a model picked from the whole paper for a node."""
+    quote: str
+    page: Optional[int]
+    relevance_score: float  # 0-10
+    reasoning: str
+
+
+class ScoringBackend:
+    """Interface for scoring a batch of chunks against one node."""
+
+    name = "base"
+
+    def __init__(self):
+        # Token usage and backend-specific counters, shown in the verify report
+        self.usage: Dict[str, int] = {}
+        self.stats: Dict[str, int] = {}
+
+    def begin_run(self):
+        """Reset per-run state before scoring the nodes of a paper."""
+
+    async def aclose(self):
+        """Release async resources; call on the event loop that used them, before it closes."""
+
+    def score(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ) -> List[ScoredChunk]:
+        """
+        Score a batch of chunks.
+
+        Args:
+            node_content: Node text
+            node_type: Node type (Evidence, Claim, etc.)
+            chunks: Batch of chunks to score
+
+        Returns:
+            One ScoredChunk per chunk, in batch order
+        """
+        raise NotImplementedError
+
+    async def score_async(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[ScoredChunk]:
+        """Async version of score. Local backends just score inline."""
+        return self.score(node_content, node_type, chunks)
+
+    def explain(
+        self,
+        node_content: str,
+        node_type: str,
+        selected: List[ScoredChunk]
+    ) -> List[ScoredChunk]:
+        """
+        Fill in reasoning for selected chunks scored without it.
+
+        Args:
+            node_content: Node text
+            node_type: Node type (Evidence, Claim, etc.)
+            selected: Final top_k of a node
+
+        Returns:
+            The selected chunks, in the same order and with the same scores
+        """
+        return selected
+
+    async def explain_async(
+        self,
+        node_content: str,
+        node_type: str,
+        selected: List[ScoredChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[ScoredChunk]:
+        """Async version of explain."""
+        return self.explain(node_content, node_type, selected)
+
+    async def locate_passages_async(
+        self,
+        nodes: List[Dict],
+        pages: Dict[int, str],
+        top_k: int,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> Optional[List[Optional[List[Passage]]]]:
+        """
+        Pick the top_k passages per node from the whole paper text.
+
+        Args:
+            nodes: Node dicts with 'content' and 'type' keys
+            pages: Page number -> page text (see whole_paper.page_texts)
+            top_k: Passages wanted per node
+            chunks: The paper's chunks, which the pages were built from
+            semaphore: Cap on in-flight requests
+
+        Returns:
+            One passage list per node (None for nodes the response did not
+            cover), or None if the backend cannot read whole papers
+        """
+        return None
+
+    async def score_matrix_async(
+        self,
+        nodes: List[Dict],
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[List[ScoredChunk]]:
+        """
+        Score one chunk batch against several nodes.
+
+        Args:
+            nodes: Node dicts with 'content' and 'type' keys
+            chunks: Batch of chunks to score
+            semaphore: Cap on in-flight requests
+
+        Returns:
+            One list of ScoredChunk objects per node, in input order
+        """
+        return list(await asyncio.gather(*[
+            self.score_async(node['content'], node['type'], chunks, semaphore)
+            for node in nodes
+        ]))
+
+
+class ClaudeBackend(ScoringBackend):
+    """Score chunks with Claude."""
+
+    name = "claude"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        use_prompt_cache: bool = True,
+        ledger: Optional[UsageLedger] = None,
+        model: str = DEFAULT_MODEL,
+        compressor: Optional[ChunkCompressor] = None,
+        compact: bool = False,
+        hedge: bool = False,
+        breaker: Optional[CircuitBreaker] = None,
+        gateway: Optional[LLMGateway] = None
+    ):
+        """
+        Initialize backend with Claude API.
+
+        Args:
+            api_key: Anthropic API key. Defaults to config value.
+            use_prompt_cache: Mark the chunk block as a cacheable prompt prefix
+            ledger: Usage ledger that records every request
+            model: Model that scores chunks
+            compressor: Trims each chunk to the sentences relevant to the
+                node. The chunk block then differs per node, so it is no
+                longer marked as a shared cached prefix.
+            compact: Ask for scores only (no per-chunk reasoning) and fetch
+                reasoning for the final top_k afterwards (see explain)
+            hedge: Send a backup for async requests that run slower than
+                usual and keep whichever returns first (see RequestHedger)
+            breaker: Circuit breaker consulted before every attempt and told
+                about every failure; requests fail at once while it is open
+            gateway: Sends the requests. Defaults to the process-wide
+                gateway, or a new one for an explicit api_key.
+        """
+        super().__init__()
+        self.gateway = gateway or (LLMGateway(api_key) if api_key else default_gateway())
+        self.use_prompt_cache = use_prompt_cache
+        self.ledger = ledger
+        self.model = model
+        self.compressor = compressor
+        self.compact = compact
+        self.hedger = RequestHedger() if hedge else None
+        self.breaker = breaker
+
+        # Token usage accumulated over all requests of this instance
+        self.usage = {
+            'requests': 0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'cache_creation_input_tokens': 0,
+            'cache_read_input_tokens': 0
+        }
+
+        self.stats = {
+            # Responses cut off at max_tokens and re-scored in halves
+            'truncations_split': 0,
+            # Follow-up requests for chunks a response left unscored
+            'partial_rescores': 0,
+            'chunks_rescored': 0,
+            # Tool-call entries rejected by validation
+            'invalid_scores': 0,
+            # Requests re-sent after transient errors, and requests given up on
+            'retries': 0,
+            'failed_requests': 0,
+            # Backup requests sent for slow calls, and backups that won
+            'hedged_requests': 0,
+            'hedge_wins': 0,
+            # Requests answered by an identical request already in flight
+            'coalesced_requests': 0,
+            # Output tokens of scoring responses and the chunks they were
+            # asked to score (observed output tokens per chunk)
+            'score_output_tokens': 0,
+            'score_output_chunks': 0
+        }
+
+        self._in_flight = AsyncSingleFlight()
+
+        # Chunk prefixes already sent in the current async run
+        self._warm_prefixes: Dict[str, asyncio.Event] = {}
+
+    def begin_run(self):
+        """Forget warmed prefixes; their events belong to the previous event loop."""
+        self._warm_prefixes = {}
+
+    async def aclose(self):
+        """Close the gateway's async client and its pooled connections."""
+        await self.gateway.aclose()
+
+    def score(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ) -> List[ScoredChunk]:
+        """
+        Score a batch of chunks using LLM.
+
+        Chunks the response leaves unscored (or scores invalidly) are sent
+        again on their own, up to MISSING_SCORE_RETRIES times. If a request
+        fails, only its chunks are zero-scored; scores already received for
+        the rest of the batch are kept.
+
+        Args:
+            node_content: Node text
+            node_type: Node type (Evidence, Claim, etc.)
+            chunks: Batch of chunks to score
+
+        Returns:
+            List of ScoredChunk objects
+        """
+        scored: Dict[str, ScoredChunk] = {}
+        pending = chunks
+        status = 'not_scored'
+
+        for round_num in range(MISSING_SCORE_RETRIES + 1):
+            if round_num:
+                self.stats['partial_rescores'] += 1
+                self.stats['chunks_rescored'] += len(pending)
+
+            response = self._request_scores(node_content, node_type, pending)
+            if response is None:
+                status = 'failed'
+                break
+            self._observe_output(response, pending)
+
+            if self._is_truncated(response, pending):
+                # Output did not fit; score each half separately
+                middle = len(pending) // 2
+                for half in (pending[:middle], pending[middle:]):
+                    for scored_chunk in self.score(node_content, node_type, half):
+                        scored[scored_chunk.chunk.chunk_id] = scored_chunk
+                break
+
+            scored.update(self._parse_tool_scores(response, pending))
+            pending = [chunk for chunk in pending if chunk.chunk_id not in scored]
+            if not pending:
+                break
+
+        return self._build_scored_chunks(chunks, scored, status)
+
+    def _request_scores(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ):
+        """
+        Send one scoring request, retrying transient API errors.
+
+        Rate limits honor the retry-after header, overload and connection
+        errors back off exponentially with jitter, and other client errors
+        fail at once (see retry.py).
+
+        Returns:
+            API response, or None if every attempt failed
+        """
+        content = self._build_scoring_prompt(node_content, node_type, chunks)
+        return self._send_tool_request(content, self._score_tool(), 'score', chunks)
+
+    def _send_tool_request(
+        self,
+        content: List[Dict],
+        tool: Dict,
+        request_type: str,
+        chunks: List[TextChunk]
+    ):
+        """
+        Send a request that forces a tool call, retrying transient API errors.
+
+        Returns:
+            API response, or None if every attempt failed
+        """
+        with self._track(request_type) as call:
+            request = {
+                'model': self.model,
+                'max_tokens': BATCH_MAX_OUTPUT_TOKENS,
+                'temperature': 0,
+                'tools': [tool],
+                'tool_choice': {"type": "tool", "name": tool["name"]},
+                'messages': [{
+                    "role": "user",
+                    "content": content
+                }]
+            }
+
+            try:
+                call.response = self.gateway.create(call=call, breaker=self.breaker, **request)
+            except Exception as e:
+                self._fail_call(call, e, f"Failed to {request_type} {len(chunks)} chunks")
+
+            if getattr(call.response, 'stop_reason', None) == 'max_tokens':
+                call.outcome = 'truncated'
+
+        return self._finish_call(call)
+
+    async def score_async(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[ScoredChunk]:
+        """
+        Score a batch of chunks using the async client.
+
+        Args:
+            node_content: Node text
+            node_type: Node type (Evidence, Claim, etc.)
+            chunks: Batch of chunks to score
+            semaphore: Cap on in-flight requests
+
+        Returns:
+            List of ScoredChunk objects
+        """
+        scored: Dict[str, ScoredChunk] = {}
+        pending = chunks
+        status = 'not_scored'
+
+        for round_num in range(MISSING_SCORE_RETRIES + 1):
+            if round_num:
+                self.stats['partial_rescores'] += 1
+                self.stats['chunks_rescored'] += len(pending)
+
+            response, shared = await self._request_scores_async(
+                node_content, node_type, pending, semaphore
+            )
+            if response is None:
+                status = 'failed'
+                break
+            if not shared:
+                self._observe_output(response, pending)
+
+            if self._is_truncated(response, pending, count=not shared):
+                middle = len(pending) // 2
+                halves = await asyncio.gather(
+                    self.score_async(node_content, node_type, pending[:middle], semaphore),
+                    self.score_async(node_content, node_type, pending[middle:], semaphore)
+                )
+                for scored_chunk in halves[0] + halves[1]:
+                    scored[scored_chunk.chunk.chunk_id] = scored_chunk
+                break
+
+            scored.update(self._parse_tool_scores(response, pending, count=not shared))
+            pending = [chunk for chunk in pending if chunk.chunk_id not in scored]
+            if not pending:
+                break
+
+        return self._build_scored_chunks(chunks, scored, status)
+
+    async def _request_scores_async(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ):
+        """
+        Send one scoring request on the async client, retrying transient API errors.
+
+        Returns:
+            (API response or None if every attempt failed, whether the
+            response was shared from another caller's request)
+        """
+        content = self._build_scoring_prompt(node_content, node_type, chunks)
+        return await self._send_tool_request_async(
+            content, self._score_tool(), 'score', chunks, semaphore
+        )
+
+    async def _send_tool_request_async(
+        self,
+        content: List[Dict],
+        tool: Dict,
+        request_type: str,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore,
+        max_tokens: int = BATCH_MAX_OUTPUT_TOKENS
+    ):
+        """
+        Async version of _send_tool_request.
+
+        Identical requests already in flight (e.g. two nodes with the same
+        text scored against the same batch) are not sent again; the callers
+        share the first request's response, which is recorded once.
+
+        Returns:
+            (API response or None if every attempt failed, whether the
+            response was shared from another caller's request). Callers
+            skip counting what they parse from a shared response, since the
+            caller that sent it counts it.
+        """
+        key = self._request_key(content, tool)
+        sent = False
+
+        def send():
+            nonlocal sent
+            sent = True
+            return self._send_tool_request_once_async(
+                content, tool, request_type, chunks, semaphore, max_tokens
+            )
+
+        response = await self._in_flight.do(key, send)
+        self.stats['coalesced_requests'] = self._in_flight.stats['coalesced']
+        return response, not sent
+
+    async def _send_tool_request_once_async(
+        self,
+        content: List[Dict],
+        tool: Dict,
+        request_type: str,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore,
+        max_tokens: int
+    ):
+        """Send one tool request on the async client, retrying transient API errors."""
+        with self._track(request_type) as call:
+            try:
+                call.response = await self._create_message_async(
+                    content, max_tokens, chunks, semaphore, call,
+                    tools=[tool],
+                    tool_choice={"type": "tool", "name": tool["name"]}
+                )
+            except Exception as e:
+                self._fail_call(call, e, f"Failed to {request_type} {len(chunks)} chunks")
+
+            if getattr(call.response, 'stop_reason', None) == 'max_tokens':
+                call.outcome = 'truncated'
+
+        return self._finish_call(call)
+
+    async def _create_message_async(
+        self,
+        content: List[Dict],
+        max_tokens: int,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore,
+        call: Optional[LedgerCall] = None,
+        **request
+    ):
+        """
+        Send a scoring request through the gateway, retrying transient API errors.
+
+        With prompt caching, the first request for a chunk batch is sent alone
+        and concurrent requests for the same batch wait for it, so they read
+        the cached prefix instead of each writing it.
+
+        Extra keyword arguments (e.g. tools) are passed to messages.create.
+        The round-trip time and retries are stored on call, if given. With
+        hedging, a slow request gets a backup that shares its semaphore slot.
+        """
+        first_for_prefix = False
+        warmed = None
+        if self.use_prompt_cache and self.compressor is None:
+            prefix_key = self._prefix_key(chunks)
+            warmed = self._warm_prefixes.get(prefix_key)
+            if warmed is None:
+                warmed = self._warm_prefixes[prefix_key] = asyncio.Event()
+                first_for_prefix = True
+            else:
+                await warmed.wait()
+
+        message = {
+            'model': self.model,
+            'max_tokens': max_tokens,
+            'temperature': 0,
+            'messages': [{
+                "role": "user",
+                "content": content
+            }],
+            **request
+        }
+
+        try:
+            return await self.gateway.create_async(
+                call=call,
+                breaker=self.breaker,
+                semaphore=semaphore,
+                hedger=self.hedger,
+                **message
+            )
+        finally:
+            if first_for_prefix:
+                warmed.set()
+            if self.hedger is not None:
+                self.stats['hedged_requests'] = self.hedger.stats['hedged']
+                self.stats['hedge_wins'] = self.hedger.stats['hedge_wins']
+
+    def explain(
+        self,
+        node_content: str,
+        node_type: str,
+        selected: List[ScoredChunk]
+    ) -> List[ScoredChunk]:
+        """Fetch reasoning for selected chunks scored without it (compact or matrix scoring) in one request."""
+        missing = self._needs_reasoning(selected)
+        if not missing:
+            return selected
+
+        content = self._build_reasoning_prompt(node_content, node_type, missing)
+        response = self._send_tool_request(content, REASON_TOOL, 'explain', missing)
+        return self._apply_reasoning(selected, response)
+
+    async def explain_async(
+        self,
+        node_content: str,
+        node_type: str,
+        selected: List[ScoredChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[ScoredChunk]:
+        """Async version of explain."""
+        missing = self._needs_reasoning(selected)
+        if not missing:
+            return selected
+
+        content = self._build_reasoning_prompt(node_content, node_type, missing)
+        response, _ = await self._send_tool_request_async(
+            content, REASON_TOOL, 'explain', missing, semaphore
+        )
+        return self._apply_reasoning(selected, response)
+
+    def _needs_reasoning(self, selected: List[ScoredChunk]) -> List[TextChunk]:
+        """Chunks of a selection that were scored without reasoning."""
+        return [scored.chunk for scored in selected if not scored.reasoning]
+
+    def _apply_reasoning(self, selected: List[ScoredChunk], response) -> List[ScoredChunk]:
+        """Attach reasoning from a record_reasoning tool call, keeping scores."""
+        reasons: Dict[str, str] = {}
+        for block in getattr(response, 'content', None) or []:
+            if getattr(block, 'type', None) == 'tool_use' and block.name == REASON_TOOL["name"]:
+                entries = block.input.get('reasons') if isinstance(block.input, dict) else None
+                for entry in entries if isinstance(entries, list) else []:
+                    if isinstance(entry, dict) and isinstance(entry.get('chunk_id'), str):
+                        reasons.setdefault(entry['chunk_id'], str(entry.get('reasoning', '')))
+                break
+
+        return [
+            replace(scored, reasoning=scored.reasoning or reasons.get(scored.chunk.chunk_id, ""))
+            for scored in selected
+        ]
+
+    def _score_tool(self) -> Dict:
+        """Tool schema for scoring requests."""
+        return COMPACT_SCORE_TOOL if self.compact else SCORE_TOOL
+
+    def _track(self, request_type: str):
+        """Ledger context for one logical request (unrecorded without a ledger)."""
+        if self.ledger is None:
+            return nullcontext(LedgerCall())
+        return self.ledger.call(self.model, request=request_type)
+
+    def _fail_call(self, call: LedgerCall, error: Exception, message: str):
+        """Record a request that failed after all retries."""
+        if isinstance(error, CircuitOpenError):
+            # Refused locally; the breaker already announced why
+            call.outcome = 'circuit_open'
+            return
+        call.outcome = f"error:{type(error).__name__}"
+        if self.breaker is not None:
+            self.breaker.record_failure(error)
+        print(f"Warning: {message}: {error}")
+
+    def _finish_call(self, call: LedgerCall):
+        """Fold a finished request into the counters and return its response."""
+        self.stats['retries'] += call.retries
+        if call.response is None:
+            self.stats['failed_requests'] += 1
+        else:
+            self._record_usage(call.response)
+            if self.breaker is not None:
+                self.breaker.record_success()
+        return call.response
+
+    def _observe_output(self, response, chunks: List[TextChunk]):
+        """Count a scoring response's output tokens against the chunks it was asked to score."""
+        output_tokens = getattr(getattr(response, 'usage', None), 'output_tokens', None)
+        if output_tokens:
+            self.stats['score_output_tokens'] += output_tokens
+            self.stats['score_output_chunks'] += len(chunks)
+
+    def _is_truncated(self, response, chunks: List, count: bool = True) -> bool:
+        """Check whether a multi-chunk response was cut off at max_tokens (counted unless count=False)."""
+        if getattr(response, 'stop_reason', None) == 'max_tokens' and len(chunks) > 1:
+            if count:
+                self.stats['truncations_split'] += 1
+            return True
+        return False
+
+    def _request_key(self, content: List[Dict], tool: Dict) -> str:
+        """Identify a tool request by model, tool and prompt."""
+        request = json.dumps({'model': self.model, 'tool': tool, 'content': content}, sort_keys=True)
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def _prefix_key(self, chunks: List[TextChunk]) -> str:
+        """Identify a chunk batch (and thus its cached prompt prefix)."""
+        ids = "|".join(chunk.chunk_id for chunk in chunks)
+        return hashlib.md5(ids.encode()).hexdigest()
+
+    def _record_usage(self, response):
+        """Accumulate token usage reported by the API."""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+
+        self.usage['requests'] += 1
+        for field in (
+            'input_tokens',
+            'output_tokens',
+            'cache_creation_input_tokens',
+            'cache_read_input_tokens'
+        ):
+            self.usage[field] += getattr(usage, field, 0) or 0
+
+    def _build_scored_chunks(
+        self,
+        chunks: List[TextChunk],
+        scored: Dict[str, ScoredChunk],
+        status: str = 'not_scored'
+    ) -> List[ScoredChunk]:
+        """Return scores for a batch in chunk order, zero-scoring chunks left unscored with status."""
+        reasoning = "Scoring failed" if status == 'failed' else "Not scored"
+        return [
+            scored.get(chunk.chunk_id)
+            or ScoredChunk(chunk=chunk, relevance_score=0.0, reasoning=reasoning, status=status)
+            for chunk in chunks
+        ]
+
+    def _parse_tool_scores(
+        self,
+        response,
+        chunks: List[TextChunk],
+        count: bool = True
+    ) -> Dict[str, ScoredChunk]:
+        """
+        Validate the record_scores tool call of a scoring response.
+
+        Entries must name a chunk of the batch and carry a 0-10 score; the
+        first valid entry per chunk wins. Everything else is dropped so the
+        chunk is re-requested rather than mis-scored. Dropped entries are
+        counted in stats['invalid_scores'] unless count is False.
+
+        Returns:
+            Chunk ID -> ScoredChunk for the validly scored chunks
+        """
+        chunks_by_id = {chunk.chunk_id: chunk for chunk in chunks}
+        entries = []
+        for block in response.content:
+            if getattr(block, 'type', None) == 'tool_use' and block.name == SCORE_TOOL["name"]:
+                tool_input = block.input if isinstance(block.input, dict) else {}
+                entries = tool_input.get('scores') or []
+                break
+
+        scored: Dict[str, ScoredChunk] = {}
+        invalid = 0
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                invalid += 1
+                continue
+
+            chunk = chunks_by_id.get(entry.get('chunk_id'))
+            score = entry.get('score')
+            if (
+                chunk is None
+                or chunk.chunk_id in scored
+                or isinstance(score, bool)
+                or not isinstance(score, (int, float))
+                or not 0 <= score <= 10
+            ):
+                invalid += 1
+                continue
+
+            scored[chunk.chunk_id] = ScoredChunk(
+                chunk=chunk,
+                relevance_score=float(score),
+                reasoning=str(entry.get('reasoning', ''))
+            )
+
+        if count:
+            self.stats['invalid_scores'] += invalid
+        return scored
+
+    def _build_scoring_prompt(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ) -> List[Dict]:
+        """
+        Build prompt content blocks for scoring chunks.
+
+        The chunk block comes first so it can be reused as a cached prefix;
+        the node-specific instructions follow it.
+        """
+        response_detail = "the score only" if self.compact else "a brief reasoning"
+        instructions = f"""**Node to Verify:**
+Type: {node_type}
+Content: "{node_content}"
+
+**Task:**
+Rate each passage above from 0-10 for relevance to this node. Consider:
+- Does it provide factual support or evidence for the node?
+- Does it contain methodological details related to the node?
+- Does it contradict or oppose the node?
+- Does it provide contextual information that helps understand the node?
+
+A score of 0 means completely irrelevant, 10 means highly relevant and directly supports/relates to the node.
+
+**Response Format:**
+Call the record_scores tool with one entry per passage, using the chunk ID
+from the passage label (e.g. "{chunks[0].chunk_id}") and {response_detail}."""
+
+        texts = None
+        if self.compressor is not None:
+            texts = [self.compressor.compress(node_content, chunk) for chunk in chunks]
+
+        return [self._build_chunks_block(chunks, texts), {"type": "text", "text": instructions}]
+
+    def _build_reasoning_prompt(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ) -> List[Dict]:
+        """Build prompt content blocks asking why the selected chunks relate to a node."""
+        instructions = f"""**Node to Verify:**
+Type: {node_type}
+Content: "{node_content}"
+
+**Task:**
+These passages were selected as the most relevant to this node. For each,
+explain in one or two sentences how it supports, contradicts, or gives
+methodological or contextual detail for the node.
+
+**Response Format:**
+Call the record_reasoning tool with one entry per passage, using the chunk ID
+from the passage label."""
+
+        texts = None
+        if self.compressor is not None:
+            texts = [self.compressor.compress(node_content, chunk) for chunk in chunks]
+
+        return [self._build_chunks_block(chunks, texts), {"type": "text", "text": instructions}]
+
+    def _build_chunks_block(self, chunks: List[TextChunk], texts: Optional[List[str]] = None) -> Dict:
+        """
+        Build the chunk block of a scoring prompt.
+
+        Without texts (compressed chunk contents) the block is node-independent
+        and marked as a cacheable prefix shared by every node's prompt.
+        """
+        # Format chunks for prompt
+        chunks_text = ""
+        for i, chunk in enumerate(chunks):
+            content = texts[i] if texts is not None else chunk.content
+            chunks_text += f"\n[Chunk {chunk.chunk_id}] (Page {chunk.page_num}):\n{content}\n"
+
+        block = {
+            "type": "text",
+            "text": f"""You are helping verify extracted discourse nodes from research papers by finding relevant passages in the source PDF.
+
+**PDF Passages to Evaluate:**
+{chunks_text}"""
+        }
+
+        if self.use_prompt_cache and texts is None:
+            block["cache_control"] = {"type": "ephemeral"}
+
+        return block
+
+    async def locate_passages_async(
+        self,
+        nodes: List[Dict],
+        pages: Dict[int, str],
+        top_k: int,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> Optional[List[Optional[List[Passage]]]]:
+        """
+        Ask for the top_k passages per node with the full paper in the prompt.
+
+        Nodes go in groups of WHOLE_PAPER_MAX_NODES; every group's prompt
+        starts with the same paper block, which is cached after the first.
+        """
+        groups = [
+            nodes[start:start + WHOLE_PAPER_MAX_NODES]
+            for start in range(0, len(nodes), WHOLE_PAPER_MAX_NODES)
+        ]
+        paper_block = self._build_paper_block(pages)
+        results = await asyncio.gather(*[
+            self._locate_group_async(group, paper_block, top_k, chunks, semaphore)
+            for group in groups
+        ])
+        return [passages for group_result in results for passages in group_result]
+
+    async def _locate_group_async(
+        self,
+        nodes: List[Dict],
+        paper_block: Dict,
+        top_k: int,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[Optional[List[Passage]]]:
+        """Locate passages for one node group, splitting it if the output is cut off."""
+        content = [paper_block, {"type": "text", "text": self._build_passages_prompt(nodes, top_k)}]
+        node_ids = ",".join(str(node['id']) for node in nodes if node.get('id'))
+        with usage_labels(node_id=node_ids or None):
+            response, shared = await self._send_tool_request_async(
+                content, PASSAGES_TOOL, 'locate', chunks, semaphore,
+                max_tokens=WHOLE_PAPER_MAX_OUTPUT_TOKENS
+            )
+        if response is None:
+            return [None] * len(nodes)
+
+        if self._is_truncated(response, nodes, count=not shared):
+            middle = len(nodes) // 2
+            halves = await asyncio.gather(
+                self._locate_group_async(nodes[:middle], paper_block, top_k, chunks, semaphore),
+                self._locate_group_async(nodes[middle:], paper_block, top_k, chunks, semaphore)
+            )
+            return halves[0] + halves[1]
+
+        return self._parse_passages(response, len(nodes), top_k, count=not shared)
+
+    def _build_paper_block(self, pages: Dict[int, str]) -> Dict:
+        """Build the full-paper block of a whole-paper prompt, shared by every node group."""
+        paper_text = "".join(f"\n[Page {page}]\n{text}\n" for page, text in pages.items())
+        block = {
+            "type": "text",
+            "text": f"""You are helping verify extracted discourse nodes from research papers by finding relevant passages in the source PDF.
+
+**Full Paper Text:**
+{paper_text}"""
+        }
+
+        if self.use_prompt_cache:
+            block["cache_control"] = {"type": "ephemeral"}
+
+        return block
+
+    def _build_passages_prompt(self, nodes: List[Dict], top_k: int) -> str:
+        """Build the instructions of a whole-paper prompt for one node group."""
+        nodes_text = ""
+        for i, node in enumerate(nodes):
+            nodes_text += f"\n[Node {i}] ({node['type']}): \"{node['content']}\"\n"
+
+        return f"""**Nodes to Verify:**
+{nodes_text}
+
+**Task:**
+For each node, find up to {top_k} passages in the paper that are most relevant to it, best first. A passage is relevant if it:
+- Provides factual support or evidence for the node
+- Contains methodological details related to the node
+- Contradicts or opposes the node
+- Provides context that helps understand the node
+
+Copy each passage verbatim from the paper text above (one to three consecutive sentences, unchanged) and give its page number, a relevance score from 0-10 and one sentence of reasoning.
+Return an empty list for a node only if nothing in the paper relates to it.
+
+Call the record_passages tool with one entry per node, using the number from its label."""
+
+    def _parse_passages(
+        self,
+        response,
+        num_nodes: int,
+        top_k: int,
+        count: bool = True
+    ) -> List[Optional[List[Passage]]]:
+        """
+        Validate the record_passages tool call of a whole-paper response.
+
+        Invalid passages are counted in stats['invalid_scores'] unless count is False.
+
+        Returns:
+            One passage list per node; None for nodes the call left out
+        """
+        located: List[Optional[List[Passage]]] = [None] * num_nodes
+
+        entries = None
+        for block in getattr(response, 'content', None) or []:
+            if getattr(block, 'type', None) == 'tool_use' and block.name == PASSAGES_TOOL["name"]:
+                entries = block.input.get('nodes') if isinstance(block.input, dict) else None
+                break
+
+        for entry in entries if isinstance(entries, list) else []:
+            node_index = entry.get('node') if isinstance(entry, dict) else None
+            passages = entry.get('passages') if isinstance(entry, dict) else None
+            if not isinstance(node_index, int) or not 0 <= node_index < num_nodes:
+                continue
+            if not isinstance(passages, list) or located[node_index] is not None:
+                continue
+
+            valid = []
+            for passage in passages:
+                quote = passage.get('quote') if isinstance(passage, dict) else None
+                score = passage.get('score') if isinstance(passage, dict) else None
+                if (
+                    not isinstance(quote, str) or not quote.strip()
+                    or isinstance(score, bool) or not isinstance(score, (int, float))
+                    or not 0 <= score <= 10
+                ):
+                    if count:
+                        self.stats['invalid_scores'] += 1
+                    continue
+                page = passage.get('page')
+                valid.append(Passage(
+                    quote=quote,
+                    page=page if isinstance(page, int) else None,
+                    relevance_score=float(score),
+                    reasoning=str(passage.get('reasoning', ''))
+                ))
+            located[node_index] = valid[:top_k]
+
+        return located
+
+    async def score_matrix_async(
+        self,
+        nodes: List[Dict],
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[List[ScoredChunk]]:
+        """
+        Score one chunk batch against several nodes, packing node groups into
+        single requests that fit the matrix token budgets.
+
+        Args:
+            nodes: Node dicts with 'content' and 'type' keys
+            chunks: Batch of chunks to score
+            semaphore: Cap on in-flight requests
+
+        Returns:
+            One list of ScoredChunk objects per node, in input order
+        """
+        groups = self._group_nodes_for_matrix(nodes, chunks)
+        results = await asyncio.gather(*[
+            self._score_matrix_async([nodes[i] for i in node_indices], chunks, semaphore)
+            for node_indices in groups
+        ])
+
+        all_scored: List[List[ScoredChunk]] = [[] for _ in nodes]
+        for node_indices, rows in zip(groups, results):
+            for node_index, row in zip(node_indices, rows):
+                all_scored[node_index] = row
+
+        return all_scored
+
+    def _group_nodes_for_matrix(
+        self,
+        nodes: List[Dict],
+        chunks: List[TextChunk]
+    ) -> List[List[int]]:
+        """
+        Pack node indices into groups that fit the matrix token budgets.
+
+        Args:
+            nodes: All nodes of the paper
+            chunks: Chunk batch the nodes will be scored against
+
+        Returns:
+            List of node index groups
+        """
+        chunk_tokens = sum(estimate_tokens(chunk.content) for chunk in chunks)
+        output_per_node = MATRIX_OUTPUT_TOKENS_PER_SCORE * len(chunks) + 10
+
+        groups = []
+        current: List[int] = []
+        current_tokens = chunk_tokens
+
+        for i, node in enumerate(nodes):
+            node_tokens = estimate_tokens(node['content']) + 10
+            too_many_tokens = (
+                current_tokens + node_tokens > MATRIX_INPUT_TOKEN_BUDGET
+                or output_per_node * (len(current) + 1) > MATRIX_MAX_OUTPUT_TOKENS
+            )
+            if current and (len(current) >= MATRIX_MAX_NODES or too_many_tokens):
+                groups.append(current)
+                current = []
+                current_tokens = chunk_tokens
+
+            current.append(i)
+            current_tokens += node_tokens
+
+        if current:
+            groups.append(current)
+
+        return groups
+
+    async def _score_matrix_async(
+        self,
+        nodes: List[Dict],
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[List[ScoredChunk]]:
+        """
+        Score one chunk batch against a group of nodes in a single request.
+
+        Args:
+            nodes: Node group
+            chunks: Batch of chunks to score
+            semaphore: Cap on in-flight requests
+
+        Returns:
+            One list of ScoredChunk objects per node
+        """
+        if len(nodes) == 1:
+            node = nodes[0]
+            return [await self.score_async(node['content'], node['type'], chunks, semaphore)]
+
+        content = self._build_matrix_prompt(nodes, chunks)
+        max_tokens = min(
+            MATRIX_MAX_OUTPUT_TOKENS,
+            MATRIX_OUTPUT_TOKENS_PER_SCORE * len(nodes) * len(chunks) + 10 * len(nodes) + 100
+        )
+
+        matrix: Dict[int, Dict[str, float]] = {}
+        node_ids = ",".join(str(node['id']) for node in nodes if node.get('id'))
+        with usage_labels(node_id=node_ids or None), self._track('matrix') as call:
+            try:
+                call.response = await self._create_message_async(
+                    content, max_tokens, chunks, semaphore, call,
+                    tools=[MATRIX_TOOL],
+                    tool_choice={"type": "tool", "name": MATRIX_TOOL["name"]}
+                )
+                matrix = self._parse_matrix(call.response, len(nodes), chunks)
+                if getattr(call.response, 'stop_reason', None) == 'max_tokens':
+                    call.outcome = 'truncated'
+                elif not matrix:
+                    call.outcome = 'unparsed'
+            except Exception as e:
+                self._fail_call(call, e, "Matrix scoring request failed")
+        self._finish_call(call)
+
+        async def complete_row(node_index: int, node: Dict) -> List[ScoredChunk]:
+            # Cells the response left out (or scored invalidly) are scored
+            # for this node alone; a failed request falls back entirely
+            row = matrix.get(node_index, {})
+            missing = [chunk for chunk in chunks if chunk.chunk_id not in row]
+            rescored: Dict[str, ScoredChunk] = {}
+            if missing:
+                if row:
+                    self.stats['partial_rescores'] += 1
+                    self.stats['chunks_rescored'] += len(missing)
+                for scored_chunk in await self.score_async(
+                    node['content'], node['type'], missing, semaphore
+                ):
+                    rescored[scored_chunk.chunk.chunk_id] = scored_chunk
+            return [
+                rescored[chunk.chunk_id] if chunk.chunk_id in rescored
+                else ScoredChunk(chunk=chunk, relevance_score=row[chunk.chunk_id], reasoning="")
+                for chunk in chunks
+            ]
+
+        return list(await asyncio.gather(*[
+            complete_row(node_index, node) for node_index, node in enumerate(nodes)
+        ]))
+
+    def _build_matrix_prompt(
+        self,
+        nodes: List[Dict],
+        chunks: List[TextChunk]
+    ) -> List[Dict]:
+        """Build prompt content blocks for scoring chunks against several nodes."""
+        nodes_text = ""
+        for i, node in enumerate(nodes):
+            nodes_text += f"\n[Node {i}] ({node['type']}): \"{node['content']}\"\n"
+
+        instructions = f"""**Nodes to Verify:**
+{nodes_text}
+
+**Task:**
+Rate each passage from 0-10 for relevance to EACH node above. Consider:
+- Does it provide factual support or evidence for the node?
+- Does it contain methodological details related to the node?
+- Does it contradict or oppose the node?
+- Does it provide contextual information that helps understand the node?
+
+A score of 0 means completely irrelevant, 10 means highly relevant and directly supports/relates to the node.
+
+**Response Format:**
+Call the record_matrix tool with one entry for every pair of node and passage
+({len(nodes)} nodes x {len(chunks)} passages = {len(nodes) * len(chunks)} entries). Give the node
+number from its label and the passage ID exactly as shown in the passage label."""
+
+        return [self._build_chunks_block(chunks), {"type": "text", "text": instructions}]
+
+    def _parse_matrix(
+        self,
+        response,
+        num_nodes: int,
+        chunks: List[TextChunk]
+    ) -> Dict[int, Dict[str, float]]:
+        """
+        Validate the record_matrix tool call of a matrix scoring response.
+
+        Entries must name a node of the group and a chunk of the batch and
+        carry a 0-10 score; the first valid entry per pair wins. Everything
+        else is dropped so the pair is re-scored rather than mis-scored.
+
+        Returns:
+            Node index -> chunk ID -> score, for the validly scored pairs
+        """
+        chunk_ids = {chunk.chunk_id for chunk in chunks}
+        entries = []
+        for block in response.content:
+            if getattr(block, 'type', None) == 'tool_use' and block.name == MATRIX_TOOL["name"]:
+                tool_input = block.input if isinstance(block.input, dict) else {}
+                entries = tool_input.get('scores') or []
+                break
+
+        matrix: Dict[int, Dict[str, float]] = {}
+        invalid = 0
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                invalid += 1
+                continue
+
+            node_index = entry.get('node')
+            chunk_id = entry.get('chunk_id')
+            score = entry.get('score')
+            if (
+                isinstance(node_index, bool)
+                or not isinstance(node_index, int)
+                or not 0 <= node_index < num_nodes
+                or chunk_id not in chunk_ids
+                or chunk_id in matrix.get(node_index, {})
+                or isinstance(score, bool)
+                or not isinstance(score, (int, float))
+                or not 0 <= score <= 10
+            ):
+                invalid += 1
+                continue
+
+            matrix.setdefault(node_index, {})[chunk_id] = float(score)
+
+        self.stats['invalid_scores'] += invalid
+        return matrix
+
+
+class CascadeBackend(ScoringBackend):
+    """
+    Score with a small model first and re-score only uncertain chunks with
+    the default model.
+
+    A chunk is escalated when its first-pass score is at least
+    CASCADE_BAND_LOW and either at most CASCADE_BAND_HIGH (uncertain) or
+    among the batch's top_k (it may end up in the final selection). Chunks
+    below the band keep their first-pass score as clearly irrelevant.
+    """
+
+    name = "cascade"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        use_prompt_cache: bool = True,
+        ledger: Optional[UsageLedger] = None,
+        top_k: int = DEFAULT_TOP_K,
+        first_model: str = CASCADE_MODEL,
+        final_model: str = DEFAULT_MODEL,
+        compressor: Optional[ChunkCompressor] = None,
+        compact: bool = False,
+        hedge: bool = False,
+        breaker: Optional[CircuitBreaker] = None,
+        gateway: Optional[LLMGateway] = None
+    ):
+        """
+        Initialize cascade of two Claude backends.
+
+        Args:
+            api_key: Anthropic API key. Defaults to config value.
+            use_prompt_cache: Mark chunk blocks as cacheable prompt prefixes
+            ledger: Usage ledger shared by both models
+            top_k: Size of the final selection, used for escalation
+            first_model: Small model for the first pass
+            final_model: Model for escalated chunks
+            compressor: Chunk compressor shared by both models
+            compact: Use the compact scoring protocol for both models
+            hedge: Hedge slow async requests (latencies are tracked per model)
+            breaker: Circuit breaker shared by both models
+            gateway: Gateway shared by both models
+        """
+        gateway = gateway or (LLMGateway(api_key) if api_key else default_gateway())
+        self.first = ClaudeBackend(
+            api_key, use_prompt_cache, ledger, first_model, compressor, compact, hedge, breaker,
+            gateway
+        )
+        self.final = ClaudeBackend(
+            api_key, use_prompt_cache, ledger, final_model, compressor, compact, hedge, breaker,
+            gateway
+        )
+        self.top_k = top_k
+        self.cascade_stats = {'chunks_scored': 0, 'chunks_escalated': 0}
+
+    @property
+    def usage(self) -> Dict[str, int]:
+        """Token usage summed over both models."""
+        return {
+            field: self.first.usage[field] + self.final.usage[field]
+            for field in self.first.usage
+        }
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counters summed over both models, plus escalation counts."""
+        return {
+            **{
+                field: self.first.stats[field] + self.final.stats[field]
+                for field in self.first.stats
+            },
+            **self.cascade_stats
+        }
+
+    def model_usage(self) -> Dict[str, Dict[str, int]]:
+        """Requests and chunks scored per model."""
+        return {
+            self.first.model: {
+                'requests': self.first.usage['requests'],
+                'chunks': self.cascade_stats['chunks_scored']
+            },
+            self.final.model: {
+                'requests': self.final.usage['requests'],
+                'chunks': self.cascade_stats['chunks_escalated']
+            }
+        }
+
+    def begin_run(self):
+        """Reset per-run state of both models."""
+        self.first.begin_run()
+        self.final.begin_run()
+
+    async def aclose(self):
+        """Release async resources of both models."""
+        await self.first.aclose()
+        await self.final.aclose()
+
+    def score(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ) -> List[ScoredChunk]:
+        """Score with the small model, then re-score escalated chunks."""
+        first_pass = self.first.score(node_content, node_type, chunks)
+        escalated = self._escalate(first_pass)
+        if not escalated:
+            return first_pass
+
+        rescored = self.final.score(node_content, node_type, escalated)
+        return self._merge(first_pass, rescored)
+
+    async def score_async(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[ScoredChunk]:
+        """Async version of score."""
+        first_pass = await self.first.score_async(node_content, node_type, chunks, semaphore)
+        escalated = self._escalate(first_pass)
+        if not escalated:
+            return first_pass
+
+        rescored = await self.final.score_async(node_content, node_type, escalated, semaphore)
+        return self._merge(first_pass, rescored)
+
+    def explain(
+        self,
+        node_content: str,
+        node_type: str,
+        selected: List[ScoredChunk]
+    ) -> List[ScoredChunk]:
+        """Fetch reasoning from the final model."""
+        return self.final.explain(node_content, node_type, selected)
+
+    async def explain_async(
+        self,
+        node_content: str,
+        node_type: str,
+        selected: List[ScoredChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[ScoredChunk]:
+        """Async version of explain."""
+        return await self.final.explain_async(node_content, node_type, selected, semaphore)
+
+    async def locate_passages_async(
+        self,
+        nodes: List[Dict],
+        pages: Dict[int, str],
+        top_k: int,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> Optional[List[Optional[List[Passage]]]]:
+        """Read whole papers with the final model only."""
+        return await self.final.locate_passages_async(nodes, pages, top_k, chunks, semaphore)
+
+    def _escalate(self, first_pass: List[ScoredChunk]) -> List[TextChunk]:
+        """Pick the chunks of a first-pass batch that the final model re-scores."""
+        top_region = {
+            scored.chunk.chunk_id
+            for scored in sorted(first_pass, key=lambda s: -s.relevance_score)[:self.top_k]
+        }
+        escalated = [
+            scored.chunk for scored in first_pass
+            if scored.status != 'failed'
+            and scored.relevance_score >= CASCADE_BAND_LOW
+            and (scored.relevance_score <= CASCADE_BAND_HIGH or scored.chunk.chunk_id in top_region)
+        ]
+
+        self.cascade_stats['chunks_scored'] += len(first_pass)
+        self.cascade_stats['chunks_escalated'] += len(escalated)
+        return escalated
+
+    def _merge(
+        self,
+        first_pass: List[ScoredChunk],
+        rescored: List[ScoredChunk]
+    ) -> List[ScoredChunk]:
+        """Replace first-pass scores with final-model scores, keeping batch order."""
+        final_scores = {
+            scored.chunk.chunk_id: scored for scored in rescored
+            # A failed re-score keeps the first-pass score
+            if scored.status == 'scored'
+        }
+        return [final_scores.get(scored.chunk.chunk_id, scored) for scored in first_pass]
+
+
+class LexicalBackend(ScoringBackend):
+    """
+    Score chunks locally by term and phrase overlap with the node.
+
+    Costs nothing and needs no network, so it can serve as an offline
+    scorer or a first pass. Scores depend only on the node and the chunk,
+    never on how chunks are batched.
+    """
+
+    name = "lexical"
+
+    def score(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ) -> List[ScoredChunk]:
+        """
+        Score chunks from 0-10 by blending two overlaps: the share of the
+        node's index terms found in the chunk, and the share of its word
+        trigrams (close paraphrase or quotation).
+        """
+        terms = set(tokenize(node_content))
+        phrases = word_shingles(node_content)
+
+        scored_chunks = []
+        for chunk in chunks:
+            chunk_terms = set(tokenize(chunk.content))
+            matched = sorted(terms & chunk_terms)
+            coverage = len(matched) / len(terms) if terms else 0.0
+            phrase_overlap = (
+                len(phrases & word_shingles(chunk.content)) / len(phrases)
+                if phrases else 0.0
+            )
+
+            score = 10 * (
+                LEXICAL_COVERAGE_WEIGHT * coverage
+                + (1 - LEXICAL_COVERAGE_WEIGHT) * phrase_overlap
+            )
+            scored_chunks.append(ScoredChunk(
+                chunk=chunk,
+                relevance_score=round(score, 1),
+                reasoning=f"Lexical match: {len(matched)}/{len(terms)} terms"
+                + (f" ({', '.join(matched[:5])})" if matched else "")
+            ))
+
+        return scored_chunks
+
+
+class FakeBackend(ScoringBackend):
+    """Deterministic pseudo-random scores for tests and benchmarks."""
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Initialize fake backend.
+
+        Args:
+            latency: Seconds each async batch takes, to simulate API calls
+        """
+        super().__init__()
+        self.latency = latency
+        self.stats = {'batches': 0}
+
+    def score(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ) -> List[ScoredChunk]:
+        """Derive each score from a hash of the node text and chunk ID."""
+        self.stats['batches'] += 1
+        scored_chunks = []
+        for chunk in chunks:
+            digest = hashlib.md5(f"{node_content}|{chunk.chunk_id}".encode()).hexdigest()
+            scored_chunks.append(ScoredChunk(
+                chunk=chunk,
+                relevance_score=round(int(digest[:8], 16) / 0xFFFFFFFF * 10, 1),
+                reasoning="Fake score"
+            ))
+
+        return scored_chunks
+
+    async def score_async(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[ScoredChunk]:
+        """Score after the simulated latency, holding a semaphore slot like a request."""
+        async with semaphore:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self.score(node_content, node_type, chunks)
+
+
+class FallbackBackend(ScoringBackend):
+    """
+    Rank locally whenever an LLM backend cannot score.
+
+    While the circuit breaker is open (repeated API failures, the spend
+    cap, or a recovery probe still out), batches go straight to the local
+    fallback, so a run during an API incident finishes in seconds instead
+    of waiting out retries. Chunks the LLM failed to score (status
+    'failed') are re-scored locally rather than kept at 0.0.
+    Locally ranked chunks are flagged with ranked_locally. Their scores come
+    from a different scale, so they only compete among themselves and rank
+    below every LLM-scored chunk (see ScoredChunk.rank).
+    """
+
+    def __init__(
+        self,
+        primary: ScoringBackend,
+        breaker: CircuitBreaker,
+        fallback: Optional[ScoringBackend] = None
+    ):
+        """
+        Initialize fallback wrapper.
+
+        Args:
+            primary: LLM backend, built with the same breaker
+            breaker: Circuit breaker deciding when to rank locally
+            fallback: Local scorer. Defaults to LexicalBackend.
+        """
+        self.primary = primary
+        self.breaker = breaker
+        self.fallback = fallback or LexicalBackend()
+        self.name = primary.name
+        self.fallback_stats = {'batches_local': 0, 'chunks_local': 0}
+
+    @property
+    def usage(self) -> Dict[str, int]:
+        """Token usage of the primary backend."""
+        return self.primary.usage
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counters of the primary backend, plus fallback and breaker counts."""
+        return {
+            **self.primary.stats,
+            **self.fallback_stats,
+            'circuit_trips': self.breaker.stats['trips'],
+            'circuit_rejected': self.breaker.stats['rejected']
+        }
+
+    def begin_run(self):
+        """Reset per-run state of the primary backend."""
+        self.primary.begin_run()
+
+    async def aclose(self):
+        """Release async resources of the primary backend."""
+        await self.primary.aclose()
+
+    def score(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ) -> List[ScoredChunk]:
+        """Score with the primary backend while the circuit allows it."""
+        if self.breaker.is_open():
+            return self._score_locally(node_content, node_type, chunks)
+        scored = self.primary.score(node_content, node_type, chunks)
+        return self._replace_failed(node_content, node_type, scored)
+
+    async def score_async(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[ScoredChunk]:
+        """Async version of score."""
+        if self.breaker.is_open():
+            return self._score_locally(node_content, node_type, chunks)
+        scored = await self.primary.score_async(node_content, node_type, chunks, semaphore)
+        return self._replace_failed(node_content, node_type, scored)
+
+    async def score_matrix_async(
+        self,
+        nodes: List[Dict],
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[List[ScoredChunk]]:
+        """Score a matrix with the primary backend while the circuit allows it."""
+        if self.breaker.is_open():
+            return await super().score_matrix_async(nodes, chunks, semaphore)
+        rows = await self.primary.score_matrix_async(nodes, chunks, semaphore)
+        return [
+            self._replace_failed(node['content'], node['type'], row)
+            for node, row in zip(nodes, rows)
+        ]
+
+    def explain(
+        self,
+        node_content: str,
+        node_type: str,
+        selected: List[ScoredChunk]
+    ) -> List[ScoredChunk]:
+        """Fetch reasoning from the primary backend unless the circuit is open."""
+        if self.breaker.is_open():
+            return selected
+        return self.primary.explain(node_content, node_type, selected)
+
+    async def explain_async(
+        self,
+        node_content: str,
+        node_type: str,
+        selected: List[ScoredChunk],
+        semaphore: asyncio.Semaphore
+    ) -> List[ScoredChunk]:
+        """Async version of explain."""
+        if self.breaker.is_open():
+            return selected
+        return await self.primary.explain_async(node_content, node_type, selected, semaphore)
+
+    async def locate_passages_async(
+        self,
+        nodes: List[Dict],
+        pages: Dict[int, str],
+        top_k: int,
+        chunks: List[TextChunk],
+        semaphore: asyncio.Semaphore
+    ) -> Optional[List[Optional[List[Passage]]]]:
+        """Read the whole paper with the primary backend; None (chunked search) while the circuit is open."""
+        if self.breaker.is_open():
+            return None
+        return await self.primary.locate_passages_async(nodes, pages, top_k, chunks, semaphore)
+
+    def _replace_failed(
+        self,
+        node_content: str,
+        node_type: str,
+        scored: List[ScoredChunk]
+    ) -> List[ScoredChunk]:
+        """Re-score chunks whose LLM request failed, keeping batch order."""
+        failed = [item.chunk for item in scored if item.status == 'failed']
+        if not failed:
+            return scored
+
+        local = {
+            item.chunk.chunk_id: item
+            for item in self._score_locally(node_content, node_type, failed)
+        }
+        return [local.get(item.chunk.chunk_id, item) for item in scored]
+
+    def _score_locally(
+        self,
+        node_content: str,
+        node_type: str,
+        chunks: List[TextChunk]
+    ) -> List[ScoredChunk]:
+        """Score with the fallback and flag the results."""
+        self.fallback_stats['batches_local'] += 1
+        self.fallback_stats['chunks_local'] += len(chunks)
+        return [
+            replace(scored, ranked_locally=True)
+            for scored in self.fallback.score(node_content, node_type, chunks)
+        ]
+
+
+BACKENDS = {
+    ClaudeBackend.name: ClaudeBackend,
+    CascadeBackend.name: CascadeBackend,
+    LexicalBackend.name: LexicalBackend,
+    FakeBackend.name: FakeBackend
+}
@@ -1,42 +1,132 @@
 """LLM-based semantic search for relevant PDF chunks."""
 
-import json
-import time
-from typing import List, Dict, Optional
-from dataclasses import dataclass
-
-from anthropic import Anthropic
-
-from .pdf_extractor import TextChunk
+import asyncio
+from typing import List, Dict, Optional, Tuple, Set
+
+from .pdf_extractor import TextChunk, estimate_tokens
+from .lexical_index import BM25Index, word_shingles
+from .scoring_backends import ScoringBackend, ClaudeBackend, ScoredChunk, Passage
+from .page_digests import PageDigest
+from .whole_paper import page_texts, QuoteAligner
+from .adaptive_limiter import AdaptiveLimiter
+from .usage_ledger import usage_labels
 from .config import (
-    ANTHROPIC_API_KEY,
-    DEFAULT_MODEL,
-    MAX_RETRIES,
-    RETRY_DELAY,
+    MAX_CONCURRENT_REQUESTS,
     DEFAULT_TOP_K,
-    KEYWORD_PREFILTER_RATIO
+    BM25_MAX_CANDIDATES,
+    BM25_MIN_SCORE_RATIO,
+    EARLY_STOP_SCORE,
+    EARLY_STOP_MIN_RELEVANCE,
+    EARLY_STOP_LEXICAL_RATIO,
+    VERBATIM_MATCH_RATIO,
+    VERBATIM_CHECK_LIMIT,
+    BATCH_INPUT_TOKEN_BUDGET,
+    BATCH_MAX_OUTPUT_TOKENS,
+    OUTPUT_TOKENS_PER_CHUNK,
+    OUTPUT_TOKEN_HEADROOM,
+    LEGACY_BATCH_SIZE,
+    HIERARCHICAL_MIN_PAGES,
+    HIERARCHICAL_PAGE_SCORE,
+    HIERARCHICAL_MIN_TOP_PAGES,
+    HIERARCHICAL_MAX_PAGES
 )
 
 
-@dataclass
-class ScoredChunk:
-    """A text chunk with relevance score and reasoning."""
-    chunk: TextChunk
-    relevance_score: float  # 0-10
-    reasoning: str
+# Candidate chunks with their BM25 scores, best lexical match first
+RankedCandidates = List[Tuple[TextChunk, float]]
 
 
 class SemanticSearch:
     """LLM-based semantic search for finding relevant PDF passages."""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        use_prompt_cache: bool = True,
+        share_batches: bool = True,
+        early_stop: bool = True,
+        skip_llm_on_verbatim: bool = False,
+        backend: Optional[ScoringBackend] = None,
+        adaptive_concurrency: bool = True
+    ):
         """
-        Initialize semantic search with Claude API.
+        Initialize semantic search.
 
         Args:
-            api_key: Anthropic API key. Defaults to config value.
+            api_key: Anthropic API key for the default Claude backend
+            max_concurrency: Maximum in-flight scoring requests on the async
+                path (the starting limit with adaptive_concurrency)
+            use_prompt_cache: Mark the chunk block as a cacheable prompt
+                prefix, so requests that repeat a batch bill cached input
+                tokens
+            share_batches: With use_prompt_cache, cut batches from the paper's
+                full chunk list so every node sends identical (cacheable)
+                batches. This also scores the non-candidate chunks that share
+                a batch with a candidate (counted in
+                stats['chunks_outside_shortlist']). When False, or without
+                prompt caching, only a node's candidates are batched.
+            early_stop: Score batches in lexical-rank order and stop once the
+                top_k is settled (see _should_stop)
+            skip_llm_on_verbatim: Return chunks that contain the node text
+                almost verbatim without calling the LLM
+            backend: Chunk scorer. Defaults to ClaudeBackend.
+            adaptive_concurrency: Grow the in-flight limit while responses are
+                healthy and cut it on rate-limit or overload responses (see
+                AdaptiveLimiter). The learned limit carries over between calls.
         """
-        self.client = Anthropic(api_key=api_key or ANTHROPIC_API_KEY)
+        self.backend = backend or ClaudeBackend(api_key=api_key, use_prompt_cache=use_prompt_cache)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limiter = AdaptiveLimiter(self.max_concurrency) if adaptive_concurrency else None
+        self.use_prompt_cache = use_prompt_cache
+        self.share_batches = share_batches
+        self.early_stop = early_stop
+        self.skip_llm_on_verbatim = skip_llm_on_verbatim
+
+        # Scoring work done and avoided
+        self.stats = {
+            'batches_scored': 0,
+            'batches_skipped': 0,
+            'verbatim_matches': 0,
+            # Fewer and more planned batches than fixed batches of
+            # LEGACY_BATCH_SIZE would have needed, summed over nodes
+            'requests_saved': 0,
+            'requests_added': 0,
+            # Fixed-size batches whose output would not have fit max_tokens,
+            # at the output tokens per chunk observed so far
+            'truncations_avoided': 0,
+            # Shared batches: chunks scored only because they share a batch
+            # with one of the node's candidates
+            'chunks_outside_shortlist': 0,
+            # Hierarchical mode: nodes searched via page digests, digest
+            # batches scored, and pages drilled into at chunk level
+            'hierarchical_nodes': 0,
+            'digest_batches': 0,
+            'pages_drilled': 0,
+            # Whole-paper mode: nodes answered from the whole-paper request,
+            # nodes that fell back to chunked search, and quotes that could
+            # not be matched to any chunk
+            'whole_paper_nodes': 0,
+            'whole_paper_fallbacks': 0,
+            'unaligned_quotes': 0
+        }
+
+        # Index built on the fly when the caller does not pass one
+        self._built_index: Optional[Tuple[Tuple[str, ...], BM25Index]] = None
+
+    @property
+    def concurrency(self) -> int:
+        """Current cap on in-flight scoring requests."""
+        return self.limiter.current_limit if self.limiter else self.max_concurrency
+
+    def _new_semaphore(self):
+        """Cap on in-flight requests for one async run."""
+        return self.limiter or asyncio.Semaphore(self.max_concurrency)
+
+    @property
+    def usage(self) -> Dict[str, int]:
+        """Token usage reported by the backend (empty for local backends)."""
+        return self.backend.usage
 
     def find_relevant_chunks(
         self,
@@ -44,7 +134,9 @@ class SemanticSearch:
         node_type: str,
         pdf_chunks: List[TextChunk],
         top_k: int = DEFAULT_TOP_K,
-        use_keyword_filter: bool = True
+        use_keyword_filter: bool = True,
+        node_metadata: Optional[Dict] = None,
+        lexical_index: Optional[BM25Index] = None
     ) -> List[ScoredChunk]:
         """
         Find PDF chunks most relevant to a discourse node.
@@ -55,6 +147,8 @@ class SemanticSearch:
             pdf_chunks: List of text chunks from PDF
             top_k: Number of top relevant chunks to return
             use_keyword_filter: Whether to pre-filter with keywords
+            node_metadata: What/How/Who metadata added to the keyword query
+            lexical_index: BM25 index of pdf_chunks. Built on the fly if not given.
 
         Returns:
             List of ScoredChunk objects, sorted by relevance (highest first)
@@ -63,200 +157,722 @@ class SemanticSearch:
             return []
 
         # Phase 1: Keyword pre-filtering (optional optimization)
-        if use_keyword_filter and len(pdf_chunks) > 30:
-            filtered_chunks = self._keyword_prefilter(node_content, pdf_chunks)
-        else:
-            filtered_chunks = pdf_chunks
+        candidates = self._select_candidates(
+            node_content, pdf_chunks, use_keyword_filter, node_metadata, lexical_index
+        )
 
-        # Phase 2: LLM-based scoring in batches
-        all_scored = []
-        batch_size = 25  # Process chunks in batches
+        verbatim = self._verbatim_matches(node_content, candidates, top_k)
+        if verbatim:
+            return verbatim
 
-        for i in range(0, len(filtered_chunks), batch_size):
-            batch = filtered_chunks[i:i + batch_size]
-            batch_scored = self._score_batch(node_content, node_type, batch)
-            all_scored.extend(batch_scored)
+        # Phase 2: LLM-based scoring in batches, best lexical matches first
+        batches = self._plan_batches(pdf_chunks, candidates)
+        lexical_scores = {chunk.chunk_id: score for chunk, score in candidates}
 
-        # Sort by relevance score (highest first)
-        all_scored.sort(key=lambda x: x.relevance_score, reverse=True)
+        all_scored = []
+        for i, (batch, _) in enumerate(batches):
+            batch_scored = self.backend.score(node_content, node_type, batch)
+            all_scored.extend(batch_scored)
+            self.stats['batches_scored'] += 1
 
-        # Phase 3: Re-rank top candidates for final selection (optional refinement)
-        if len(all_scored) > top_k * 2:
-            top_candidates = all_scored[:top_k * 2]
-            refined = self._rerank_candidates(node_content, node_type, top_candidates, top_k)
-            return refined
+            remaining = batches[i + 1:]
+            if remaining and self._should_stop(all_scored, lexical_scores, remaining[0][1], top_k):
+                self.stats['batches_skipped'] += len(remaining)
+                break
 
-        return all_scored[:top_k]
+        # Phase 3: Rank and select final chunks
+        selected = self._select_top_k(node_content, node_type, all_scored, top_k)
+        return self.backend.explain(node_content, node_type, selected)
 
-    def _keyword_prefilter(
+    async def find_relevant_chunks_async(
         self,
         node_content: str,
-        chunks: List[TextChunk]
-    ) -> List[TextChunk]:
+        node_type: str,
+        pdf_chunks: List[TextChunk],
+        top_k: int = DEFAULT_TOP_K,
+        use_keyword_filter: bool = True,
+        node_metadata: Optional[Dict] = None,
+        lexical_index: Optional[BM25Index] = None,
+        candidates: Optional[RankedCandidates] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        page_digests: Optional[List[PageDigest]] = None
+    ) -> List[ScoredChunk]:
         """
-        Pre-filter chunks by keyword overlap.
+        Async version of find_relevant_chunks that scores batches concurrently.
 
         Args:
-            node_content: Node text to extract keywords from
-            chunks: All PDF chunks
+            node_content: The text content of the node
+            node_type: Type of node (Evidence, Claim, etc.)
+            pdf_chunks: List of text chunks from PDF
+            top_k: Number of top relevant chunks to return
+            use_keyword_filter: Whether to pre-filter with keywords
+            node_metadata: What/How/Who metadata added to the keyword query
+            lexical_index: BM25 index of pdf_chunks. Built on the fly if not given.
+            candidates: Precomputed candidate shortlist (skips pre-filtering)
+            semaphore: Shared cap on in-flight requests. Created if not given.
+            page_digests: Digests of the paper's pages. For papers with at
+                least HIERARCHICAL_MIN_PAGES pages, the node is scored against
+                the digests first and only chunks of the top pages are scored.
 
         Returns:
-            Filtered list of chunks (top 50% by keyword overlap)
-        """
-        # Extract significant words (remove common words)
-        import re
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'been',
-            'be', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
-            'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these',
-            'those', 'we', 'they', 'our', 'their'
-        }
+            List of ScoredChunk objects, sorted by relevance (highest first)
+        """
+        if not pdf_chunks:
+            return []
 
-        # Get keywords from node
-        words = re.findall(r'\b\w+\b', node_content.lower())
-        keywords = set(w for w in words if len(w) > 3 and w not in stop_words)
+        if semaphore is None:
+            semaphore = self._new_semaphore()
 
-        # Score chunks by keyword overlap
-        scored_chunks = []
-        for chunk in chunks:
-            chunk_words = set(re.findall(r'\b\w+\b', chunk.content.lower()))
-            overlap = len(keywords & chunk_words)
-            scored_chunks.append((chunk, overlap))
+        if candidates is None:
+            candidates = self._select_candidates(
+                node_content, pdf_chunks, use_keyword_filter, node_metadata, lexical_index
+            )
+
+        verbatim = self._verbatim_matches(node_content, candidates, top_k)
+        if verbatim:
+            return verbatim
+
+        if page_digests and len(page_digests) >= HIERARCHICAL_MIN_PAGES:
+            pages = await self._select_pages_async(node_content, node_type, page_digests, semaphore)
+            candidates = self._page_candidates(
+                node_content, pdf_chunks, pages, node_metadata, lexical_index
+            )
+
+        batches = self._plan_batches(pdf_chunks, candidates)
+        lexical_scores = {chunk.chunk_id: score for chunk, score in candidates}
+
+        # The best lexical batch goes first on its own, since it usually settles
+        # the top_k; the rest are scored in concurrent waves with a stop check
+        # after each. gather() preserves batch order within a wave, so results
+        # are deterministic.
+        all_scored = []
+        position = 0
+        while position < len(batches):
+            wave_size = 1 if position == 0 or not self.early_stop else self.concurrency
+            wave = batches[position:position + wave_size]
+            position += len(wave)
+
+            wave_results = await asyncio.gather(*[
+                self.backend.score_async(node_content, node_type, batch, semaphore)
+                for batch, _ in wave
+            ])
+            for batch_scored in wave_results:
+                all_scored.extend(batch_scored)
+            self.stats['batches_scored'] += len(wave)
+
+            remaining = batches[position:]
+            if remaining and self._should_stop(all_scored, lexical_scores, remaining[0][1], top_k):
+                self.stats['batches_skipped'] += len(remaining)
+                break
+
+        selected = self._select_top_k(node_content, node_type, all_scored, top_k)
+        return await self.backend.explain_async(node_content, node_type, selected, semaphore)
+
+    async def find_relevant_chunks_for_nodes(
+        self,
+        nodes: List[Dict],
+        pdf_chunks: List[TextChunk],
+        top_k: int = DEFAULT_TOP_K,
+        use_keyword_filter: bool = True,
+        lexical_index: Optional[BM25Index] = None,
+        page_digests: Optional[List[PageDigest]] = None
+    ) -> List[List[ScoredChunk]]:
+        """
+        Find relevant chunks for several nodes of the same paper concurrently.
 
-        # Sort by overlap score
-        scored_chunks.sort(key=lambda x: x[1], reverse=True)
+        Candidate shortlists for all nodes come from one vectorized pass over
+        the paper's index. All batches of all nodes share one cap on
+        in-flight requests (see concurrency), so wall-clock time scales with
+        the cap rather than the number of nodes.
 
-        # Return top 50%
-        keep_count = max(1, int(len(scored_chunks) * KEYWORD_PREFILTER_RATIO))
-        return [chunk for chunk, score in scored_chunks[:keep_count]]
+        Args:
+            nodes: Node dicts with 'content', 'type' and optional 'metadata'
+                keys (as returned by MarkdownUpdater.get_node_content), plus
+                an optional 'id' that labels usage ledger entries
+            pdf_chunks: List of text chunks from PDF
+            top_k: Number of top relevant chunks to return per node
+            use_keyword_filter: Whether to pre-filter with keywords
+            lexical_index: BM25 index of pdf_chunks. Built on the fly if not given.
+            page_digests: Page digests for hierarchical search of long papers
+                (see find_relevant_chunks_async)
+
+        Returns:
+            One list of ScoredChunk objects per node, in input order
+        """
+        semaphore = self._new_semaphore()
+        self.backend.begin_run()
+
+        shortlists = self._shortlist_nodes(nodes, pdf_chunks, use_keyword_filter, lexical_index)
+
+        async def search_node(node: Dict, candidates: RankedCandidates) -> List[ScoredChunk]:
+            # Requests spawned for this node inherit its ledger label
+            with usage_labels(node_id=node.get('id')):
+                return await self.find_relevant_chunks_async(
+                    node['content'],
+                    node['type'],
+                    pdf_chunks,
+                    top_k=top_k,
+                    node_metadata=node.get('metadata'),
+                    lexical_index=lexical_index,
+                    candidates=candidates,
+                    semaphore=semaphore,
+                    page_digests=page_digests
+                )
+
+        return await asyncio.gather(*[
+            search_node(node, candidates)
+            for node, candidates in zip(nodes, shortlists)
+        ])
+
+    async def find_relevant_chunks_whole_paper(
+        self,
+        nodes: List[Dict],
+        pdf_chunks: List[TextChunk],
+        top_k: int = DEFAULT_TOP_K,
+        use_keyword_filter: bool = True,
+        lexical_index: Optional[BM25Index] = None,
+        page_digests: Optional[List[PageDigest]] = None
+    ) -> List[List[ScoredChunk]]:
+        """
+        Find relevant chunks for all nodes of a paper from one read of the whole paper.
+
+        The paper text (without chunk overlap) and all nodes go into a single
+        request that returns up to top_k verbatim quotes per node; each quote
+        is matched back to the chunk it came from locally. Nodes the response
+        does not cover, or whose quotes match no chunk, are searched chunk by
+        chunk (find_relevant_chunks_for_nodes). Backends that cannot read
+        whole papers search every node that way.
+
+        Args:
+            nodes: Node dicts as for find_relevant_chunks_for_nodes
+            pdf_chunks: List of text chunks from PDF
+            top_k: Number of top relevant chunks to return per node
+            use_keyword_filter: Whether to pre-filter with keywords (fallback only)
+            lexical_index: BM25 index of pdf_chunks (fallback only)
+            page_digests: Page digests for hierarchical search (fallback only)
+
+        Returns:
+            One list of ScoredChunk objects per node, in input order
+        """
+        if not pdf_chunks or not nodes:
+            return [[] for _ in nodes]
+
+        semaphore = self._new_semaphore()
+        self.backend.begin_run()
+
+        located = await self.backend.locate_passages_async(
+            nodes, page_texts(pdf_chunks), top_k, pdf_chunks, semaphore
+        )
+
+        results: List[Optional[List[ScoredChunk]]] = [None] * len(nodes)
+        aligner = QuoteAligner(pdf_chunks)
+        for i, passages in enumerate(located or []):
+            if passages is None:
+                continue
+            aligned = self._align_passages(passages, aligner, top_k)
+            # Quotes that match nothing are not trusted; search the node by chunks
+            if passages and not aligned:
+                continue
+            results[i] = aligned
+            self.stats['whole_paper_nodes'] += 1
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            self.stats['whole_paper_fallbacks'] += len(missing)
+            chunked = await self.find_relevant_chunks_for_nodes(
+                [nodes[i] for i in missing],
+                pdf_chunks,
+                top_k=top_k,
+                use_keyword_filter=use_keyword_filter,
+                lexical_index=lexical_index,
+                page_digests=page_digests
+            )
+            for i, scored in zip(missing, chunked):
+                results[i] = scored
+
+        return results
+
+    def _align_passages(
+        self,
+        passages: List[Passage],
+        aligner: QuoteAligner,
+        top_k: int
+    ) -> List[ScoredChunk]:
+        """Turn a node's quotes into ScoredChunks of the chunks they came from."""
+        scored: Dict[str, ScoredChunk] = {}
+        for passage in passages:
+            chunk = aligner.align(passage.quote, passage.page)
+            if chunk is None:
+                self.stats['unaligned_quotes'] += 1
+                continue
+            # Two quotes from one chunk: keep the better one
+            current = scored.get(chunk.chunk_id)
+            if current is None or passage.relevance_score > current.relevance_score:
+                scored[chunk.chunk_id] = ScoredChunk(
+                    chunk=chunk,
+                    relevance_score=passage.relevance_score,
+                    reasoning=passage.reasoning
+                )
 
-    def _score_batch(
+        ranked = sorted(scored.values(), key=lambda item: item.relevance_score, reverse=True)
+        return ranked[:top_k]
+
+    async def find_relevant_chunks_matrix(
+        self,
+        nodes: List[Dict],
+        pdf_chunks: List[TextChunk],
+        top_k: int = DEFAULT_TOP_K,
+        use_keyword_filter: bool = True,
+        lexical_index: Optional[BM25Index] = None
+    ) -> List[List[ScoredChunk]]:
+        """
+        Find relevant chunks for several nodes by scoring node x chunk matrices.
+
+        Every node is scored against one shared set of chunk batches. With
+        ClaudeBackend, each request packs a group of nodes with one chunk
+        batch, so chunk text is sent once per node group instead of once per
+        node (see ClaudeBackend.score_matrix_async). Other backends score the
+        nodes one by one.
+
+        Args:
+            nodes: Node dicts with 'content', 'type' and optional 'metadata' and 'id' keys
+            pdf_chunks: List of text chunks from PDF
+            top_k: Number of top relevant chunks to return per node
+            use_keyword_filter: Whether to pre-filter with keywords
+            lexical_index: BM25 index of pdf_chunks. Built on the fly if not given.
+
+        Returns:
+            One list of ScoredChunk objects per node, in input order
+        """
+        if not pdf_chunks or not nodes:
+            return [[] for _ in nodes]
+
+        semaphore = self._new_semaphore()
+        self.backend.begin_run()
+
+        # Score the union of every node's candidates, in document order
+        candidate_ids = set()
+        for candidates in self._shortlist_nodes(nodes, pdf_chunks, use_keyword_filter, lexical_index):
+            candidate_ids.update(chunk.chunk_id for chunk, _ in candidates)
+
+        batches = self._batches_covering(pdf_chunks, candidate_ids)
+        results = await asyncio.gather(*[
+            self.backend.score_matrix_async(nodes, batch, semaphore)
+            for batch in batches
+        ])
+
+        all_scored: List[List[ScoredChunk]] = [[] for _ in nodes]
+        for rows in results:
+            for node_index, row in enumerate(rows):
+                all_scored[node_index].extend(row)
+
+        return list(await asyncio.gather(*[
+            self.backend.explain_async(
+                node['content'],
+                node['type'],
+                self._select_top_k(node['content'], node['type'], scored, top_k),
+                semaphore
+            )
+            for node, scored in zip(nodes, all_scored)
+        ]))
+
+    async def _select_pages_async(
         self,
         node_content: str,
         node_type: str,
-        chunks: List[TextChunk]
-    ) -> List[ScoredChunk]:
+        page_digests: List[PageDigest],
+        semaphore: asyncio.Semaphore
+    ) -> Set[int]:
+        """
+        Score the node against every page digest and pick pages to drill into.
+
+        Digest batches are cut the same way for every node of a paper, so with
+        prompt caching they are billed mostly as cached input.
+
+        Returns:
+            Page numbers scoring at least HIERARCHICAL_PAGE_SCORE (at most
+            HIERARCHICAL_MAX_PAGES), or the best HIERARCHICAL_MIN_TOP_PAGES
+            pages if too few do
         """
-        Score a batch of chunks using LLM.
+        batches = self._make_batches([digest.as_chunk() for digest in page_digests])
+        results = await asyncio.gather(*[
+            self.backend.score_async(node_content, node_type, batch, semaphore)
+            for batch in batches
+        ])
+
+        ranked = sorted(
+            (scored for batch_scored in results for scored in batch_scored),
+            key=lambda scored: (scored.ranked_locally, -scored.relevance_score, scored.chunk.page_num)
+        )
+        pages = [
+            scored.chunk.page_num for scored in ranked[:HIERARCHICAL_MAX_PAGES]
+            if scored.relevance_score >= HIERARCHICAL_PAGE_SCORE
+        ]
+        if len(pages) < HIERARCHICAL_MIN_TOP_PAGES:
+            pages = [scored.chunk.page_num for scored in ranked[:HIERARCHICAL_MIN_TOP_PAGES]]
+
+        self.stats['hierarchical_nodes'] += 1
+        self.stats['digest_batches'] += len(batches)
+        self.stats['pages_drilled'] += len(pages)
+        return set(pages)
+
+    def _page_candidates(
+        self,
+        node_content: str,
+        pdf_chunks: List[TextChunk],
+        pages: Set[int],
+        node_metadata: Optional[Dict] = None,
+        lexical_index: Optional[BM25Index] = None
+    ) -> RankedCandidates:
+        """Every chunk on the selected pages, best lexical matches first."""
+        page_chunks = [chunk for chunk in pdf_chunks if chunk.page_num in pages]
+        index = lexical_index or self._get_index(pdf_chunks)
+        ranked = index.search(self._node_query(node_content, node_metadata))
+        return self._candidates_from_ranking(ranked, page_chunks, apply_filter=False)
+
+    def _plan_batches(
+        self,
+        pdf_chunks: List[TextChunk],
+        candidates: RankedCandidates
+    ) -> List[Tuple[List[TextChunk], float]]:
+        """
+        Split a node's candidate chunks into scoring batches.
+
+        With share_batches, batches are cut from the paper's full chunk list so
+        every node sees identical batches (and identical cached prefixes); batches
+        without any of the node's candidates are skipped. Otherwise only the
+        candidates are batched.
+
+        Returns:
+            (batch, best lexical score in batch) pairs, best batch first
+        """
+        lexical_scores = {chunk.chunk_id: score for chunk, score in candidates}
+
+        if self._shares_batches:
+            batches = self._batches_covering(pdf_chunks, set(lexical_scores))
+            fixed = self._batches_covering(pdf_chunks, set(lexical_scores), LEGACY_BATCH_SIZE)
+        else:
+            batches = self._make_batches([chunk for chunk, _ in candidates])
+            fixed = self._make_batches([chunk for chunk, _ in candidates], LEGACY_BATCH_SIZE)
+
+        difference = len(fixed) - len(batches)
+        self.stats['requests_saved'] += max(0, difference)
+        self.stats['requests_added'] += max(0, -difference)
+        output_per_chunk = self._output_tokens_per_chunk()
+        self.stats['truncations_avoided'] += sum(
+            1 for batch in fixed
+            if len(batch) * output_per_chunk > BATCH_MAX_OUTPUT_TOKENS
+        )
+
+        planned = [
+            (batch, max(lexical_scores.get(chunk.chunk_id, 0.0) for chunk in batch))
+            for batch in batches
+        ]
+        # Stable sort keeps document order among equally ranked batches
+        planned.sort(key=lambda item: item[1], reverse=True)
+        return planned
+
+    def _output_tokens_per_chunk(self) -> float:
+        """
+        Output tokens per scored chunk observed by the backend so far.
+
+        Falls back to OUTPUT_TOKENS_PER_CHUNK before the first scoring
+        response, and for backends that do not report output tokens.
+        """
+        stats = self.backend.stats
+        if stats.get('score_output_chunks'):
+            return stats['score_output_tokens'] / stats['score_output_chunks']
+        return OUTPUT_TOKENS_PER_CHUNK
+
+    def _batches_covering(
+        self,
+        pdf_chunks: List[TextChunk],
+        candidate_ids: set,
+        fixed_size: Optional[int] = None
+    ) -> List[List[TextChunk]]:
+        """
+        Return the batches needed to score every chunk in candidate_ids.
+
+        Shared batches (fixed_size not given) count their non-candidate
+        chunks in stats['chunks_outside_shortlist'].
+        """
+        if not self._shares_batches:
+            return self._make_batches([
+                chunk for chunk in pdf_chunks if chunk.chunk_id in candidate_ids
+            ], fixed_size)
+
+        batches = [
+            batch for batch in self._make_batches(pdf_chunks, fixed_size)
+            if any(chunk.chunk_id in candidate_ids for chunk in batch)
+        ]
+        if fixed_size is None:
+            self.stats['chunks_outside_shortlist'] += sum(
+                1 for batch in batches for chunk in batch if chunk.chunk_id not in candidate_ids
+            )
+        return batches
+
+    @property
+    def _shares_batches(self) -> bool:
+        """Whether batches are cut from the full chunk list (see share_batches)."""
+        return self.use_prompt_cache and self.share_batches
+
+    def _select_candidates(
+        self,
+        node_content: str,
+        pdf_chunks: List[TextChunk],
+        use_keyword_filter: bool,
+        node_metadata: Optional[Dict] = None,
+        lexical_index: Optional[BM25Index] = None
+    ) -> RankedCandidates:
+        """
+        Rank chunks for a node with the paper's BM25 index.
 
         Args:
             node_content: Node text
-            node_type: Node type (Evidence, Claim, etc.)
-            chunks: Batch of chunks to score
+            pdf_chunks: All PDF chunks
+            use_keyword_filter: Whether to pre-filter (only applied to papers
+                with more than 30 chunks)
+            node_metadata: What/How/Who metadata added to the query
+            lexical_index: BM25 index of pdf_chunks. Built on the fly if not given.
 
         Returns:
-            List of ScoredChunk objects
-        """
-        # Build prompt
-        prompt = self._build_scoring_prompt(node_content, node_type, chunks)
-
-        # Call Claude API with retries
-        for attempt in range(MAX_RETRIES):
-            try:
-                response = self.client.messages.create(
-                    model=DEFAULT_MODEL,
-                    max_tokens=4000,
-                    temperature=0,
-                    messages=[{
-                        "role": "user",
-                        "content": prompt
-                    }]
-                )
+            Ranked candidates: at most BM25_MAX_CANDIDATES when filtering,
+            otherwise every chunk
+        """
+        apply_filter = use_keyword_filter and len(pdf_chunks) > 30
+        index = lexical_index or self._get_index(pdf_chunks)
+
+        ranked = index.search(
+            self._node_query(node_content, node_metadata),
+            limit=BM25_MAX_CANDIDATES if apply_filter else None
+        )
+        return self._candidates_from_ranking(ranked, pdf_chunks, apply_filter)
+
+    def _shortlist_nodes(
+        self,
+        nodes: List[Dict],
+        pdf_chunks: List[TextChunk],
+        use_keyword_filter: bool,
+        lexical_index: Optional[BM25Index] = None
+    ) -> List[RankedCandidates]:
+        """
+        Rank candidate chunks for every node of a paper in one pass.
+
+        Args:
+            nodes: Node dicts with 'content' and optional 'metadata' keys
+            pdf_chunks: All PDF chunks
+            use_keyword_filter: Whether to pre-filter with keywords
+            lexical_index: BM25 index of pdf_chunks. Built on the fly if not given.
+
+        Returns:
+            Ranked candidates for each node
+        """
+        apply_filter = use_keyword_filter and len(pdf_chunks) > 30
+        index = lexical_index or self._get_index(pdf_chunks)
+
+        queries = [self._node_query(node['content'], node.get('metadata')) for node in nodes]
+        rankings = index.search_many(queries, limit=BM25_MAX_CANDIDATES if apply_filter else None)
+
+        chunks_by_id = {chunk.chunk_id: chunk for chunk in pdf_chunks}
+        return [
+            self._candidates_from_ranking(ranked, pdf_chunks, apply_filter, chunks_by_id)
+            for ranked in rankings
+        ]
+
+    def _make_batches(
+        self,
+        chunks: List[TextChunk],
+        fixed_size: Optional[int] = None
+    ) -> List[List[TextChunk]]:
+        """
+        Pack chunks into scoring batches by estimated token counts.
+
+        A batch is closed when adding the next chunk would push its prompt over
+        BATCH_INPUT_TOKEN_BUDGET, or its expected output over
+        OUTPUT_TOKEN_HEADROOM of BATCH_MAX_OUTPUT_TOKENS.
+
+        Args:
+            chunks: Chunks to batch, in order
+            fixed_size: Use fixed-size batches instead (for comparison)
 
-                # Parse JSON response
-                response_text = response.content[0].text
-                scores = self._parse_scores(response_text)
-
-                # Create ScoredChunk objects
-                scored_chunks = []
-                for i, chunk in enumerate(chunks):
-                    if i < len(scores):
-                        score_data = scores[i]
-                        scored_chunks.append(ScoredChunk(
-                            chunk=chunk,
-                            relevance_score=score_data.get('score', 0.0),
-                            reasoning=score_data.get('reasoning', '')
-                        ))
-                    else:
-                        # Fallback if not enough scores returned
-                        scored_chunks.append(ScoredChunk(
-                            chunk=chunk,
-                            relevance_score=0.0,
-                            reasoning="Not scored"
-                        ))
-
-                return scored_chunks
-
-            except Exception as e:
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(RETRY_DELAY * (attempt + 1))
-                else:
-                    print(f"Warning: Failed to score batch after {MAX_RETRIES} attempts: {e}")
-                    # Return zero scores as fallback
-                    return [
-                        ScoredChunk(chunk=chunk, relevance_score=0.0, reasoning="Scoring failed")
-                        for chunk in chunks
-                    ]
-
-    def _build_scoring_prompt(
+        Returns:
+            List of batches
+        """
+        if fixed_size:
+            return [chunks[i:i + fixed_size] for i in range(0, len(chunks), fixed_size)]
+
+        max_chunks_by_output = max(
+            1, int(BATCH_MAX_OUTPUT_TOKENS * OUTPUT_TOKEN_HEADROOM) // OUTPUT_TOKENS_PER_CHUNK
+        )
+
+        batches = []
+        current: List[TextChunk] = []
+        current_tokens = 0
+
+        for chunk in chunks:
+            chunk_tokens = self._chunk_prompt_tokens(chunk)
+            if current and (
+                current_tokens + chunk_tokens > BATCH_INPUT_TOKEN_BUDGET
+                or len(current) >= max_chunks_by_output
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+
+            current.append(chunk)
+            current_tokens += chunk_tokens
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    def _chunk_prompt_tokens(self, chunk: TextChunk) -> int:
+        """Estimated prompt tokens for a chunk, including its header line."""
+        if chunk.token_count is None:
+            # Extraction caches written before token counts were stored
+            chunk.token_count = estimate_tokens(chunk.content)
+        return chunk.token_count + 15
+
+    def _select_top_k(
         self,
         node_content: str,
         node_type: str,
-        chunks: List[TextChunk]
-    ) -> str:
-        """Build prompt for scoring chunks."""
-        # Format chunks for prompt
-        chunks_text = ""
-        for i, chunk in enumerate(chunks):
-            chunks_text += f"\n[Chunk {i}] (Page {chunk.page_num}):\n{chunk.content}\n"
-
-        prompt = f"""You are helping verify extracted discourse nodes from research papers by finding relevant passages in the source PDF.
-
-**Node to Verify:**
-Type: {node_type}
-Content: "{node_content}"
-
-**PDF Passages to Evaluate:**
-{chunks_text}
-
-**Task:**
-Rate each passage from 0-10 for relevance to the node above. Consider:
-- Does it provide factual support or evidence for the node?
-- Does it contain methodological details related to the node?
-- Does it contradict or oppose the node?
-- Does it provide contextual information that helps understand the node?
-
-A score of 0 means completely irrelevant, 10 means highly relevant and directly supports/relates to the node.
-
-**Response Format:**
-Return a JSON array with one object per chunk:
-[
-  {{"chunk_id": 0, "score": 8.5, "reasoning": "Brief explanation"}},
-  {{"chunk_id": 1, "score": 3.0, "reasoning": "Brief explanation"}},
-  ...
-]
-
-Respond only with the JSON array, no other text."""
-
-        return prompt
-
-    def _parse_scores(self, response_text: str) -> List[Dict]:
-        """Parse JSON scores from LLM response."""
-        try:
-            # Try to extract JSON from response (handle markdown code blocks)
-            import re
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                json_text = json_match.group(0)
-                scores = json.loads(json_text)
-                return scores
-            else:
-                return []
-        except json.JSONDecodeError as e:
-            print(f"Warning: Failed to parse LLM response as JSON: {e}")
+        all_scored: List[ScoredChunk],
+        top_k: int
+    ) -> List[ScoredChunk]:
+        """Sort scored chunks and select the final top_k."""
+        # Sort by relevance score (highest first), locally ranked chunks last
+        all_scored.sort(key=lambda x: x.rank, reverse=True)
+
+        # Re-rank top candidates for final selection (optional refinement)
+        if len(all_scored) > top_k * 2:
+            top_candidates = all_scored[:top_k * 2]
+            refined = self._rerank_candidates(node_content, node_type, top_candidates, top_k)
+            return refined
+
+        return all_scored[:top_k]
+
+    def _candidates_from_ranking(
+        self,
+        ranked: List[Tuple[str, float]],
+        chunks: List[TextChunk],
+        apply_filter: bool,
+        chunks_by_id: Optional[Dict[str, TextChunk]] = None
+    ) -> RankedCandidates:
+        """Turn a BM25 ranking into the candidate list sent to the LLM."""
+        if chunks_by_id is None:
+            chunks_by_id = {chunk.chunk_id: chunk for chunk in chunks}
+
+        candidates = [
+            (chunks_by_id[chunk_id], score) for chunk_id, score in ranked
+            if chunk_id in chunks_by_id
+        ]
+
+        if not apply_filter:
+            # Keep every chunk; unmatched ones follow in document order
+            matched = {chunk.chunk_id for chunk, _ in candidates}
+            return candidates + [(chunk, 0.0) for chunk in chunks if chunk.chunk_id not in matched]
+
+        if not candidates:
+            # No shared terms at all; fall back to the start of the paper
+            return [(chunk, 0.0) for chunk in chunks[:BM25_MAX_CANDIDATES]]
+
+        # Drop the long tail of weak matches
+        min_score = candidates[0][1] * BM25_MIN_SCORE_RATIO
+        return [(chunk, score) for chunk, score in candidates if score >= min_score]
+
+    def _should_stop(
+        self,
+        scored: List[ScoredChunk],
+        lexical_scores: Dict[str, float],
+        remaining_best_lexical: float,
+        top_k: int
+    ) -> bool:
+        """
+        Decide whether the remaining batches can be skipped.
+
+        Stops when top_k chunks already scored EARLY_STOP_SCORE or higher, or
+        when the current top_k all reach EARLY_STOP_MIN_RELEVANCE and the best
+        remaining lexical score is below EARLY_STOP_LEXICAL_RATIO of the
+        weakest lexical score in that top_k. The lexical rule only applies
+        when every chunk in the top_k has a BM25 score; chunks scored only
+        because they share a batch with a candidate have none.
+        """
+        if not self.early_stop or len(scored) < top_k:
+            return False
+
+        confident = sum(
+            1 for s in scored
+            if not s.ranked_locally and s.relevance_score >= EARLY_STOP_SCORE
+        )
+        if confident >= top_k:
+            return True
+
+        top = sorted(scored, key=lambda s: s.rank, reverse=True)[:top_k]
+        if top[-1].ranked_locally or top[-1].relevance_score < EARLY_STOP_MIN_RELEVANCE:
+            return False
+
+        if any(s.chunk.chunk_id not in lexical_scores for s in top):
+            return False
+
+        weakest_lexical = min(lexical_scores[s.chunk.chunk_id] for s in top)
+        return remaining_best_lexical < weakest_lexical * EARLY_STOP_LEXICAL_RATIO
+
+    def _verbatim_matches(
+        self,
+        node_content: str,
+        candidates: RankedCandidates,
+        top_k: int
+    ) -> List[ScoredChunk]:
+        """
+        Find chunks that contain the node text almost verbatim.
+
+        Only the top VERBATIM_CHECK_LIMIT lexical candidates are checked. A
+        chunk matches when at least VERBATIM_MATCH_RATIO of the node's word
+        trigrams appear in it.
+
+        Returns:
+            Matching chunks scored 10, or an empty list (also when disabled)
+        """
+        if not self.skip_llm_on_verbatim:
             return []
 
+        node_shingles = word_shingles(node_content)
+        if not node_shingles:
+            return []
+
+        matches = []
+        for chunk, _ in candidates[:VERBATIM_CHECK_LIMIT]:
+            chunk_shingles = word_shingles(chunk.content)
+            overlap = len(node_shingles & chunk_shingles) / len(node_shingles)
+            if overlap >= VERBATIM_MATCH_RATIO:
+                matches.append(ScoredChunk(
+                    chunk=chunk,
+                    relevance_score=10.0,
+                    reasoning="Contains the node text verbatim"
+                ))
+
+        if matches:
+            self.stats['verbatim_matches'] += 1
+
+        return matches[:top_k]
+
+    def _node_query(self, node_content: str, node_metadata: Optional[Dict]) -> str:
+        """Build the keyword query from node text and its What/How/Who metadata."""
+        parts = [node_content]
+        for key in ('what', 'how', 'who'):
+            if node_metadata and node_metadata.get(key):
+                parts.append(node_metadata[key])
+        return " ".join(parts)
+
+    def _get_index(self, chunks: List[TextChunk]) -> BM25Index:
+        """Build (and remember) a BM25 index for chunks without a persisted one."""
+        key = tuple(chunk.chunk_id for chunk in chunks)
+        if self._built_index is None or self._built_index[0] != key:
+            self._built_index = (key, BM25Index.build(chunks))
+        return self._built_index[1]
+
     def _rerank_candidates(
         self,
         node_content: str,
@@ -0,0 +1,54 @@
+"""Coalesce identical in-flight requests into one call (single-flight)."""
+
+import asyncio
+from typing import Dict, Callable, Awaitable, TypeVar
+
+
+T = TypeVar('T')
+
+
+class AsyncSingleFlight:
+    """
+    Let concurrent coroutines with the same key share one call.
+
+    The first caller starts the call; callers arriving while it runs wait
+    and receive its result (or its exception). Nothing is kept once the call
+    finishes, so this complements a cache rather than replacing it. The call
+    runs as its own task and waiters are shielded from each other, so one
+    waiter being cancelled does not cancel the call for the rest.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            'calls': 0,
+            # Callers served by another caller's in-flight call
+            'coalesced': 0
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Call fn() unless a call for key is already in flight, then share its result.
+
+        Args:
+            key: Identity of the request, e.g. a prompt hash
+            fn: Function starting the call
+
+        Returns:
+            The result of the single call for key
+        """
+        task = self._flights.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.stats['calls'] += 1
+        else:
+            self.stats['coalesced'] += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        """Drop a finished call unless a newer one took its key."""
+        if self._flights.get(key) is task:
+            del self._flights[key]
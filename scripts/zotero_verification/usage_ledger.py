@@ -0,0 +1,217 @@
+"""Per-call token, latency and cost ledger for Claude API requests."""
+
+import json
+import time
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional, Any
+from datetime import datetime
+
+from .config import USAGE_LEDGER_PATH, MODEL_PRICING
+
+
+# Labels (stage, citekey, node_id) attached to calls made in the current
+# context. asyncio tasks inherit a copy, so labels set around gather() reach
+# every request it spawns.
+_labels: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar('usage_labels', default={})
+
+TOKEN_FIELDS = (
+    'input_tokens',
+    'output_tokens',
+    'cache_creation_input_tokens',
+    'cache_read_input_tokens'
+)
+
+
+@contextmanager
+def usage_labels(**labels):
+    """Label every ledger entry recorded inside the block (nested labels merge)."""
+    token = _labels.set({**_labels.get(), **{k: v for k, v in labels.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def estimate_cost(model: str, tokens: Dict[str, int]) -> Optional[float]:
+    """
+    Estimate the USD cost of a call from its token counts.
+
+    Returns:
+        Cost in USD, or None if the model has no entry in MODEL_PRICING
+    """
+    prices = MODEL_PRICING.get(model)
+    if prices is None:
+        return None
+    return sum(tokens.get(field, 0) * prices[field] for field in TOKEN_FIELDS) / 1_000_000
+
+
+class LedgerCall:
+    """Mutable record of one logical call, filled in while it runs."""
+
+    def __init__(self):
+        self.response = None
+        self.retries = 0
+        self.latency: Optional[float] = None  # Round trip of the last attempt
+        self.outcome = 'ok'
+
+    def count_retry(self, error: Exception, delay: float):
+        """on_retry hook for call_with_retries."""
+        self.retries += 1
+
+
+class UsageLedger:
+    """Append one JSON line per API call to a local ledger file."""
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Initialize ledger.
+
+        Args:
+            path: JSONL file to append to. Defaults to USAGE_LEDGER_PATH.
+        """
+        self.path = path or USAGE_LEDGER_PATH
+        self.run_id = datetime.now().strftime('%Y%m%dT%H%M%S')
+        self.entries: List[Dict[str, Any]] = []
+        self.cost_usd = 0.0  # Estimated spend of this run's uncached calls
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def call(self, model: str, **labels):
+        """
+        Record the call made inside the block.
+
+        The block sets call.response (and optionally call.latency and
+        call.outcome) and passes call.count_retry as on_retry. Exceptions are
+        recorded as an 'error:<type>' outcome and re-raised.
+
+        Args:
+            model: Model the request goes to
+            **labels: Extra labels for this entry
+        """
+        call = LedgerCall()
+        started = time.perf_counter()
+        try:
+            yield call
+        except Exception as e:
+            call.outcome = f"error:{type(e).__name__}"
+            raise
+        finally:
+            self.record(
+                model,
+                response=call.response,
+                elapsed=time.perf_counter() - started,
+                latency=call.latency,
+                retries=call.retries,
+                outcome=call.outcome,
+                **labels
+            )
+
+    def record(
+        self,
+        model: str,
+        response=None,
+        elapsed: float = 0.0,
+        latency: Optional[float] = None,
+        retries: int = 0,
+        outcome: str = 'ok',
+        **labels
+    ):
+        """
+        Append one entry to the ledger.
+
+        Args:
+            model: Model the request went to
+            response: API response, if any (its usage is recorded)
+            elapsed: Wall time of the call including retries and queueing
+            latency: Round trip of the last attempt. Defaults to elapsed.
+            retries: Retries before the final attempt
+            outcome: 'ok', 'cached', 'truncated', 'error:<type>', ...
+            **labels: Extra labels, merged over the context labels
+        """
+        usage = getattr(response, 'usage', None)
+        tokens = {field: (getattr(usage, field, 0) or 0) for field in TOKEN_FIELDS}
+
+        entry = {
+            'run_id': self.run_id,
+            'timestamp': datetime.now().isoformat(),
+            **_labels.get(),
+            **{k: v for k, v in labels.items() if v is not None},
+            'model': model,
+            **tokens,
+            'latency_s': round(latency if latency is not None else elapsed, 3),
+            'elapsed_s': round(elapsed, 3),
+            'retries': retries,
+            'outcome': outcome,
+            'cost_usd': estimate_cost(model, tokens)
+        }
+        self.entries.append(entry)
+        if outcome != 'cached':
+            self.cost_usd += entry['cost_usd'] or 0.0
+
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        except Exception as e:
+            print(f"Warning: Failed to write usage ledger entry: {e}")
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Aggregate this run's entries by stage.
+
+        Returns:
+            Stage -> calls, failures, retries, token totals, latency and cost
+        """
+        stages: Dict[str, Dict[str, Any]] = {}
+        latencies: Dict[str, List[float]] = {}
+
+        for entry in self.entries:
+            stage = entry.get('stage', 'unlabeled')
+            totals = stages.setdefault(stage, {
+                'calls': 0,
+                'cached': 0,
+                'failures': 0,
+                'retries': 0,
+                **{field: 0 for field in TOKEN_FIELDS},
+                'cost_usd': 0.0
+            })
+            totals['calls'] += 1
+            totals['retries'] += entry['retries']
+            if entry['outcome'] == 'cached':
+                totals['cached'] += 1
+                continue
+            if entry['outcome'].startswith('error'):
+                totals['failures'] += 1
+            for field in TOKEN_FIELDS:
+                totals[field] += entry[field]
+            totals['cost_usd'] += entry['cost_usd'] or 0.0
+            latencies.setdefault(stage, []).append(entry['latency_s'])
+
+        for stage, totals in stages.items():
+            values = sorted(latencies.get(stage, []))
+            totals['latency_mean_s'] = sum(values) / len(values) if values else 0.0
+            totals['latency_p95_s'] = values[int(0.95 * (len(values) - 1))] if values else 0.0
+
+        return stages
+
+    def print_summary(self):
+        """Print per-stage usage of this run."""
+        stages = self.summary()
+        if not stages:
+            return
+
+        print(f"Usage ledger (run {self.run_id}, {self.path}):")
+        for stage, totals in sorted(stages.items()):
+            print(f"  {stage}: {totals['calls']} calls "
+                  f"({totals['cached']} cached, {totals['failures']} failed, "
+                  f"{totals['retries']} retries)")
+            print(f"    Tokens: {totals['input_tokens']} in, "
+                  f"{totals['cache_read_input_tokens']} cache reads, "
+                  f"{totals['cache_creation_input_tokens']} cache writes, "
+                  f"{totals['output_tokens']} out")
+            print(f"    Latency: {totals['latency_mean_s']:.2f}s mean, "
+                  f"{totals['latency_p95_s']:.2f}s p95")
+            print(f"    Estimated cost: ${totals['cost_usd']:.4f}")
+        print()
@@ -0,0 +1,92 @@
+"""Whole-paper verification: the paper text for one request, and its quotes aligned back to chunks."""
+
+from typing import List, Dict, Optional
+
+from .pdf_extractor import TextChunk, estimate_tokens
+from .lexical_index import word_shingles
+from .config import CHUNK_OVERLAP_WORDS, WHOLE_PAPER_MIN_ALIGNMENT
+
+
+def page_texts(chunks: List[TextChunk]) -> Dict[int, str]:
+    """
+    Rebuild each page's text from its chunks.
+
+    Consecutive chunks of a page repeat up to CHUNK_OVERLAP_WORDS words;
+    the repeated words are dropped so the paper is sent only once.
+
+    Args:
+        chunks: Text chunks of a PDF, in extraction order
+
+    Returns:
+        Page number -> page text, in page order
+    """
+    pages: Dict[int, List[str]] = {}
+    previous: Dict[int, List[str]] = {}
+
+    for chunk in chunks:
+        words = chunk.content.split()
+        prior = previous.get(chunk.page_num)
+        if prior:
+            # Longest tail of the previous chunk that starts this one
+            for size in range(min(CHUNK_OVERLAP_WORDS, len(prior), len(words)), 0, -1):
+                if prior[-size:] == words[:size]:
+                    words = words[size:]
+                    break
+        pages.setdefault(chunk.page_num, []).extend(words)
+        previous[chunk.page_num] = chunk.content.split()
+
+    return {page: " ".join(words) for page, words in sorted(pages.items())}
+
+
+def paper_tokens(chunks: List[TextChunk]) -> int:
+    """Estimated tokens of a paper's text without chunk overlap."""
+    return sum(estimate_tokens(text) for text in page_texts(chunks).values())
+
+
+class QuoteAligner:
+    """
+    Find the chunk each quote of a whole-paper response was taken from.
+
+    Chunks are compared by the share of the quote's word trigrams they
+    contain, so small differences in whitespace, case or punctuation do not
+    matter. Ties (e.g. a quote inside the overlap of two chunks) go to the
+    chunk on the page the model named, then to the earlier chunk.
+    """
+
+    def __init__(self, chunks: List[TextChunk]):
+        """
+        Initialize aligner.
+
+        Args:
+            chunks: Text chunks of the paper
+        """
+        self.chunks = chunks
+        self._shingles = [word_shingles(chunk.content) for chunk in chunks]
+
+    def align(self, quote: str, page: Optional[int] = None) -> Optional[TextChunk]:
+        """
+        Return the chunk a quote comes from.
+
+        Args:
+            quote: Passage text returned by the model
+            page: Page the model said the quote is on, if any
+
+        Returns:
+            The best matching chunk, or None if no chunk contains at least
+            WHOLE_PAPER_MIN_ALIGNMENT of the quote
+        """
+        quote_shingles = word_shingles(quote)
+        if not quote_shingles:
+            return None
+
+        best = None
+        best_key = None
+        for chunk, chunk_shingles in zip(self.chunks, self._shingles):
+            overlap = len(quote_shingles & chunk_shingles) / len(quote_shingles)
+            if overlap < WHOLE_PAPER_MIN_ALIGNMENT:
+                continue
+            key = (overlap, chunk.page_num == page)
+            if best_key is None or key > best_key:
+                best, best_key = chunk, key
+
+        return best
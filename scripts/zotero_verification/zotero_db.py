@@ -1,11 +1,14 @@
 """Zotero SQLite database interface for mapping citekeys to PDF files."""
 
+import re
 import sqlite3
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Union
 from dataclasses import dataclass
 
-from .config import ZOTERO_DB_PATH, ZOTERO_STORAGE_PATH
+from .citekey_index import CitekeyIndex
+from .config import ZOTERO_DB_PATH, ZOTERO_STORAGE_PATH, PDF_CHECK_WORKERS, ZOTERO_SQL_BATCH_SIZE
 
 
 @dataclass
@@ -28,12 +31,13 @@ class PDFAttachment:
 class ZoteroDatabase:
     """Interface to Zotero SQLite database."""
 
-    def __init__(self, db_path: Optional[Path] = None):
+    def __init__(self, db_path: Optional[Path] = None, index_path: Optional[Path] = None):
         """
         Initialize connection to Zotero SQLite database.
 
         Args:
             db_path: Path to zotero.sqlite file. Defaults to config value.
+            index_path: Saved citekey index. Defaults to CITEKEY_INDEX_PATH.
         """
         self.db_path = db_path or ZOTERO_DB_PATH
         if not self.db_path.exists():
@@ -46,6 +50,16 @@ class ZoteroDatabase:
         self.conn = sqlite3.connect(str(self.db_path))
         self.conn.row_factory = sqlite3.Row  # Enable column access by name
 
+        self.index_path = index_path
+        self._index: Optional[CitekeyIndex] = None
+
+    @property
+    def citekey_index(self) -> CitekeyIndex:
+        """Citekey index of the library, loaded or rebuilt on first use."""
+        if self._index is None:
+            self._index = CitekeyIndex.load_or_build(self.conn, self.db_path, self.index_path)
+        return self._index
+
     def close(self):
         """Close database connection."""
         if self.conn:
@@ -70,222 +84,210 @@ class ZoteroDatabase:
             PDFAttachment with path and metadata, or None if not found
 
         Raises:
-            ValueError: If multiple PDFs found for citekey
+            ValueError: If the citekey is not in the library
             FileNotFoundError: If PDF attachment path doesn't exist on disk
         """
+        result = self.find_pdfs_by_citekeys([citekey])[citekey]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def find_pdfs_by_citekeys(
+        self,
+        citekeys: List[str]
+    ) -> Dict[str, Union[PDFAttachment, Exception]]:
+        """
+        Find the PDFs of many citekeys at once.
+
+        Citekeys are resolved with the citekey index; metadata, authors and
+        attachments of all resolved items are then read with one query each
+        (itemID IN ...) rather than per citekey. The PDF files are checked
+        for existence in parallel (slow on network drives and synced folders).
+
+        Args:
+            citekeys: Citation keys, with or without @ prefix
+
+        Returns:
+            Citekey (as given) -> PDFAttachment, or the error
+            find_pdf_by_citekey would raise for it (ValueError or
+            FileNotFoundError)
+        """
+        results: Dict[str, Union[PDFAttachment, Exception]] = {}
+        candidates: Dict[str, PDFAttachment] = {}
+
         # Strip @ prefix if present
-        clean_citekey = citekey.lstrip('@')
-
-        # Get paper metadata
-        metadata = self._get_paper_metadata(clean_citekey)
-        if not metadata:
-            # Try fuzzy matching
-            suggestions = self._fuzzy_match_citekey(clean_citekey)
-            if suggestions:
-                raise ValueError(
-                    f"Citekey '{clean_citekey}' not found in Zotero library.\n"
-                    f"Did you mean: {', '.join(suggestions)}?"
-                )
-            else:
-                raise ValueError(
-                    f"Citekey '{clean_citekey}' not found in Zotero library."
-                )
+        clean_citekeys = {citekey: citekey.lstrip('@') for citekey in citekeys}
+        papers = self._get_papers_metadata(list(clean_citekeys.values()))
+        pdf_attachments = self._get_pdf_attachments(
+            [metadata.item_id for metadata in papers.values()]
+        )
 
-        # Find PDF attachments for this item
-        pdf_paths = self._get_pdf_attachments(metadata.item_id)
+        for citekey, clean_citekey in clean_citekeys.items():
+            metadata = papers.get(clean_citekey)
+            if not metadata:
+                # Try fuzzy matching
+                suggestions = self._fuzzy_match_citekey(clean_citekey)
+                if suggestions:
+                    results[citekey] = ValueError(
+                        f"Citekey '{clean_citekey}' not found in Zotero library.\n"
+                        f"Did you mean: {', '.join(suggestions)}?"
+                    )
+                else:
+                    results[citekey] = ValueError(
+                        f"Citekey '{clean_citekey}' not found in Zotero library."
+                    )
+                continue
 
-        if not pdf_paths:
-            raise FileNotFoundError(
-                f"No PDF attachment found for citekey '{clean_citekey}'"
-            )
+            pdf_paths = pdf_attachments.get(metadata.item_id, [])
 
-        if len(pdf_paths) > 1:
-            print(
-                f"Warning: Multiple PDFs found for '{clean_citekey}'. "
-                f"Using the first one: {pdf_paths[0]}"
-            )
+            if not pdf_paths:
+                results[citekey] = FileNotFoundError(
+                    f"No PDF attachment found for citekey '{clean_citekey}'"
+                )
+                continue
 
-        pdf_path = pdf_paths[0]
+            if len(pdf_paths) > 1:
+                print(
+                    f"Warning: Multiple PDFs found for '{clean_citekey}'. "
+                    f"Using the first one: {pdf_paths[0]}"
+                )
 
-        # Verify file exists on disk
-        if not pdf_path.exists():
-            raise FileNotFoundError(
-                f"PDF file not found at {pdf_path}\n"
-                f"The Zotero attachment may be broken or moved."
-            )
+            candidates[citekey] = PDFAttachment(path=pdf_paths[0], metadata=metadata)
+
+        # Verify files exist on disk
+        if candidates:
+            workers = min(PDF_CHECK_WORKERS, len(candidates))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                exists = dict(zip(
+                    candidates,
+                    pool.map(lambda attachment: attachment.path.exists(), candidates.values())
+                ))
+            for citekey, attachment in candidates.items():
+                if exists[citekey]:
+                    results[citekey] = attachment
+                else:
+                    results[citekey] = FileNotFoundError(
+                        f"PDF file not found at {attachment.path}\n"
+                        f"The Zotero attachment may be broken or moved."
+                    )
 
-        return PDFAttachment(path=pdf_path, metadata=metadata)
+        return {citekey: results[citekey] for citekey in citekeys}
 
-    def _get_paper_metadata(self, citekey: str) -> Optional[PaperMetadata]:
+    def _get_papers_metadata(self, citekeys: List[str]) -> Dict[str, PaperMetadata]:
         """
-        Retrieve paper metadata by citekey.
+        Retrieve paper metadata of many citekeys with one query per table.
 
         Args:
-            citekey: Citation key without @ prefix
+            citekeys: Citation keys without @ prefix
 
         Returns:
-            PaperMetadata or None if not found
+            Citekey (as given) -> PaperMetadata, for citekeys in the library
         """
-        # First try BetterBibTeX format (Extra field with "Citation Key: XXX")
-        query_extra = """
-        SELECT items.itemID, itemDataValues.value as fieldValue, fields.fieldName
-        FROM items
-        JOIN itemData ON items.itemID = itemData.itemID
-        JOIN itemDataValues ON itemData.valueID = itemDataValues.valueID
-        JOIN fields ON itemData.fieldID = fields.fieldID
-        WHERE items.itemID IN (
-            SELECT items.itemID FROM items
-            JOIN itemData ON items.itemID = itemData.itemID
+        index = self.citekey_index
+        confirmed = {citekey: index.resolve(citekey) for citekey in citekeys}
+        item_ids = {
+            citekey: index.entries[key].item_id
+            for citekey, key in confirmed.items() if key is not None
+        }
+
+        fields: Dict[int, Dict[str, str]] = {}
+        for ids, placeholders in _id_batches(item_ids.values()):
+            rows = self.conn.execute(f"""
+            SELECT itemData.itemID, fields.fieldName, itemDataValues.value
+            FROM itemData
             JOIN itemDataValues ON itemData.valueID = itemDataValues.valueID
             JOIN fields ON itemData.fieldID = fields.fieldID
-            WHERE fields.fieldName = 'extra'
-            AND (itemDataValues.value LIKE 'Citation Key: ' || ? || '%'
-                 OR itemDataValues.value LIKE '%
-Citation Key: ' || ? || '%')
-        )
-        AND fields.fieldName IN ('extra', 'title', 'date')
-        """
-
-        cursor = self.conn.execute(query_extra, (citekey, citekey))
-        rows = cursor.fetchall()
-
-        # If not found, try standard citationKey field
-        if not rows:
-            query_standard = """
-            SELECT items.itemID, itemDataValues.value as fieldValue, fields.fieldName
-            FROM items
-            JOIN itemData ON items.itemID = itemData.itemID
-            JOIN itemDataValues ON itemData.valueID = itemDataValues.valueID
-            JOIN fields ON itemData.fieldID = fields.fieldID
-            WHERE items.itemID IN (
-                SELECT items.itemID FROM items
-                JOIN itemData ON items.itemID = itemData.itemID
-                JOIN itemDataValues ON itemData.valueID = itemDataValues.valueID
-                JOIN fields ON itemData.fieldID = fields.fieldID
-                WHERE fields.fieldName = 'citationKey'
-                AND itemDataValues.value = ?
+            WHERE fields.fieldName IN ('title', 'date')
+            AND itemData.itemID IN ({placeholders})
+            """, ids)
+            for row in rows:
+                fields.setdefault(row['itemID'], {})[row['fieldName']] = row['value']
+
+        authors: Dict[int, List[str]] = {}
+        for ids, placeholders in _id_batches(item_ids.values()):
+            rows = self.conn.execute(f"""
+            SELECT itemCreators.itemID, creators.firstName, creators.lastName
+            FROM creators
+            JOIN itemCreators ON creators.creatorID = itemCreators.creatorID
+            WHERE itemCreators.itemID IN ({placeholders})
+            ORDER BY itemCreators.itemID, itemCreators.orderIndex
+            """, ids)
+            for row in rows:
+                name = f"{row['firstName'] or ''} {row['lastName'] or ''}".strip()
+                if name:
+                    authors.setdefault(row['itemID'], []).append(name)
+
+        papers = {}
+        for citekey, item_id in item_ids.items():
+            item_fields = fields.get(item_id, {})
+            papers[citekey] = PaperMetadata(
+                item_id=item_id,
+                title=item_fields.get('title') or "Unknown",
+                authors=", ".join(authors.get(item_id, [])) or "Unknown",
+                year=self._extract_year(item_fields['date']) if item_fields.get('date') else "Unknown",
+                citekey=confirmed[citekey]
             )
-            AND fields.fieldName IN ('citationKey', 'title', 'date')
-            """
-
-            cursor = self.conn.execute(query_standard, (citekey,))
-            rows = cursor.fetchall()
-
-        if not rows:
-            return None
-
-        # Parse results into metadata
-        item_id = rows[0]['itemID']
-        title = None
-        year = None
-        citekey_confirmed = citekey
-
-        for row in rows:
-            field_name = row['fieldName']
-            field_value = row['fieldValue']
-
-            if field_name == 'title':
-                title = field_value
-            elif field_name == 'date':
-                # Extract year from date (handle various formats)
-                year = self._extract_year(field_value)
-            elif field_name == 'extra':
-                # Parse BetterBibTeX citation key from Extra field
-                # Format: "Citation Key: XXX" (may be on its own line)
-                import re
-                match = re.search(r'Citation Key:\s*(\S+)', field_value)
-                if match:
-                    citekey_confirmed = match.group(1)
-            elif field_name == 'citationKey':
-                citekey_confirmed = field_value
-
-        # Get authors separately (stored in creators table)
-        authors = self._get_authors(item_id)
-
-        return PaperMetadata(
-            item_id=item_id,
-            title=title or "Unknown",
-            authors=authors or "Unknown",
-            year=year or "Unknown",
-            citekey=citekey_confirmed
-        )
-
-    def _get_authors(self, item_id: int) -> str:
-        """Get comma-separated list of authors for an item."""
-        query = """
-        SELECT firstName, lastName
-        FROM creators
-        JOIN itemCreators ON creators.creatorID = itemCreators.creatorID
-        WHERE itemCreators.itemID = ?
-        ORDER BY itemCreators.orderIndex
-        """
-
-        cursor = self.conn.execute(query, (item_id,))
-        rows = cursor.fetchall()
-
-        authors = []
-        for row in rows:
-            first = row['firstName'] or ""
-            last = row['lastName'] or ""
-            name = f"{first} {last}".strip()
-            if name:
-                authors.append(name)
-
-        return ", ".join(authors) if authors else "Unknown"
+        return papers
 
     def _extract_year(self, date_str: str) -> str:
         """Extract year from various date formats."""
-        import re
         # Try to find a 4-digit year
         match = re.search(r'\b(19|20)\d{2}\b', date_str)
         if match:
             return match.group(0)
         return "Unknown"
 
-    def _get_pdf_attachments(self, item_id: int) -> List[Path]:
+    def _get_pdf_attachments(self, item_ids: List[int]) -> Dict[int, List[Path]]:
         """
-        Get all PDF attachment paths for an item.
+        Get the PDF attachment paths of many items with one query.
 
         Args:
-            item_id: Zotero item ID
+            item_ids: Zotero item IDs of the papers
 
         Returns:
-            List of paths to PDF files
-        """
-        query = """
-        SELECT items.key, itemAttachments.path
-        FROM itemAttachments
-        JOIN items ON itemAttachments.itemID = items.itemID
-        WHERE itemAttachments.parentItemID = ?
-        AND itemAttachments.contentType = 'application/pdf'
+            Item ID -> paths to its PDF files (items without PDFs are left out)
         """
+        attachments: Dict[int, List[Path]] = {}
+        for ids, placeholders in _id_batches(item_ids):
+            rows = self.conn.execute(f"""
+            SELECT itemAttachments.parentItemID, items.key, itemAttachments.path
+            FROM itemAttachments
+            JOIN items ON itemAttachments.itemID = items.itemID
+            WHERE itemAttachments.contentType = 'application/pdf'
+            AND itemAttachments.path IS NOT NULL
+            AND itemAttachments.parentItemID IN ({placeholders})
+            ORDER BY itemAttachments.itemID
+            """, ids)
+            for row in rows:
+                attachments.setdefault(row['parentItemID'], []).append(
+                    self._resolve_attachment_path(row['key'], row['path'])
+                )
+        return attachments
 
-        cursor = self.conn.execute(query, (item_id,))
-        rows = cursor.fetchall()
-
-        pdf_paths = []
-        for row in rows:
-            attachment_key = row['key']
-            attachment_path = row['path']
-
-            if attachment_path:
-                # Handle different path formats
-                if attachment_path.startswith('storage:'):
-                    # Internal Zotero storage
-                    # Format: storage:filename.pdf
-                    filename = attachment_path.replace('storage:', '')
-                    full_path = ZOTERO_STORAGE_PATH / attachment_key / filename
-                elif attachment_path.startswith('attachments:'):
-                    # Linked attachment
-                    filename = attachment_path.replace('attachments:', '')
-                    full_path = ZOTERO_STORAGE_PATH.parent / 'attachments' / filename
-                else:
-                    # Absolute path
-                    full_path = Path(attachment_path)
+    def _resolve_attachment_path(self, attachment_key: str, attachment_path: str) -> Path:
+        """
+        Turn an itemAttachments.path value into a file path.
 
-                pdf_paths.append(full_path)
+        Args:
+            attachment_key: Key of the attachment item
+            attachment_path: Stored path (storage:, attachments: or absolute)
 
-        return pdf_paths
+        Returns:
+            Path to the PDF file
+        """
+        # Handle different path formats
+        if attachment_path.startswith('storage:'):
+            # Internal Zotero storage
+            # Format: storage:filename.pdf
+            filename = attachment_path.replace('storage:', '')
+            return ZOTERO_STORAGE_PATH / attachment_key / filename
+        elif attachment_path.startswith('attachments:'):
+            # Linked attachment
+            filename = attachment_path.replace('attachments:', '')
+            return ZOTERO_STORAGE_PATH.parent / 'attachments' / filename
+        else:
+            # Absolute path
+            return Path(attachment_path)
 
     def _fuzzy_match_citekey(self, citekey: str, limit: int = 3) -> List[str]:
         """
@@ -304,38 +306,7 @@ Citation Key: ' || ? || '%')
             # If Levenshtein not available, skip fuzzy matching
             return []
 
-        # Get all citekeys from database (both standard and BetterBibTeX)
-        import re
-
-        # Get BetterBibTeX citekeys from Extra field
-        query_extra = """
-        SELECT DISTINCT itemDataValues.value
-        FROM itemData
-        JOIN itemDataValues ON itemData.valueID = itemDataValues.valueID
-        JOIN fields ON itemData.fieldID = fields.fieldID
-        WHERE fields.fieldName = 'extra'
-        AND itemDataValues.value LIKE '%Citation Key:%'
-        """
-        cursor = self.conn.execute(query_extra)
-        extra_rows = cursor.fetchall()
-
-        all_citekeys = []
-        for row in extra_rows:
-            match = re.search(r'Citation Key:\s*(\S+)', row[0])
-            if match:
-                all_citekeys.append(match.group(1))
-
-        # Get standard citekeys
-        query_standard = """
-        SELECT DISTINCT itemDataValues.value
-        FROM itemData
-        JOIN itemDataValues ON itemData.valueID = itemDataValues.valueID
-        JOIN fields ON itemData.fieldID = fields.fieldID
-        WHERE fields.fieldName = 'citationKey'
-        """
-
-        cursor = self.conn.execute(query_standard)
-        all_citekeys.extend([row[0] for row in cursor.fetchall()])
+        all_citekeys = self.citekey_index.citekeys()
 
         # Calculate distances and sort
         distances = [
@@ -349,36 +320,17 @@ Citation Key: ' || ? || '%')
 
     def list_all_citekeys(self) -> List[str]:
         """Get all citation keys in the Zotero library."""
-        import re
-
-        all_citekeys = []
-
-        # Get BetterBibTeX citekeys from Extra field
-        query_extra = """
-        SELECT DISTINCT itemDataValues.value
-        FROM itemData
-        JOIN itemDataValues ON itemData.valueID = itemDataValues.valueID
-        JOIN fields ON itemData.fieldID = fields.fieldID
-        WHERE fields.fieldName = 'extra'
-        AND itemDataValues.value LIKE '%Citation Key:%'
-        """
-        cursor = self.conn.execute(query_extra)
-        for row in cursor.fetchall():
-            match = re.search(r'Citation Key:\s*(\S+)', row[0])
-            if match:
-                all_citekeys.append(match.group(1))
-
-        # Get standard citekeys
-        query_standard = """
-        SELECT DISTINCT itemDataValues.value
-        FROM itemData
-        JOIN itemDataValues ON itemData.valueID = itemDataValues.valueID
-        JOIN fields ON itemData.fieldID = fields.fieldID
-        WHERE fields.fieldName = 'citationKey'
-        ORDER BY itemDataValues.value
-        """
+        return self.citekey_index.citekeys()
+
 
-        cursor = self.conn.execute(query_standard)
-        all_citekeys.extend([row[0] for row in cursor.fetchall()])
+def _id_batches(item_ids, size: int = ZOTERO_SQL_BATCH_SIZE):
+    """
+    Split item IDs into batches that fit one IN (...) clause.
 
-        return sorted(set(all_citekeys))
+    Yields:
+        (IDs, matching "?, ?, ..." placeholders) per batch
+    """
+    ids = sorted(set(item_ids))
+    for start in range(0, len(ids), size):
+        batch = ids[start:start + size]
+        yield batch, ", ".join("?" * len(batch))